@@ -1,18 +1,82 @@
-from fastapi import APIRouter, HTTPException
+import json
+from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from app.api.dependencies import get_audit_service
 from app.services.audit_service import AuditService
 
 router = APIRouter()
-audit_service = AuditService()
 
 @router.get("/run")
-async def run_audit():
+async def run_audit(
+    source: str = Query("bling", pattern="^(bling|mirror|snapshot)$"),
+    stream: bool = Query(False),
+    snapshot: Optional[str] = Query(None),
+    audit_service: AuditService = Depends(get_audit_service),
+):
     """
     Executa a auditoria de produtos e categorias.
     Foca especialmente nos SKUs que ainda não foram exportados.
+    Use source=mirror para auditar sobre o espelho local (atualizado de forma incremental).
+    Use stream=true para receber os achados em NDJSON (uma linha JSON por achado, resumo no final).
+    Use source=snapshot (opcionalmente com snapshot=<nome>) para auditar um snapshot salvo, sem chamar o Bling.
     """
+    if stream and source != "snapshot":
+        return StreamingResponse(_ndjson(audit_service.stream_audit(source=source)), media_type="application/x-ndjson")
+
     try:
-        results = await audit_service.run_audit()
+        results = await audit_service.run_audit(source=source, snapshot=snapshot)
         return results
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/snapshots")
+async def create_snapshot(
+    source: str = Query("bling", pattern="^(bling|mirror)$"),
+    audit_service: AuditService = Depends(get_audit_service),
+):
+    """
+    Grava um snapshot Parquet do catálogo (source=mirror usa o espelho local, sem chamar o Bling).
+    """
+    try:
+        return await audit_service.snapshots.create(source=source)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/snapshots")
+def list_snapshots(audit_service: AuditService = Depends(get_audit_service)):
+    """Lista os snapshots disponíveis (mais recente primeiro)."""
+    return {"snapshots": audit_service.snapshots.list()}
+
+@router.get("/snapshots/diff")
+def diff_snapshots(
+    old: str = Query(...),
+    new: Optional[str] = Query(None),
+    limit: int = Query(1000, ge=0, le=100000),
+    audit_service: AuditService = Depends(get_audit_service),
+):
+    """
+    Compara dois snapshots (padrão de `new`: o mais recente).
+    Ex: lost_category lista os produtos que perderam a categoria entre os dois.
+    """
+    try:
+        return audit_service.snapshots.diff(old, new or audit_service.snapshots.latest(), limit=limit)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def _ndjson(events):
+    """Serializa os eventos da auditoria; um erro no meio do stream vira a última linha."""
+    try:
+        async for event in events:
+            yield json.dumps(event, ensure_ascii=False, default=str) + "\n"
+    except Exception as e:
+        # Reason: Com o stream já iniciado não é mais possível responder HTTP 500.
+        yield json.dumps({"type": "error", "message": str(e)}, ensure_ascii=False) + "\n"
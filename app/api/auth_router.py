@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Query, HTTPException
-import httpx
 from app.core.config import settings, assert_bling_oauth_configured
 from app.core.database import engine
+from app.core.http_client import get_http_client
 from app.models.auth import BlingToken
+from app.services.auth_service import AuthService
 from sqlmodel import Session, select
 from datetime import datetime, timedelta
 import base64
@@ -32,33 +33,36 @@ async def auth_callback(code: str = Query(...)):
         "code": code
     }
     
-    async with httpx.AsyncClient() as client:
-        response = await client.post(token_url, data=data, headers=headers)
-        
-        if response.status_code != 200:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Erro ao trocar token no Bling: {response.text}"
-            )
-        
-        token_data = response.json()
-        
-        # Salva o token no banco de dados
-        with Session(engine) as session:
-            # Remove tokens antigos para manter apenas o mais recente (simplificação inicial)
-            old_tokens = session.exec(select(BlingToken)).all()
-            for old in old_tokens:
-                session.delete(old)
-            
-            new_token = BlingToken(
-                access_token=token_data["access_token"],
-                refresh_token=token_data["refresh_token"],
-                expires_at=datetime.utcnow() + timedelta(seconds=token_data["expires_in"]),
-                scope=token_data["scope"]
-            )
-            session.add(new_token)
-            session.commit()
-            
+    client = get_http_client()
+    response = await client.post(token_url, data=data, headers=headers)
+
+    if response.status_code != 200:
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Erro ao trocar token no Bling: {response.text}"
+        )
+
+    token_data = response.json()
+
+    # Salva o token no banco de dados
+    with Session(engine) as session:
+        # Remove tokens antigos para manter apenas o mais recente (simplificação inicial)
+        old_tokens = session.exec(select(BlingToken)).all()
+        for old in old_tokens:
+            session.delete(old)
+
+        new_token = BlingToken(
+            access_token=token_data["access_token"],
+            refresh_token=token_data["refresh_token"],
+            expires_at=datetime.utcnow() + timedelta(seconds=token_data["expires_in"]),
+            scope=token_data["scope"]
+        )
+        session.add(new_token)
+        session.commit()
+
+    # Reason: Descarta o token antigo mantido em memória pelo AuthService.
+    AuthService.invalidate_cache()
+
     return {"status": "success", "message": "Autenticação concluída com sucesso"}
 
 @router.get("/login-url")
@@ -0,0 +1,16 @@
+from fastapi import APIRouter, HTTPException, Query
+from app.core.config import settings
+from app.core import tracing
+
+router = APIRouter()
+
+@router.get("/traces")
+def list_slow_traces(limit: int = Query(10, ge=1, le=100)):
+    """
+    Árvore de spans das últimas requisições lentas (acima de TRACE_SLOW_THRESHOLD_MS),
+    com spans por SKU/categoria nas operações em lote.
+    Desligado por padrão: habilite com TRACE_DEBUG_ENDPOINT=true.
+    """
+    if not settings.TRACE_DEBUG_ENDPOINT:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return {"threshold_ms": settings.TRACE_SLOW_THRESHOLD_MS, "traces": tracing.slow_traces(limit)}
@@ -0,0 +1,48 @@
+from functools import lru_cache
+from app.services.audit_service import AuditService
+from app.services.bling_client import BlingClient
+from app.services.job_service import JobService
+from app.services.normalization_service import NormalizationService
+from app.services.product_mirror_service import ProductMirrorService
+from app.services.sync_service import SyncService
+from app.services.webhook_service import WebhookService
+
+# Reason: Os serviços são criados na primeira requisição que os usa (via Depends), não no
+# import dos routers. Assim o cold start da Vercel não paga a construção de todos eles, e uma
+# configuração ausente (ex: ANTHROPIC_API_KEY) só afeta os endpoints que precisam dela.
+# Cada provider devolve sempre a mesma instância; em testes, use app.dependency_overrides.
+
+
+@lru_cache(maxsize=None)
+def get_bling_client() -> BlingClient:
+    return BlingClient()
+
+
+@lru_cache(maxsize=None)
+def get_normalization_service() -> NormalizationService:
+    return NormalizationService()
+
+
+@lru_cache(maxsize=None)
+def get_audit_service() -> AuditService:
+    return AuditService()
+
+
+@lru_cache(maxsize=None)
+def get_job_service() -> JobService:
+    return JobService(get_normalization_service(), get_audit_service())
+
+
+@lru_cache(maxsize=None)
+def get_sync_service() -> SyncService:
+    return SyncService()
+
+
+@lru_cache(maxsize=None)
+def get_product_mirror() -> ProductMirrorService:
+    return ProductMirrorService()
+
+
+@lru_cache(maxsize=None)
+def get_webhook_service() -> WebhookService:
+    return WebhookService()
@@ -0,0 +1,75 @@
+from fastapi import APIRouter, Query, Body, HTTPException, Depends
+from app.api.dependencies import get_job_service
+from app.services.normalization_service import NormalizationService
+from app.services.job_service import JobService
+from typing import List, Optional
+
+router = APIRouter()
+
+@router.post("/normalization")
+async def submit_normalization_job(
+    skus: Optional[List[str]] = Body(None),
+    category_id: int = Query(...),
+    dry_run: bool = Query(True),
+    use_ai: bool = Query(True),
+    concurrency: Optional[int] = Query(None, ge=1, le=50),
+    background: bool = Query(True),
+    job_service: JobService = Depends(get_job_service),
+):
+    """
+    Cria um job de normalização e retorna o job_id.
+    Sem `skus` no corpo, usa a lista de SKUs pendentes.
+    Com background=False o job só é criado; avance-o com /jobs/{job_id}/step.
+    """
+    if skus is None:
+        job = job_service.submit_pending(category_id, dry_run, use_ai, concurrency)
+    else:
+        job = job_service.submit(skus, category_id, dry_run, use_ai, concurrency)
+    if background:
+        job_service.start_background(job.id)
+    return {"job_id": job.id, "total": job.total, "background": background}
+
+@router.get("/{job_id}")
+def get_job(job_id: str, include_items: bool = Query(True), job_service: JobService = Depends(get_job_service)):
+    """Progresso do job e status de cada SKU."""
+    status = job_service.get_status(job_id, include_items=include_items)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return status
+
+@router.get("/{job_id}/results")
+def get_job_results(job_id: str, job_service: JobService = Depends(get_job_service)):
+    """Resultados dos SKUs já processados (mesmo formato de /normalization/normalize-skus)."""
+    results = job_service.get_results(job_id)
+    if results is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return {"job_id": job_id, "results": results, "summary": NormalizationService.summarize(results)}
+
+@router.post("/{job_id}/resume")
+async def resume_job(job_id: str, job_service: JobService = Depends(get_job_service)):
+    """
+    Retoma um job interrompido em segundo plano; SKUs já concluídos são pulados.
+    Reason: async - o job é disparado com asyncio.create_task, que exige o event loop
+    (um `def` rodaria no threadpool, sem loop).
+    """
+    if job_service.get_status(job_id, include_items=False) is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    started = job_service.start_background(job_id)
+    return {"job_id": job_id, "started": started}
+
+@router.post("/{job_id}/step")
+async def step_job(
+    job_id: str,
+    max_skus: int = Query(50, ge=1, le=1000),
+    job_service: JobService = Depends(get_job_service),
+):
+    """
+    Processa até `max_skus` SKUs pendentes dentro desta requisição.
+    Reason: Permite avançar o job em fatias que cabem no timeout da Vercel.
+    """
+    if job_service.is_running_here(job_id):
+        raise HTTPException(status_code=409, detail="Job já está rodando em segundo plano")
+    try:
+        return await job_service.run(job_id, max_skus=max_skus)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
@@ -1,35 +1,52 @@
-from fastapi import APIRouter, Query, Body
+from fastapi import APIRouter, Query, Body, Depends
+from app.api.dependencies import get_normalization_service, get_audit_service
 from app.services.normalization_service import NormalizationService
 from app.services.audit_service import AuditService
-from typing import List
+from app.services.enrichment_cache import get_enrichment_cache
+from typing import List, Optional
 
 router = APIRouter()
-norm_service = NormalizationService()
-audit_service = AuditService()
 
 @router.post("/normalize-skus")
 async def normalize_skus(
     skus: List[str] = Body(...), 
     category_id: int = Query(...), 
     dry_run: bool = Query(True),
-    use_ai: bool = Query(True)
+    use_ai: bool = Query(True),
+    concurrency: Optional[int] = Query(None, ge=1, le=50),
+    norm_service: NormalizationService = Depends(get_normalization_service),
 ):
     """
     Normaliza uma lista de SKUs aplicando uma categoria específica e preenchendo atributos com IA.
+    `concurrency` define quantos SKUs são processados em paralelo.
     """
-    results = await norm_service.batch_normalize(skus, category_id, dry_run, use_ai)
-    return {"results": results, "dry_run": dry_run}
+    results = await norm_service.batch_normalize(skus, category_id, dry_run, use_ai, concurrency=concurrency)
+    return {"results": results, "summary": norm_service.summarize(results), "dry_run": dry_run}
 
 @router.post("/normalize-pending-skus")
 async def normalize_pending_skus(
     category_id: int = Query(...), 
     dry_run: bool = Query(True),
-    use_ai: bool = Query(True)
+    use_ai: bool = Query(True),
+    concurrency: Optional[int] = Query(None, ge=1, le=50),
+    norm_service: NormalizationService = Depends(get_normalization_service),
+    audit_service: AuditService = Depends(get_audit_service),
 ):
     """
     Pega automaticamente a lista de SKUs pendentes (da imagem) 
     e tenta normalizá-los com a categoria informada usando IA.
     """
     pending_skus = audit_service.load_pending_skus()
-    results = await norm_service.batch_normalize(pending_skus, category_id, dry_run, use_ai)
-    return {"results": results, "dry_run": dry_run}
+    results = await norm_service.batch_normalize(pending_skus, category_id, dry_run, use_ai, concurrency=concurrency)
+    return {"results": results, "summary": norm_service.summarize(results), "dry_run": dry_run}
+
+@router.get("/ai-stats")
+def ai_stats(norm_service: NormalizationService = Depends(get_normalization_service)):
+    """
+    Diagnóstico do enriquecimento por IA (acertos/erros do cache, saúde dos modelos e tokens consumidos).
+    """
+    return {
+        "cache": get_enrichment_cache().stats(),
+        "models": norm_service.claude_service.model_status(),
+        "usage": norm_service.claude_service.usage_stats(),
+    }
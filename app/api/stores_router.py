@@ -1,11 +1,11 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
+from app.api.dependencies import get_bling_client
 from app.services.bling_client import BlingClient
 
 router = APIRouter()
-bling_client = BlingClient()
 
 @router.get("/list")
-async def list_stores():
+async def list_stores(bling_client: BlingClient = Depends(get_bling_client)):
     """
     Lista todas as lojas integradas no Bling para pegar os store_ids.
     """
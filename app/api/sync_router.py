@@ -1,15 +1,45 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Depends
+from typing import Optional
+from app.api.dependencies import get_sync_service, get_product_mirror
 from app.services.sync_service import SyncService
+from app.services.product_mirror_service import ProductMirrorService
+from app.services.bling_client import BlingClient
 
 router = APIRouter()
-sync_service = SyncService()
 
 @router.post("/categories")
-async def sync_categories(dry_run: bool = Query(True)):
+async def sync_categories(
+    dry_run: bool = Query(True),
+    concurrency: Optional[int] = Query(None, ge=1, le=50),
+    reconcile: bool = Query(True),
+    sync_service: SyncService = Depends(get_sync_service),
+):
     """
     Sincroniza as categorias internas com o Bling.
     Use dry_run=True (padrão) para simular as criações.
+    `concurrency` limita as chamadas simultâneas ao Bling (cada nível da árvore roda em paralelo).
+    Com reconcile=True (padrão) lê o Bling antes e só escreve as diferenças reais.
     """
-    results = await sync_service.sync_categories(dry_run=dry_run)
+    results = await sync_service.sync_categories(dry_run=dry_run, concurrency=concurrency, reconcile=reconcile)
     return {"results": results, "dry_run": dry_run}
 
+
+@router.post("/products-mirror")
+async def refresh_products_mirror(
+    full: bool = Query(False),
+    product_mirror: ProductMirrorService = Depends(get_product_mirror),
+):
+    """
+    Atualiza o espelho local de produtos do Bling (indexado por SKU).
+    Por padrão busca apenas produtos alterados desde a última sincronização;
+    use full=True para recarregar o catálogo inteiro.
+    """
+    return await product_mirror.refresh(full=full)
+
+@router.get("/bling-quota")
+def bling_quota():
+    """
+    Contadores ao vivo do agendador de requisições do Bling
+    (cota diária restante, tokens disponíveis, 429s e retentativas).
+    """
+    return BlingClient.quota_status()
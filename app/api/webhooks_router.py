@@ -0,0 +1,31 @@
+import json
+from fastapi import APIRouter, HTTPException, Request, Depends
+from app.api.dependencies import get_webhook_service
+from app.services.webhook_service import WebhookService
+
+router = APIRouter()
+
+@router.post("/bling", status_code=202)
+async def receive_bling_webhook(request: Request, webhook_service: WebhookService = Depends(get_webhook_service)):
+    """
+    Recebe notificações de produtos/categorias do Bling.
+    Valida a assinatura HMAC (X-Bling-Signature-256), descarta eventos repetidos
+    e enfileira a aplicação ao estado local (a resposta não espera o processamento).
+    """
+    body = await request.body()
+    if not webhook_service.verify_signature(body, request.headers.get(WebhookService.SIGNATURE_HEADER)):
+        raise HTTPException(status_code=401, detail="Assinatura do webhook inválida")
+
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Corpo do webhook não é JSON válido")
+    if not isinstance(payload, dict) or not payload.get("eventId"):
+        raise HTTPException(status_code=400, detail="Webhook sem eventId")
+
+    event = await webhook_service.record(payload)
+    if event is None:
+        return {"status": "duplicate", "event_id": str(payload["eventId"])}
+
+    queued = webhook_service.enqueue(event.event_id)
+    return {"status": "accepted", "event_id": event.event_id, "queued": queued}
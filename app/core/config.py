@@ -16,11 +16,119 @@ class Settings(BaseSettings):
         if self.DATABASE_URL.startswith("postgres://"):
             return self.DATABASE_URL.replace("postgres://", "postgresql+psycopg2://", 1)
         return self.DATABASE_URL
+
+    # Driver assíncrono equivalente (asyncpg / aiosqlite) para o AsyncSession
+    @property
+    def async_database_url(self) -> str:
+        url = self.sqlalchemy_database_url
+        for prefix in ("postgresql+psycopg2://", "postgresql://"):
+            if url.startswith(prefix):
+                return url.replace(prefix, "postgresql+asyncpg://", 1)
+        if url.startswith("sqlite://"):
+            return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+        return url
+
+    # Pool de conexões (Postgres): tamanho, excedente, espera por conexão (s) e reciclagem (s)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # SQLite: modo de journal, nível de sincronismo e espera por lock (ms)
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+
+    # Pula o create_all no boot quando o schema gravado no banco é igual ao dos modelos
+    SCHEMA_VERSION_CHECK: bool = True
     
+    # Antecedência (s) com que o access_token em memória é renovado antes de expirar
+    TOKEN_REFRESH_MARGIN_SECONDS: int = 60
+
+    # Pool HTTP compartilhado para chamadas ao Bling (keep-alive/HTTP/2)
+    BLING_HTTP2: bool = True
+    BLING_HTTP_MAX_CONNECTIONS: int = 20
+    BLING_HTTP_MAX_KEEPALIVE: int = 10
+    BLING_HTTP_KEEPALIVE_EXPIRY: float = 30.0
+    BLING_HTTP_TIMEOUT: float = 30.0
+    BLING_HTTP_CONNECT_TIMEOUT: float = 10.0
+
+    # Limites da API v3 do Bling (por segundo e por dia) e política de retentativas
+    BLING_RATE_LIMIT_PER_SECOND: float = 3.0
+    BLING_RATE_LIMIT_BURST: int = 3
+    BLING_DAILY_QUOTA: int = 120000
+    # Validade (s) do "restante" informado no header x-ratelimit-remaining (pode ser da janela, não do dia)
+    BLING_REPORTED_QUOTA_TTL_SECONDS: float = 60.0
+    BLING_MAX_RETRIES: int = 4
+    BLING_RETRY_BASE_DELAY: float = 1.0
+    BLING_RETRY_MAX_DELAY: float = 30.0
+
+    # Espelho local de produtos: o Bling filtra datas no horário de Brasília (UTC-3)
+    BLING_UTC_OFFSET_HOURS: int = -3
+    # Margem de sobreposição na sincronização incremental (protege contra diferença de relógio)
+    PRODUCT_MIRROR_OVERLAP_MINUTES: int = 5
+    # SKU ausente no espelho dispara uma atualização incremental, no máximo uma a cada N segundos
+    PRODUCT_MIRROR_MISS_REFRESH_SECONDS: float = 60.0
+
+    # Quantidade padrão de SKUs normalizados em paralelo
+    NORMALIZATION_CONCURRENCY: int = 5
+    # Chamadas simultâneas ao Bling na sincronização de categorias/vínculos
+    SYNC_CONCURRENCY: int = 5
+    # Categorias por lote de commit na sincronização (limita as escritas "em dúvida" após uma queda)
+    SYNC_COMMIT_BATCH_SIZE: int = 100
+    SYNC_JOURNAL_RECOVER_ON_STARTUP: bool = True
+    # Idade mínima (s) de uma entrada "pending" para ser recuperada (antes disso, a execução pode estar viva)
+    SYNC_JOURNAL_LEASE_SECONDS: float = 900.0
+    # SKUs por fatia processada em jobs de normalização (cada SKU tem checkpoint próprio)
+    JOB_CHUNK_SIZE: int = 50
+    # Validade (s) da reserva de uma fatia de SKUs; depois disso outra execução pode retomá-los
+    JOB_ITEM_LEASE_SECONDS: float = 900.0
+
     # API Claude (Anthropic) para inteligência de dados
     ANTHROPIC_API_KEY: str = ""
     # Modelo padrão (use um que exista na sua conta). "latest" tende a funcionar.
     ANTHROPIC_MODEL: str = "claude-3-5-sonnet-latest"
+    # Chamadas simultâneas ao Claude, timeout por chamada (s) e retentativas do SDK
+    CLAUDE_MAX_CONCURRENCY: int = 4
+    CLAUDE_TIMEOUT_SECONDS: float = 60.0
+    CLAUDE_MAX_RETRIES: int = 2
+    # Resfriamento (s) de um modelo após falha: indisponível (404/permissão) e transitória (base)
+    CLAUDE_MODEL_UNAVAILABLE_COOLDOWN_SECONDS: float = 3600.0
+    CLAUDE_MODEL_TRANSIENT_COOLDOWN_SECONDS: float = 15.0
+    # Orçamento de tokens: descrição enviada ao Claude e resposta (por atributo, com teto)
+    CLAUDE_PROMPT_MAX_DESCRIPTION_TOKENS: int = 600
+    CLAUDE_OUTPUT_TOKENS_PER_ATTRIBUTE: int = 24
+    CLAUDE_MAX_OUTPUT_TOKENS: int = 4096
+    # Folga sobre o tamanho esperado da resposta (multiplicador) - valores longos não cortam o JSON
+    CLAUDE_OUTPUT_TOKENS_HEADROOM: float = 1.5
+
+    # Enriquecimento em lote: máximo de produtos e de tokens de entrada (estimados) por chamada
+    CLAUDE_BATCH_MAX_PRODUCTS: int = 10
+    CLAUDE_BATCH_MAX_INPUT_TOKENS: int = 6000
+
+    # Cache de enriquecimento por IA (validade, tamanho máximo no banco e LRU em memória)
+    ENRICHMENT_CACHE_ENABLED: bool = True
+    ENRICHMENT_CACHE_TTL_HOURS: float = 24 * 30
+    ENRICHMENT_CACHE_MAX_ENTRIES: int = 50000
+    ENRICHMENT_CACHE_MEMORY_SIZE: int = 2000
+    
+    # Webhooks do Bling: segredo do HMAC (padrão: BLING_CLIENT_SECRET) e tamanho da fila em memória
+    BLING_WEBHOOK_SECRET: str = ""
+    WEBHOOK_QUEUE_MAXSIZE: int = 1000
+    # Varredura (s) de eventos que ficaram "received" (fila cheia) e idade mínima (s) para reenfileirar
+    WEBHOOK_SWEEP_INTERVAL_SECONDS: float = 30.0
+    WEBHOOK_SWEEP_MIN_AGE_SECONDS: float = 30.0
+
+    # Snapshots colunares (Parquet) do catálogo e linhas por bloco gravado
+    SNAPSHOT_DIR: str = "data/snapshots"
+    SNAPSHOT_ROW_GROUP_SIZE: int = 10000
+    
+    # Rastreamento por requisição (header Server-Timing) e endpoint de diagnóstico das mais lentas
+    TRACING_ENABLED: bool = True
+    TRACE_DEBUG_ENDPOINT: bool = False
+    TRACE_SLOW_THRESHOLD_MS: float = 1000.0
+    TRACE_BUFFER_SIZE: int = 20
+    TRACE_MAX_SPANS: int = 2000
     
     # Chave para criptografia de tokens sensíveis (AES)
     # Reason: Segurança extra para tokens armazenados no banco.
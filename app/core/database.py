@@ -1,6 +1,95 @@
+import asyncio
+from typing import Any, Dict, Optional
+from sqlalchemy import event
 from sqlmodel import create_engine
 from app.core.config import settings
+from app.core import metrics, tracing
+
+
+def _engine_options(url: str) -> Dict[str, Any]:
+    """Parâmetros do pool; o SQLite usa o pool padrão do SQLAlchemy."""
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+def _configure_sqlite(engine) -> None:
+    """
+    Reason: Com WAL os leitores não esperam o escritor (e vice-versa), e synchronous=NORMAL
+    evita um fsync por commit; sem isso as requisições concorrentes se enfileiram no lock do arquivo.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.close()
+
+
+def _instrument(engine) -> None:
+    # Reason: Duração de cada consulta exposta em /metrics e no Server-Timing
+    # (separa lentidão do banco da do Bling/Claude).
+    metrics.instrument_engine(engine)
+    tracing.instrument_engine(engine)
+
 
 # Reason: Centraliza a criação do engine para facilitar a troca de banco (SQLite -> Postgres)
-engine = create_engine(settings.sqlalchemy_database_url)
+engine = create_engine(settings.sqlalchemy_database_url, **_engine_options(settings.sqlalchemy_database_url))
+_configure_sqlite(engine)
+_instrument(engine)
+
+_async_engine = None
+_async_engine_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_async_engine():
+    """
+    Engine assíncrono (asyncpg / aiosqlite) para consultas feitas dentro de handlers async.
+    Reason: Criado no primeiro uso - o driver só é importado quando necessário (cold start).
+    As conexões do pool ficam presas ao event loop; se o loop mudar (ex: scripts que chamam
+    asyncio.run mais de uma vez), o pool antigo é descartado e o engine recriado.
+    """
+    global _async_engine, _async_engine_loop
+    loop = asyncio.get_running_loop()
+    if _async_engine is not None and _async_engine_loop is not loop:
+        _async_engine.sync_engine.dispose(close=False)
+        _async_engine = None
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        _async_engine_loop = loop
+
+        url = settings.async_database_url
+        _async_engine = create_async_engine(url, **_engine_options(url))
+        _configure_sqlite(_async_engine.sync_engine)
+        _instrument(_async_engine.sync_engine)
+    return _async_engine
+
+
+def async_session(expire_on_commit: bool = False):
+    """
+    Sessão assíncrona: `async with async_session() as session: ...`.
+    Reason: expire_on_commit=False por padrão - depois do commit, acessar um atributo
+    expirado exigiria um lazy load, que não é permitido fora de um await.
+    """
+    from sqlmodel.ext.asyncio.session import AsyncSession
+
+    return AsyncSession(get_async_engine(), expire_on_commit=expire_on_commit)
+
 
+async def dispose_async_engine() -> None:
+    """Fecha as conexões do pool assíncrono (shutdown da aplicação)."""
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
@@ -0,0 +1,58 @@
+import httpx
+from typing import Optional
+from app.core.config import settings
+
+# Reason: Um único pool de conexões (keep-alive/HTTP/2) compartilhado por todas as chamadas ao Bling,
+# evitando um handshake TCP+TLS novo a cada requisição.
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_available() -> bool:
+    """HTTP/2 no httpx depende do pacote opcional `h2` (instalado via `httpx[http2]`)."""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _build_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=settings.BLING_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.BLING_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=settings.BLING_HTTP_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(
+        settings.BLING_HTTP_TIMEOUT,
+        connect=settings.BLING_HTTP_CONNECT_TIMEOUT,
+    )
+    return httpx.AsyncClient(
+        http2=settings.BLING_HTTP2 and _http2_available(),
+        limits=limits,
+        timeout=timeout,
+    )
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Retorna o cliente HTTP compartilhado.
+
+    Reason: Fora do ciclo de vida do FastAPI (scripts, testes) o cliente é criado sob demanda.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+
+async def startup_http_client() -> None:
+    """Abre o pool de conexões no startup da aplicação."""
+    get_http_client()
+
+
+async def shutdown_http_client() -> None:
+    """Fecha o pool de conexões no shutdown da aplicação."""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
@@ -0,0 +1,246 @@
+import re
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Reason: Registro mínimo no formato texto do Prometheus, sem dependência extra.
+# Contadores/histogramas são atualizados nos caminhos quentes (Bling, Claude, banco, auth)
+# e lidos em /metrics; gauges calculados na hora vêm de callbacks.
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+
+class Gauge(_Metric):
+    """Gauge calculado na coleta a partir de uma função (ex: cota restante)."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], Iterable[Tuple[LabelValues, float]]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def collect(self) -> List[str]:
+        if not self.callback:
+            return []
+        try:
+            samples = list(self.callback())
+        except Exception:
+            # Reason: Uma fonte indisponível (ex: banco fora) não pode derrubar o /metrics inteiro.
+            return []
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in samples]
+
+
+class CallbackCounter(Gauge):
+    """Contador mantido em outro lugar (ex: contadores do cache) e lido na coleta."""
+
+    kind = "counter"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (contagem por bucket, soma, total)
+        self._values: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def time(self, **labels: str) -> "_Timer":
+        return _Timer(self, labels)
+
+    def collect(self) -> List[str]:
+        lines: List[str] = []
+        with self._lock:
+            items = sorted((key, (list(v[0]), v[1], v[2])) for key, v in self._values.items())
+        for key, (counts, total_sum, total_count) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, ("le", "+Inf"))
+            lines.append(f"{self.name}_bucket{labels} {total_count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total_sum)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {total_count}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        # Reason: Reimportar um módulo não deve duplicar a métrica.
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              callback: Optional[Callable[[], Iterable[Tuple[LabelValues, float]]]] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, callback))
+
+    def counter_callback(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                         callback: Optional[Callable[[], Iterable[Tuple[LabelValues, float]]]] = None) -> CallbackCounter:
+        return self.register(CallbackCounter(name, documentation, labelnames, callback))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            samples = metric.collect()
+            if samples:
+                lines.extend(metric.header())
+                lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_NUMERIC_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+def endpoint_template(endpoint: str) -> str:
+    """Agrupa endpoints por modelo ("produtos/123" -> "produtos/{id}") para não explodir a cardinalidade."""
+    return _NUMERIC_SEGMENT.sub("/{id}", "/" + endpoint.split("?", 1)[0].strip("/"))[1:]
+
+
+# Bling
+BLING_REQUESTS = registry.counter(
+    "bling_requests_total", "Respostas da API do Bling por endpoint e status HTTP.", ("method", "endpoint", "status"))
+BLING_LATENCY = registry.histogram(
+    "bling_request_duration_seconds", "Latência de cada chamada HTTP ao Bling.", ("method", "endpoint"))
+BLING_RETRIES = registry.counter(
+    "bling_retries_total", "Retentativas de chamadas ao Bling por motivo (429, 5xx, 401).", ("endpoint", "reason"))
+BLING_ERRORS = registry.counter(
+    "bling_request_errors_total", "Chamadas ao Bling que falharam sem resposta HTTP (timeout, conexão).", ("method", "endpoint", "error"))
+
+# Claude
+CLAUDE_REQUESTS = registry.counter(
+    "claude_requests_total", "Chamadas à API do Claude por modelo e resultado.", ("model", "outcome"))
+CLAUDE_LATENCY = registry.histogram(
+    "claude_request_duration_seconds", "Latência das chamadas ao Claude por modelo.", ("model",))
+CLAUDE_TOKENS = registry.counter(
+    "claude_tokens_total", "Tokens consumidos por modelo e tipo (input, output, cache_read, cache_creation).", ("model", "type"))
+
+# Auth
+AUTH_REFRESHES = registry.counter(
+    "auth_token_refresh_total", "Renovações do access_token do Bling por resultado.", ("outcome",))
+AUTH_REFRESH_LATENCY = registry.histogram(
+    "auth_token_refresh_duration_seconds", "Duração da renovação do access_token.")
+
+# Banco
+DB_QUERIES = registry.histogram(
+    "db_query_duration_seconds", "Duração das consultas ao banco por tipo de comando.", ("statement",), buckets=DB_BUCKETS)
+
+
+def instrument_engine(engine) -> None:
+    """Mede cada consulta do engine via eventos do SQLAlchemy."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_metrics_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("_metrics_start")
+        if starts:
+            verb = (statement.lstrip().split(None, 1) or ["OTHER"])[0].upper()
+            DB_QUERIES.observe(time.perf_counter() - starts.pop(), statement=verb)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        starts = context.connection.info.get("_metrics_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
@@ -0,0 +1,59 @@
+import hashlib
+import logging
+from typing import Optional
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import Session, SQLModel
+from app.core.config import settings
+# Reason: Import explícito de todos os modelos - o create_all só conhece as tabelas
+# registradas no metadata, e os routers não importam mais os serviços no boot.
+from app.models import auth, catalog, enrichment, jobs, sync, webhooks  # noqa: F401
+from app.models.schema import SchemaVersion
+
+logger = logging.getLogger(__name__)
+
+
+def schema_fingerprint() -> str:
+    """Hash estável das tabelas, colunas e índices declarados nos modelos."""
+    parts = []
+    for table in sorted(SQLModel.metadata.tables.values(), key=lambda t: t.name):
+        parts.append(f"table {table.name}")
+        for column in table.columns:
+            parts.append(f"  {column.name} {column.type} null={column.nullable} pk={column.primary_key}")
+        for index in sorted(table.indexes, key=lambda i: i.name or ""):
+            parts.append(f"  index {index.name} {[c.name for c in index.columns]} unique={index.unique}")
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def _stored_fingerprint(engine) -> Optional[str]:
+    try:
+        with Session(engine) as session:
+            row = session.get(SchemaVersion, "app")
+            return row.fingerprint if row else None
+    except SQLAlchemyError:
+        # Banco novo: a tabela de versão ainda não existe.
+        return None
+
+
+def ensure_schema(engine) -> bool:
+    """
+    Cria as tabelas que faltam, a menos que o banco já esteja no schema atual.
+
+    Returns:
+        True se o create_all rodou; False se foi pulado (uma única consulta no boot).
+    """
+    fingerprint = schema_fingerprint()
+    if settings.SCHEMA_VERSION_CHECK and _stored_fingerprint(engine) == fingerprint:
+        return False
+
+    SQLModel.metadata.create_all(engine)
+    try:
+        with Session(engine) as session:
+            row = session.get(SchemaVersion, "app") or SchemaVersion(fingerprint=fingerprint)
+            row.fingerprint = fingerprint
+            session.add(row)
+            session.commit()
+    except SQLAlchemyError:
+        # Reason: Dois cold starts simultâneos podem gravar a versão ao mesmo tempo;
+        # o schema já está criado, então basta seguir (o próximo boot confere de novo).
+        logger.warning("Não foi possível gravar a versão do schema.", exc_info=True)
+    return True
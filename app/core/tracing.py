@@ -0,0 +1,185 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+from app.core.config import settings
+
+# Reason: Rastreamento leve por requisição (sem profiler): cada chamada ao Bling, ao Claude
+# e ao banco registra seu intervalo no trace da requisição atual (via contextvars, que
+# acompanham as tasks do asyncio.gather). Com isso o tempo total é dividido em
+# Bling / Claude / DB / processamento local no header Server-Timing.
+
+# Categorias externas; o que não estiver coberto por elas é processamento local ("app")
+EXTERNAL = ("bling", "claude", "db")
+
+
+class Span:
+    __slots__ = ("name", "category", "attrs", "start", "end", "children", "db_count", "db_time")
+
+    def __init__(self, name: str, category: str = "app", attrs: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.category = category
+        self.attrs = attrs or {}
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.children: List["Span"] = []
+        # Reason: Consultas ao banco são muitas e curtas; ficam agregadas no span em vez de virar nós.
+        self.db_count = 0
+        self.db_time = 0.0
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        end = self.end if self.end is not None else time.perf_counter()
+        data: Dict[str, Any] = {
+            "name": self.name,
+            "category": self.category,
+            "start_ms": round((self.start - origin) * 1000, 2),
+            "duration_ms": round((end - self.start) * 1000, 2),
+        }
+        if self.attrs:
+            data["attrs"] = self.attrs
+        if self.db_count:
+            data["db"] = {"queries": self.db_count, "duration_ms": round(self.db_time * 1000, 2)}
+        if self.children:
+            data["children"] = [child.to_dict(origin) for child in self.children]
+        return data
+
+
+class Trace:
+    def __init__(self, name: str):
+        self.root = Span(name, "app")
+        self.intervals: Dict[str, List[Tuple[float, float]]] = {category: [] for category in EXTERNAL}
+        self.span_count = 1
+
+    def add_span(self, parent: Span, span: Span) -> bool:
+        """Anexa o span à árvore (limitado por TRACE_MAX_SPANS para não crescer sem controle)."""
+        if self.span_count >= settings.TRACE_MAX_SPANS:
+            return False
+        parent.children.append(span)
+        self.span_count += 1
+        return True
+
+    def record(self, category: str, start: float, end: float) -> None:
+        if category in self.intervals:
+            self.intervals[category].append((start, end))
+
+    @staticmethod
+    def _union(intervals: List[Tuple[float, float]]) -> float:
+        """Tempo coberto pelos intervalos (chamadas paralelas não são somadas duas vezes)."""
+        total = 0.0
+        current_start = current_end = None
+        for start, end in sorted(intervals):
+            if current_end is None or start > current_end:
+                if current_end is not None:
+                    total += current_end - current_start
+                current_start, current_end = start, end
+            else:
+                current_end = max(current_end, end)
+        if current_end is not None:
+            total += current_end - current_start
+        return total
+
+    def breakdown(self) -> Dict[str, float]:
+        """Tempo de parede (ms) por categoria; "app" = total menos a união das chamadas externas."""
+        end = self.root.end if self.root.end is not None else time.perf_counter()
+        total = end - self.root.start
+        result = {category: self._union(self.intervals[category]) * 1000 for category in EXTERNAL}
+        external = self._union([interval for category in EXTERNAL for interval in self.intervals[category]])
+        result["app"] = max(total - external, 0.0) * 1000
+        result["total"] = total * 1000
+        return result
+
+    def server_timing(self) -> str:
+        return ", ".join(f"{name};dur={duration:.1f}" for name, duration in self.breakdown().items())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "breakdown_ms": {name: round(duration, 2) for name, duration in self.breakdown().items()},
+            "spans": self.span_count,
+            "tree": self.root.to_dict(self.root.start),
+        }
+
+
+_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_span: ContextVar[Optional[Span]] = ContextVar("span", default=None)
+
+# Últimas requisições lentas (para o endpoint de diagnóstico)
+_slow: Deque[Dict[str, Any]] = deque(maxlen=max(1, settings.TRACE_BUFFER_SIZE))
+
+
+def current_trace() -> Optional[Trace]:
+    return _trace.get()
+
+
+@contextmanager
+def start_trace(name: str) -> Iterator[Trace]:
+    """Abre o trace da requisição; ao fechar, guarda-o se passar do limite de lentidão."""
+    trace = Trace(name)
+    trace_token = _trace.set(trace)
+    span_token = _span.set(trace.root)
+    try:
+        yield trace
+    finally:
+        trace.root.end = time.perf_counter()
+        _span.reset(span_token)
+        _trace.reset(trace_token)
+        if trace.breakdown()["total"] >= settings.TRACE_SLOW_THRESHOLD_MS:
+            _slow.append({"request": name, "finished_at": time.time(), **trace.to_dict()})
+
+
+@contextmanager
+def span(name: str, category: str = "app", /, **attrs: Any) -> Iterator[Optional[Span]]:
+    """
+    Mede um trecho da requisição atual. Fora de uma requisição rastreada não faz nada.
+
+    Args:
+        category: "bling", "claude" ou "db" entram na divisão do Server-Timing;
+            "app" serve só para agrupar na árvore (ex: um span por SKU).
+    """
+    trace = _trace.get()
+    if trace is None:
+        yield None
+        return
+    parent = _span.get() or trace.root
+    current = Span(name, category, attrs)
+    attached = trace.add_span(parent, current)
+    token = _span.set(current if attached else parent)
+    try:
+        yield current
+    finally:
+        current.end = time.perf_counter()
+        _span.reset(token)
+        trace.record(category, current.start, current.end)
+
+
+def slow_traces(limit: int) -> List[Dict[str, Any]]:
+    """Últimas `limit` requisições lentas, da mais recente para a mais antiga."""
+    return list(reversed(_slow))[:limit]
+
+
+def instrument_engine(engine) -> None:
+    """Registra o tempo de cada consulta do engine no trace da requisição atual."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _trace.get() is not None:
+            conn.info.setdefault("_trace_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        trace = _trace.get()
+        starts = conn.info.get("_trace_start")
+        if trace is None or not starts:
+            return
+        start, end = starts.pop(), time.perf_counter()
+        trace.record("db", start, end)
+        current = _span.get() or trace.root
+        current.db_count += 1
+        current.db_time += end - start
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        starts = context.connection.info.get("_trace_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
@@ -1,11 +1,22 @@
-from fastapi import FastAPI
-from app.api import auth_router, audit_router, sync_router, normalization_router, stores_router
+import asyncio
+import logging
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+from app.api import auth_router, audit_router, sync_router, normalization_router, stores_router, jobs_router, webhooks_router, debug_router
 from app.core.config import settings
-from app.core.database import engine
-from sqlmodel import SQLModel
+from app.api.dependencies import get_webhook_service
+from app.core.database import engine, dispose_async_engine
+from app.core import metrics, tracing
+from app.core.http_client import startup_http_client, shutdown_http_client
+from app.core.schema import ensure_schema
+from app.services.sync_journal_service import recover_on_startup
+from app.services.webhook_service import WebhookService
+
+logger = logging.getLogger(__name__)
 
 def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
+    # Reason: No cold start da Vercel o create_all só roda se o schema dos modelos mudou.
+    ensure_schema(engine)
 
 app = FastAPI(
     title="Cathalog Sync API",
@@ -13,9 +24,49 @@ app = FastAPI(
     version="0.1.0"
 )
 
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    """
+    Divide o tempo de cada requisição em Bling / Claude / DB / processamento local
+    no header Server-Timing (visível no DevTools do navegador).
+    """
+    if not settings.TRACING_ENABLED or request.url.path == "/metrics":
+        return await call_next(request)
+    with tracing.start_trace(f"{request.method} {request.url.path}") as trace:
+        response = await call_next(request)
+        # Reason: Em respostas em streaming o header cobre só até o início do envio.
+        response.headers["Server-Timing"] = trace.server_timing()
+    return response
+
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     create_db_and_tables()
+    await startup_http_client()
+    app.state.journal_recovery = None
+    if settings.SYNC_JOURNAL_RECOVER_ON_STARTUP:
+        # Reason: Em segundo plano para não atrasar o boot (a recuperação pode consultar o Bling).
+        # A referência em app.state impede que a task seja coletada no meio da execução.
+        task = asyncio.create_task(recover_on_startup())
+        task.add_done_callback(_log_task_failure)
+        app.state.journal_recovery = task
+    get_webhook_service().start_worker()
+
+def _log_task_failure(task: "asyncio.Task[None]") -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Tarefa de startup falhou", exc_info=task.exception())
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    recovery = getattr(app.state, "journal_recovery", None)
+    if recovery and not recovery.done():
+        recovery.cancel()
+        try:
+            await recovery
+        except asyncio.CancelledError:
+            pass
+    await WebhookService.stop_worker()
+    await shutdown_http_client()
+    await dispose_async_engine()
 
 # Registro de Rotas
 app.include_router(auth_router.router, prefix="/auth", tags=["Auth"])
@@ -23,8 +74,15 @@ app.include_router(audit_router.router, prefix="/audit", tags=["Audit"])
 app.include_router(sync_router.router, prefix="/sync", tags=["Sync"])
 app.include_router(normalization_router.router, prefix="/normalization", tags=["Normalization"])
 app.include_router(stores_router.router, prefix="/stores", tags=["Stores"])
+app.include_router(jobs_router.router, prefix="/jobs", tags=["Jobs"])
+app.include_router(webhooks_router.router, prefix="/webhooks", tags=["Webhooks"])
+app.include_router(debug_router.router, prefix="/debug", tags=["Debug"])
 
 @app.get("/")
 def read_root():
     return {"status": "online", "message": "Cathalog Sync is running"}
 
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    """Métricas no formato texto do Prometheus (Bling, Claude, cache, auth e banco)."""
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
@@ -48,3 +48,28 @@ class AttributeRequirement(SQLModel, table=True):
     is_required: bool = True
     default_value: Optional[str] = None
 
+
+class BlingProduct(SQLModel, table=True):
+    """
+    Espelho local dos produtos do Bling.
+    Reason: Resolver SKU -> ID do Bling com uma consulta indexada, sem listar o catálogo na API.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    bling_id: str = Field(index=True, unique=True)
+    codigo: Optional[str] = Field(default=None, index=True)  # SKU
+    nome: Optional[str] = None
+    situacao: Optional[str] = None
+    categoria_bling_id: Optional[str] = Field(default=None, index=True)
+    categoria_nome: Optional[str] = None
+
+    synced_at: datetime = Field(default_factory=datetime.utcnow)
+
+class MirrorSyncState(SQLModel, table=True):
+    """
+    Marca d'água da sincronização do espelho local.
+    Reason: Permite buscar no Bling apenas o que foi alterado desde a última execução.
+    """
+    name: str = Field(primary_key=True)  # Ex: 'products'
+    last_synced_at: Optional[datetime] = None
+    last_full_sync_at: Optional[datetime] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
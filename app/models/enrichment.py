@@ -0,0 +1,17 @@
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+from typing import Optional
+
+class EnrichmentCacheEntry(SQLModel, table=True):
+    """
+    Resultado de enriquecimento por IA, endereçado pelo conteúdo da entrada.
+    Reason: Reexecutar a normalização do mesmo produto não deve pagar outra chamada ao Claude.
+    """
+    # SHA-256 de (título, descrição, atributos ordenados, modelo, versão do prompt)
+    key: str = Field(primary_key=True)
+    model: str
+    prompt_version: str
+    result_json: str
+    hits: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    last_hit_at: Optional[datetime] = Field(default=None, index=True)
@@ -0,0 +1,41 @@
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+from typing import Optional
+
+class NormalizationJob(SQLModel, table=True):
+    """
+    Job de normalização em lote executado em segundo plano.
+    Reason: Lotes grandes não cabem no timeout de uma requisição HTTP na Vercel.
+    """
+    id: str = Field(primary_key=True)  # uuid4 hex
+    status: str = Field(default="pending", index=True)  # pending, running, completed, failed
+    category_id: int
+    dry_run: bool = True
+    use_ai: bool = True
+    concurrency: Optional[int] = None
+
+    total: int = 0
+    processed: int = 0
+    errors: int = 0
+    last_error: Optional[str] = None
+
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+
+class NormalizationJobItem(SQLModel, table=True):
+    """
+    Checkpoint por SKU de um job.
+    Reason: Cada resultado é gravado ao terminar; um job reiniciado pula os SKUs concluídos.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    job_id: str = Field(foreign_key="normalizationjob.id", index=True)
+    position: int
+    sku: str
+    status: str = Field(default="pending", index=True)  # pending, processing ou o status do resultado
+    # Reason: Reserva do item por uma execução (evita que /step, /resume e outras instâncias
+    # processem o mesmo SKU); uma reserva vencida (execução que caiu) pode ser retomada.
+    lease_owner: Optional[str] = None
+    lease_until: Optional[datetime] = Field(default=None, index=True)
+    result_json: Optional[str] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,12 @@
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+
+class SchemaVersion(SQLModel, table=True):
+    """
+    Impressão digital do schema aplicado ao banco.
+    Reason: Se bater com a dos modelos atuais, o boot pula o create_all
+    (que inspeciona tabela por tabela a cada cold start).
+    """
+    name: str = Field(default="app", primary_key=True)
+    fingerprint: str
+    applied_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,28 @@
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+from typing import Optional
+
+class SyncJournalEntry(SQLModel, table=True):
+    """
+    Diário de escritas no Bling feitas pela sincronização de categorias.
+    Reason: A intenção é gravada ANTES do POST e o resultado DEPOIS; se o processo cair
+    no meio, a recuperação sabe quais escritas ficaram em dúvida e as resolve no Bling.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    run_id: str = Field(index=True)
+    operation: str  # create_category, link_category
+    status: str = Field(default="pending", index=True)  # pending, done, failed, skipped, abandoned
+
+    category_id: int = Field(foreign_key="category.id", index=True)
+    mapping_id: Optional[int] = Field(default=None, foreign_key="categorymapping.id")
+    # Dados necessários para localizar a escrita no Bling durante a recuperação
+    name: Optional[str] = None
+    parent_bling_id: Optional[str] = None
+    bling_store_id: Optional[str] = None
+    external_category_id: Optional[str] = None
+
+    bling_id: Optional[str] = None  # ID retornado/encontrado no Bling
+    error: Optional[str] = None
+
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,19 @@
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+from typing import Optional
+
+class WebhookEvent(SQLModel, table=True):
+    """
+    Notificação recebida do Bling (webhook).
+    Reason: A chave primária é o ID do evento, garantindo que reenvios do Bling
+    não sejam aplicados duas vezes.
+    """
+    event_id: str = Field(primary_key=True)
+    event: str = Field(index=True)  # ex: product.updated, category.deleted
+    resource_id: Optional[str] = Field(default=None, index=True)
+    status: str = Field(default="received", index=True)  # received, applied, ignored, failed
+    payload_json: str
+    error: Optional[str] = None
+
+    received_at: datetime = Field(default_factory=datetime.utcnow)
+    processed_at: Optional[datetime] = None
@@ -1,7 +1,10 @@
 import json
+from contextlib import aclosing
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncIterator, Optional
 from app.services.bling_client import BlingClient
+from app.services.product_mirror_service import ProductMirrorService
+from app.services.snapshot_service import CatalogSnapshotService
 
 class AuditService:
     """
@@ -11,6 +14,8 @@ class AuditService:
 
     def __init__(self):
         self.bling_client = BlingClient()
+        self.product_mirror = ProductMirrorService(self.bling_client)
+        self.snapshots = CatalogSnapshotService(self.bling_client, self.product_mirror)
         self.pending_skus_path = "data/pending_skus.json"
 
     def load_pending_skus(self) -> List[str]:
@@ -19,47 +24,64 @@ class AuditService:
                 return json.load(f)
         return []
 
-    async def run_audit(self) -> Dict[str, Any]:
+    async def run_audit(self, source: str = "bling", snapshot: Optional[str] = None) -> Dict[str, Any]:
         """
         Executa a auditoria completa.
+
+        Args:
+            source: "bling" percorre o catálogo na API; "mirror" atualiza o espelho local
+                de forma incremental e audita sobre ele (consultas indexadas); "snapshot"
+                audita um snapshot Parquet, sem nenhuma chamada ao Bling.
+            snapshot: Nome do snapshot (padrão: o mais recente). Só para source="snapshot".
         """
+        if source == "mirror":
+            return await self._run_audit_on_mirror()
+        if source == "snapshot":
+            name = snapshot or self.snapshots.latest()
+            if not name:
+                raise FileNotFoundError("Nenhum snapshot do catálogo disponível")
+            return self.snapshots.audit(name, self.load_pending_skus())
+
         pending_skus = self.load_pending_skus()
         
-        # 1. Buscar produtos do Bling (usando paginação simples para auditoria inicial)
-        # Nota: Em um cenário real com milhares de produtos, usaríamos um Job assíncrono.
-        all_products = await self.bling_client.get_products(limit=100)
-        
+        pending_set = set(pending_skus)
+
         audit_results = {
-            "total_bling_products": len(all_products),
+            "total_bling_products": 0,
             "pending_skus_found_in_bling": [],
             "pending_skus_missing_in_bling": [],
             "products_without_category": [],
             "summary": {}
         }
 
-        bling_skus = {p.get("codigo"): p for p in all_products if p.get("codigo")}
+        # 1. Percorrer o catálogo completo do Bling (todas as páginas)
+        found: Dict[str, Dict[str, Any]] = {}
+        async for product in self.bling_client.iter_products():
+            audit_results["total_bling_products"] += 1
+            sku = product.get("codigo")
 
-        # Verificar SKUs pendentes
-        for sku in pending_skus:
-            if sku in bling_skus:
-                product = bling_skus[sku]
-                audit_results["pending_skus_found_in_bling"].append({
+            if sku in pending_set and sku not in found:
+                found[sku] = {
                     "sku": sku,
                     "id": product.get("id"),
                     "nome": product.get("nome"),
-                    "categoria": product.get("categoria", {}).get("nome", "SEM CATEGORIA")
-                })
-            else:
-                audit_results["pending_skus_missing_in_bling"].append(sku)
+                    "categoria": (product.get("categoria") or {}).get("nome", "SEM CATEGORIA")
+                }
 
-        # Identificar produtos sem categoria no Bling
-        for product in all_products:
+            # Identificar produtos sem categoria no Bling
             if not product.get("categoria"):
                 audit_results["products_without_category"].append({
-                    "sku": product.get("codigo"),
+                    "sku": sku,
                     "nome": product.get("nome")
                 })
 
+        # Verificar SKUs pendentes (mantém a ordem da lista de pendentes)
+        for sku in pending_skus:
+            if sku in found:
+                audit_results["pending_skus_found_in_bling"].append(found[sku])
+            else:
+                audit_results["pending_skus_missing_in_bling"].append(sku)
+
         audit_results["summary"] = {
             "total_pending_requested": len(pending_skus),
             "found_pending": len(audit_results["pending_skus_found_in_bling"]),
@@ -69,3 +91,104 @@ class AuditService:
 
         return audit_results
 
+
+    async def _run_audit_on_mirror(self) -> Dict[str, Any]:
+        """Auditoria sobre o espelho local de produtos (sem listar o catálogo na API)."""
+        pending_skus = self.load_pending_skus()
+        mirror_refresh = await self.product_mirror.refresh()
+
+        found = await self.product_mirror.resolve_skus(pending_skus)
+        audit_results = {
+            "total_bling_products": await self.product_mirror.count(),
+            "pending_skus_found_in_bling": [
+                {
+                    "sku": sku,
+                    "id": found[sku].bling_id,
+                    "nome": found[sku].nome,
+                    "categoria": found[sku].categoria_nome or "SEM CATEGORIA",
+                }
+                for sku in pending_skus if sku in found
+            ],
+            "pending_skus_missing_in_bling": [sku for sku in pending_skus if sku not in found],
+            "products_without_category": [
+                {"sku": row.codigo, "nome": row.nome}
+                for row in await self.product_mirror.products_without_category()
+            ],
+            "mirror_refresh": mirror_refresh,
+        }
+        audit_results["summary"] = {
+            "total_pending_requested": len(pending_skus),
+            "found_pending": len(audit_results["pending_skus_found_in_bling"]),
+            "missing_pending": len(audit_results["pending_skus_missing_in_bling"]),
+            "total_without_category": len(audit_results["products_without_category"])
+        }
+        return audit_results
+
+    async def stream_audit(self, source: str = "bling") -> AsyncIterator[Dict[str, Any]]:
+        """
+        Auditoria em streaming: emite cada achado assim que é encontrado e o resumo ao final.
+
+        Eventos (campo "type"): "pending_found", "without_category", "pending_missing" e "summary".
+
+        Reason: O catálogo é consumido página a página e nada é acumulado além do conjunto
+        de SKUs pendentes, então a memória não cresce com o tamanho do catálogo.
+        """
+        pending_skus = self.load_pending_skus()
+        pending_set = set(pending_skus)
+        found: set = set()
+        summary = {
+            "total_bling_products": 0,
+            "total_pending_requested": len(pending_skus),
+            "found_pending": 0,
+            "missing_pending": 0,
+            "total_without_category": 0,
+        }
+
+        if source == "mirror":
+            summary["mirror_refresh"] = await self.product_mirror.refresh()
+            summary["total_bling_products"] = await self.product_mirror.count()
+            rows = await self.product_mirror.resolve_skus(pending_skus)
+            for sku in pending_skus:
+                if sku in rows and sku not in found:
+                    found.add(sku)
+                    summary["found_pending"] += 1
+                    yield {
+                        "type": "pending_found",
+                        "sku": sku,
+                        "id": rows[sku].bling_id,
+                        "nome": rows[sku].nome,
+                        "categoria": rows[sku].categoria_nome or "SEM CATEGORIA",
+                    }
+            async for row in self.product_mirror.iter_products_without_category():
+                summary["total_without_category"] += 1
+                yield {"type": "without_category", "sku": row.codigo, "nome": row.nome}
+        else:
+            # Reason: aclosing cancela a pré-busca de páginas se o cliente desconectar no meio.
+            async with aclosing(self.bling_client.iter_products()) as products:
+                async for product in products:
+                    summary["total_bling_products"] += 1
+                    sku = product.get("codigo")
+
+                    if sku in pending_set and sku not in found:
+                        found.add(sku)
+                        summary["found_pending"] += 1
+                        yield {
+                            "type": "pending_found",
+                            "sku": sku,
+                            "id": product.get("id"),
+                            "nome": product.get("nome"),
+                            "categoria": (product.get("categoria") or {}).get("nome", "SEM CATEGORIA"),
+                        }
+
+                    if not product.get("categoria"):
+                        summary["total_without_category"] += 1
+                        yield {"type": "without_category", "sku": sku, "nome": product.get("nome")}
+
+        # Faltantes só são conhecidos depois de percorrer o catálogo inteiro
+        for sku in pending_skus:
+            if sku not in found:
+                found.add(sku)
+                summary["missing_pending"] += 1
+                yield {"type": "pending_missing", "sku": sku}
+
+        yield {"type": "summary", **summary}
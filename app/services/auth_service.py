@@ -1,34 +1,87 @@
-import httpx
+import asyncio
 from datetime import datetime, timedelta
+from typing import Optional
 import base64
-from sqlmodel import Session, select
+from sqlmodel import select
 from app.core.config import settings, assert_bling_oauth_configured
-from app.core.database import engine
+from app.core.database import async_session
+from app.core.http_client import get_http_client
+from app.core import metrics
 from app.models.auth import BlingToken
 
 class AuthService:
     """
     Serviço para gerenciar a autenticação e renovação de tokens.
     """
-    
+
+    # Reason: Cache em memória do processo - evita abrir sessão no banco a cada requisição ao Bling.
+    _cached_access_token: Optional[str] = None
+    _cached_expires_at: Optional[datetime] = None
+    _refresh_lock: Optional[asyncio.Lock] = None
+    _lock_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @classmethod
+    def _get_lock(cls) -> asyncio.Lock:
+        # Reason: asyncio.Lock fica preso ao event loop em que foi usado; recriamos se o loop mudar
+        # (ex: scripts que chamam asyncio.run mais de uma vez).
+        loop = asyncio.get_running_loop()
+        if cls._refresh_lock is None or cls._lock_loop is not loop:
+            cls._refresh_lock = asyncio.Lock()
+            cls._lock_loop = loop
+        return cls._refresh_lock
+
+    @classmethod
+    def _cached_token_if_valid(cls) -> Optional[str]:
+        margin = timedelta(seconds=settings.TOKEN_REFRESH_MARGIN_SECONDS)
+        if cls._cached_access_token and cls._cached_expires_at and datetime.utcnow() + margin < cls._cached_expires_at:
+            return cls._cached_access_token
+        return None
+
+    @classmethod
+    def _store_in_cache(cls, token: BlingToken) -> None:
+        cls._cached_access_token = token.access_token
+        cls._cached_expires_at = token.expires_at
+
+    @classmethod
+    def invalidate_cache(cls) -> None:
+        """Descarta o token em memória (ex: após novo login ou um 401 do Bling)."""
+        cls._cached_access_token = None
+        cls._cached_expires_at = None
+
     @staticmethod
     async def get_valid_token() -> str:
         """
         Retorna um access_token válido. 
         Se o atual estiver expirado, renova automaticamente usando o refresh_token.
+
+        Reason: O token fica em memória até pouco antes de expirar; a renovação é
+        single-flight (um único refresh para N chamadores concorrentes), pois o
+        refresh_token do Bling só pode ser usado uma vez.
         """
         assert_bling_oauth_configured()
-        with Session(engine) as session:
-            statement = select(BlingToken).order_by(BlingToken.created_at.desc())
-            token = session.exec(statement).first()
-            
+        cached = AuthService._cached_token_if_valid()
+        if cached:
+            return cached
+
+        async with AuthService._get_lock():
+            # Outro chamador pode ter renovado enquanto esperávamos o lock
+            cached = AuthService._cached_token_if_valid()
+            if cached:
+                return cached
+
+            # Reason: Sessão assíncrona - a leitura do token não bloqueia o event loop.
+            async with async_session() as session:
+                statement = select(BlingToken).order_by(BlingToken.created_at.desc())
+                token = (await session.exec(statement)).first()
+
             if not token:
                 raise Exception("Nenhum token encontrado. Por favor, autentique primeiro.")
-            
-            # Margem de segurança de 1 minuto
-            if datetime.utcnow() + timedelta(minutes=1) < token.expires_at:
-                return token.access_token
-            
+
+            AuthService._store_in_cache(token)
+            cached = AuthService._cached_token_if_valid()
+            if cached:
+                return cached
+
             # Token expirado ou próximo de expirar: renovar
             return await AuthService.refresh_access_token(token)
 
@@ -52,23 +105,31 @@ class AuthService:
             "refresh_token": token_obj.refresh_token
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(token_url, data=data, headers=headers)
-            
-            if response.status_code != 200:
-                raise Exception(f"Erro ao renovar token: {response.text}")
-            
-            new_data = response.json()
-            
-            with Session(engine) as session:
-                token_obj.access_token = new_data["access_token"]
-                token_obj.refresh_token = new_data["refresh_token"]
-                token_obj.expires_at = datetime.utcnow() + timedelta(seconds=new_data["expires_in"])
-                token_obj.updated_at = datetime.utcnow()
-                
-                session.add(token_obj)
-                session.commit()
-                session.refresh(token_obj)
-                
-                return token_obj.access_token
+        # Reason: Reaproveita o mesmo pool de conexões usado pelo BlingClient.
+        client = get_http_client()
+        try:
+            with metrics.AUTH_REFRESH_LATENCY.time():
+                response = await client.post(token_url, data=data, headers=headers)
+        except Exception:
+            metrics.AUTH_REFRESHES.inc(outcome="network_error")
+            raise
+
+        if response.status_code != 200:
+            metrics.AUTH_REFRESHES.inc(outcome="rejected")
+            raise Exception(f"Erro ao renovar token: {response.text}")
+        metrics.AUTH_REFRESHES.inc(outcome="success")
+
+        new_data = response.json()
+
+        async with async_session() as session:
+            token_obj.access_token = new_data["access_token"]
+            token_obj.refresh_token = new_data["refresh_token"]
+            token_obj.expires_at = datetime.utcnow() + timedelta(seconds=new_data["expires_in"])
+            token_obj.updated_at = datetime.utcnow()
+
+            session.add(token_obj)
+            await session.commit()
+            await session.refresh(token_obj)
 
+            AuthService._store_in_cache(token_obj)
+            return token_obj.access_token
@@ -1,6 +1,60 @@
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import List, Dict, Any, AsyncIterator, Iterable, Optional
 import httpx
-from typing import List, Dict, Any
+from app.core.config import settings
+from app.core.http_client import get_http_client
+from app.core import metrics, tracing
 from app.services.auth_service import AuthService
+from app.services.rate_limiter import RequestScheduler
+
+# Reason: O limite do Bling é por conta, então o agendador é único no processo
+# (todas as instâncias de BlingClient compartilham o mesmo orçamento).
+_scheduler: Optional[RequestScheduler] = None
+
+
+def get_scheduler() -> RequestScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = RequestScheduler(
+            rate_per_second=settings.BLING_RATE_LIMIT_PER_SECOND,
+            burst=settings.BLING_RATE_LIMIT_BURST,
+            daily_limit=settings.BLING_DAILY_QUOTA,
+            utc_offset_hours=settings.BLING_UTC_OFFSET_HOURS,
+            reported_ttl_seconds=settings.BLING_REPORTED_QUOTA_TTL_SECONDS,
+        )
+    return _scheduler
+
+
+def _quota_samples():
+    status = get_scheduler().status()
+    return [
+        (("limit",), status["daily_limit"]),
+        (("used",), status["daily_used"]),
+        (("remaining",), status["daily_remaining"]),
+    ]
+
+
+metrics.registry.gauge(
+    "bling_daily_quota", "Cota diária de requisições do Bling (limite, usadas e restantes).", ("kind",),
+    callback=_quota_samples,
+)
+metrics.registry.gauge(
+    "bling_rate_tokens_available", "Tokens disponíveis no token bucket do Bling.",
+    callback=lambda: [((), get_scheduler().status()["tokens_available"])],
+)
+
+
+class BlingAPIError(Exception):
+    """Erro retornado pela API do Bling (mantém o status HTTP para quem precisar decidir)."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
 
 class BlingClient:
     """
@@ -9,28 +63,222 @@ class BlingClient:
     """
     
     BASE_URL = "https://www.bling.com.br/Api/v3"
+    # Limite máximo de registros por página aceito pela API v3
+    MAX_PAGE_SIZE = 100
+
+    @staticmethod
+    def _retry_after_seconds(response: httpx.Response) -> Optional[float]:
+        """Interpreta o header Retry-After (segundos ou data HTTP)."""
+        value = response.headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            pass
+        try:
+            when = parsedate_to_datetime(value)
+            return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def _backoff_seconds(attempt: int) -> float:
+        """Backoff exponencial com jitter."""
+        delay = settings.BLING_RETRY_BASE_DELAY * (2 ** attempt)
+        return min(delay, settings.BLING_RETRY_MAX_DELAY) * (0.5 + random.random() / 2)
+
+    async def _request(
+        self,
+        method: str,
+        endpoint: str,
+        expected: Iterable[int] = (200,),
+        error_message: Optional[str] = None,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """
+        Executa uma chamada à API respeitando o agendador de cota.
+
+        Reason: Toda requisição passa pelo token bucket; 429 e 5xx são retentados com
+        backoff (honrando Retry-After) em vez de falhar o SKU na primeira recusa.
+        """
+        scheduler = get_scheduler()
+        client = get_http_client()
+        expected = tuple(expected)
+        template = metrics.endpoint_template(endpoint)
+        attempt = 0
+        reauthenticated = False
+
+        # Reason: O span cobre espera no token bucket, retentativas e backoff: tudo é tempo gasto por causa do Bling.
+        with tracing.span("bling", "bling", method=method, endpoint=template):
+            while True:
+                # Reason: Só o contador local bloqueia antes de enviar; o valor informado pelo
+                # Bling pode ser de outra janela e não teria como subir sem uma nova resposta.
+                if scheduler.daily.local_remaining <= 0:
+                    raise BlingAPIError("Cota diária da API Bling esgotada.", status_code=429)
+
+                await scheduler.acquire()
+                token = await AuthService.get_valid_token()
+                headers = {"Authorization": f"Bearer {token}"}
+                if "json" in kwargs:
+                    headers["Content-Type"] = "application/json"
+
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, f"{self.BASE_URL}/{endpoint}", headers=headers, **kwargs)
+                except httpx.HTTPError as e:
+                    metrics.BLING_ERRORS.inc(method=method, endpoint=template, error=type(e).__name__)
+                    raise
+                metrics.BLING_LATENCY.observe(time.perf_counter() - started, method=method, endpoint=template)
+                metrics.BLING_REQUESTS.inc(method=method, endpoint=template, status=str(response.status_code))
+                scheduler.update_from_headers(response.headers)
+
+                if response.status_code in expected:
+                    return response
+
+                if response.status_code == 401 and not reauthenticated:
+                    # Reason: O token em memória pode ter sido renovado por outra instância;
+                    # relemos do banco uma única vez antes de desistir.
+                    AuthService.invalidate_cache()
+                    reauthenticated = True
+                    metrics.BLING_RETRIES.inc(endpoint=template, reason="401")
+                    continue
+
+                # Reason: 429 significa que a requisição foi recusada, então é seguro repetir.
+                # Já um 5xx em POST pode ter sido aplicado (ex: categoria criada), então não repetimos.
+                retryable = response.status_code == 429 or (
+                    response.status_code >= 500 and method.upper() != "POST"
+                )
+                if response.status_code == 429:
+                    scheduler.counters["throttled_429"] += 1
+                elif response.status_code >= 500:
+                    scheduler.counters["server_errors"] += 1
+
+                if not retryable or attempt >= settings.BLING_MAX_RETRIES:
+                    # Log de erro (futuramente via Logger, não console.log)
+                    message = error_message or f"Erro na API Bling ({endpoint})"
+                    raise BlingAPIError(f"{message}: {response.text}", status_code=response.status_code)
+
+                delay = self._retry_after_seconds(response)
+                if delay is None:
+                    delay = self._backoff_seconds(attempt)
+                if response.status_code == 429:
+                    # Reason: Pausa o bucket inteiro para que os demais chamadores também recuem.
+                    scheduler.bucket.pause(delay)
+                scheduler.counters["retries"] += 1
+                metrics.BLING_RETRIES.inc(endpoint=template, reason="429" if response.status_code == 429 else "5xx")
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    @staticmethod
+    def quota_status() -> Dict[str, Any]:
+        """Contadores ao vivo do agendador (cota restante, 429s, retentativas...)."""
+        return get_scheduler().status()
 
     async def _get(self, endpoint: str, params: Dict[str, Any] = None) -> Dict[str, Any]:
-        token = await AuthService.get_valid_token()
-        headers = {"Authorization": f"Bearer {token}"}
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{self.BASE_URL}/{endpoint}", headers=headers, params=params)
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                # Log de erro (futuramente via Logger, não console.log)
-                raise Exception(f"Erro na API Bling ({endpoint}): {response.text}")
+        response = await self._request("GET", endpoint, params=params)
+        return response.json()
+
+    async def _iter_pages(
+        self,
+        endpoint: str,
+        page_size: int = MAX_PAGE_SIZE,
+        filters: Optional[Dict[str, Any]] = None,
+        max_pages: Optional[int] = None,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Percorre todas as páginas de um endpoint de listagem do Bling.
+
+        Reason: Enquanto a página atual é consumida, a próxima já está sendo buscada (prefetch).
+        """
+        page_size = max(1, min(page_size, self.MAX_PAGE_SIZE))
+
+        def fetch(page: int) -> "asyncio.Task[Dict[str, Any]]":
+            params = {**(filters or {}), "pagina": page, "limite": page_size}
+            return asyncio.create_task(self._get(endpoint, params=params))
+
+        page = 1
+        pending = fetch(page)
+        try:
+            while pending is not None:
+                response = await pending
+                pending = None
+                items = response.get("data", []) or []
+                if not items:
+                    break
+
+                # Página cheia indica que pode haver mais registros
+                has_more = len(items) >= page_size and (max_pages is None or page < max_pages)
+                if has_more:
+                    page += 1
+                    pending = fetch(page)
+
+                yield items
+        finally:
+            # Reason: Se o consumidor parar no meio (break), não deixamos a requisição órfã.
+            if pending is not None and not pending.done():
+                pending.cancel()
+
+    async def _iter_items(
+        self,
+        endpoint: str,
+        page_size: int,
+        filters: Optional[Dict[str, Any]],
+        fields: Optional[Iterable[str]],
+        max_pages: Optional[int],
+    ) -> AsyncIterator[Dict[str, Any]]:
+        keep = set(fields) if fields else None
+        pages = self._iter_pages(endpoint, page_size=page_size, filters=filters, max_pages=max_pages)
+        try:
+            async for items in pages:
+                for item in items:
+                    yield {k: v for k, v in item.items() if k in keep} if keep else item
+        finally:
+            await pages.aclose()
+
+    def iter_products(
+        self,
+        page_size: int = MAX_PAGE_SIZE,
+        filters: Optional[Dict[str, Any]] = None,
+        fields: Optional[Iterable[str]] = None,
+        max_pages: Optional[int] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Itera sobre TODOS os produtos do Bling, página a página.
+
+        Args:
+            page_size: Registros por página (máximo 100).
+            filters: Filtros repassados como query params (ex: {"criterio": 2, "idCategoria": 123}).
+            fields: Se informado, mantém apenas essas chaves de cada produto (reduz memória).
+            max_pages: Limite de páginas a percorrer (None = todas).
+        """
+        return self._iter_items("produtos", page_size, filters, fields, max_pages)
+
+    def iter_categories(
+        self,
+        page_size: int = MAX_PAGE_SIZE,
+        filters: Optional[Dict[str, Any]] = None,
+        fields: Optional[Iterable[str]] = None,
+        max_pages: Optional[int] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Itera sobre TODAS as categorias de produtos do Bling, página a página."""
+        return self._iter_items("categorias/produtos", page_size, filters, fields, max_pages)
+
+    def iter_category_links(
+        self,
+        page_size: int = MAX_PAGE_SIZE,
+        filters: Optional[Dict[str, Any]] = None,
+        max_pages: Optional[int] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Itera sobre os vínculos de categorias com lojas (Multiloja) já cadastrados no Bling."""
+        return self._iter_items("categorias/lojas", page_size, filters, None, max_pages)
 
     async def get_categories(self) -> List[Dict[str, Any]]:
         """Busca todas as categorias cadastradas no Bling."""
-        # A API v3 do Bling usa paginação. Implementação simplificada da primeira página.
-        response = await self._get("categorias/produtos")
-        return response.get("data", [])
+        return [cat async for cat in self.iter_categories()]
 
     async def get_products(self, limit: int = 100) -> List[Dict[str, Any]]:
-        """Busca produtos do Bling."""
+        """Busca produtos do Bling (apenas a primeira página; para o catálogo completo use `iter_products`)."""
         response = await self._get("produtos", params={"limite": limit})
         return response.get("data", [])
 
@@ -48,18 +296,14 @@ class BlingClient:
         """
         Atualiza um produto no Bling.
         """
-        token = await AuthService.get_valid_token()
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.patch(f"{self.BASE_URL}/produtos/{product_id}", json=data, headers=headers)
-            if response.status_code in [200, 204]:
-                return {"status": "success"}
-            else:
-                raise Exception(f"Erro ao atualizar produto no Bling: {response.text}")
+        await self._request(
+            "PATCH",
+            f"produtos/{product_id}",
+            expected=(200, 204),
+            error_message="Erro ao atualizar produto no Bling",
+            json=data,
+        )
+        return {"status": "success"}
 
     async def get_product_characteristics(self, product_id: str) -> List[Dict[str, Any]]:
         """Busca as características (atributos) de um produto."""
@@ -72,19 +316,15 @@ class BlingClient:
         data = {"descricao": name}
         if parent_id:
             data["idCategoriaPai"] = parent_id
-            
-        token = await AuthService.get_valid_token()
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.post(f"{self.BASE_URL}/categorias/produtos", json=data, headers=headers)
-            if response.status_code == 201:
-                return response.json().get("data", {})
-            else:
-                raise Exception(f"Erro ao criar categoria no Bling: {response.text}")
+
+        response = await self._request(
+            "POST",
+            "categorias/produtos",
+            expected=(201,),
+            error_message="Erro ao criar categoria no Bling",
+            json=data,
+        )
+        return response.json().get("data", {})
 
     async def link_category_to_store(self, category_id: str, store_id: str, external_category_id: str) -> Dict[str, Any]:
         """
@@ -96,20 +336,15 @@ class BlingClient:
             "idLoja": int(store_id),
             "codigoNoMarketplace": external_category_id
         }
-        
-        token = await AuthService.get_valid_token()
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
-        
+
         # Na v3, o vínculo de categorias pode ter um endpoint específico. 
         # Vou usar o padrão de 'vinculos' se disponível ou disparar via PATCH na categoria.
         # Nota: Ajustaremos o endpoint exato conforme a documentação técnica final da v3 para vínculos.
-        async with httpx.AsyncClient() as client:
-            response = await client.post(f"{self.BASE_URL}/categorias/lojas", json=data, headers=headers)
-            if response.status_code in [200, 201]:
-                return response.json().get("data", {})
-            else:
-                raise Exception(f"Erro ao vincular categoria multiloja: {response.text}")
-
+        response = await self._request(
+            "POST",
+            "categorias/lojas",
+            expected=(200, 201),
+            error_message="Erro ao vincular categoria multiloja",
+            json=data,
+        )
+        return response.json().get("data", {})
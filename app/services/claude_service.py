@@ -1,8 +1,20 @@
-import anthropic
+import asyncio
 import json
+import logging
 import re
+import time
 from app.core.config import settings, assert_claude_configured
-from typing import Dict, Any, List
+from app.core import metrics, tracing
+from typing import Dict, Any, List, Optional, Tuple
+from app.services.enrichment_cache import EnrichmentCache, get_enrichment_cache
+from app.services.model_health import model_health
+from app.services import prompt_builder
+
+logger = logging.getLogger(__name__)
+
+class IncompleteReplyError(Exception):
+    """Resposta do Claude cortada em max_tokens ou sem os atributos pedidos."""
+
 
 class ClaudeService:
     """
@@ -10,9 +22,136 @@ class ClaudeService:
     Reason: Analisa títulos e descrições para extrair atributos obrigatórios dos marketplaces.
     """
 
+    # Versão do prompt de enriquecimento: altere ao mudar o texto do prompt para invalidar o cache.
+    PROMPT_VERSION = "v2"
+
+    # Reason: Limite global de chamadas simultâneas ao Claude (compartilhado entre instâncias).
+    _semaphore: Optional[asyncio.Semaphore] = None
+    _semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # Reason: Contagem de tokens por chamada para medir o efeito da compactação do prompt.
+    _usage: Dict[str, int] = {
+        "calls": 0,
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "cache_creation_input_tokens": 0,
+        "cache_read_input_tokens": 0,
+    }
+
     def __init__(self):
-        assert_claude_configured()
-        self.client = anthropic.Anthropic(api_key=settings.ANTHROPIC_API_KEY)
+        self._client = None
+
+    @property
+    def client(self):
+        """
+        Cliente da Anthropic, criado na primeira chamada ao Claude.
+        Reason: Importar o SDK e validar a API Key só quando a IA é usada deixa o cold start
+        da Vercel mais rápido e não derruba o boot quando ANTHROPIC_API_KEY não está definida.
+        """
+        if self._client is None:
+            assert_claude_configured()
+            import anthropic
+
+            # Reason: Cliente assíncrono - a chamada ao LLM não bloqueia o event loop do uvicorn.
+            self._client = anthropic.AsyncAnthropic(
+                api_key=settings.ANTHROPIC_API_KEY,
+                timeout=settings.CLAUDE_TIMEOUT_SECONDS,
+                max_retries=settings.CLAUDE_MAX_RETRIES,
+            )
+        return self._client
+
+    @client.setter
+    def client(self, value) -> None:
+        self._client = value
+
+    @classmethod
+    def _get_semaphore(cls) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if cls._semaphore is None or cls._semaphore_loop is not loop:
+            cls._semaphore = asyncio.Semaphore(max(1, settings.CLAUDE_MAX_CONCURRENCY))
+            cls._semaphore_loop = loop
+        return cls._semaphore
+
+    # Espera do SDK entre retentativas (s): começa em 0.5 e dobra até 8
+    _SDK_RETRY_INITIAL_DELAY = 0.5
+    _SDK_RETRY_MAX_DELAY = 8.0
+
+    @classmethod
+    def _call_deadline(cls) -> float:
+        """
+        Prazo total de uma chamada, incluindo as retentativas do SDK.
+        Reason: CLAUDE_TIMEOUT_SECONDS é o timeout de cada tentativa no cliente; se o prazo
+        externo fosse o mesmo, ele venceria junto com a primeira tentativa e as retentativas
+        (CLAUDE_MAX_RETRIES) nunca rodariam.
+        """
+        retries = max(0, settings.CLAUDE_MAX_RETRIES)
+        backoff = sum(
+            min(cls._SDK_RETRY_INITIAL_DELAY * (2 ** attempt), cls._SDK_RETRY_MAX_DELAY) for attempt in range(retries)
+        )
+        return settings.CLAUDE_TIMEOUT_SECONDS * (retries + 1) + backoff
+
+    async def _create_message(self, model_name: str, prompt: str, max_tokens: int = 1000, system: Optional[List[Dict[str, Any]]] = None):
+        """Chama a API de mensagens respeitando o limite de concorrência e o prazo total da chamada."""
+        kwargs: Dict[str, Any] = {}
+        if system:
+            kwargs["system"] = system
+        # Reason: No Server-Timing a espera pelo semáforo também conta como tempo de Claude;
+        # já o histograma mede só a chamada em si.
+        with tracing.span("claude", "claude", model=model_name):
+            async with self._get_semaphore():
+                started = time.perf_counter()
+                try:
+                    response = await asyncio.wait_for(
+                        self.client.messages.create(
+                            model=model_name,
+                            max_tokens=max_tokens,
+                            messages=[{"role": "user", "content": prompt}],
+                            **kwargs,
+                        ),
+                        timeout=self._call_deadline(),
+                    )
+                except Exception as e:
+                    metrics.CLAUDE_LATENCY.observe(time.perf_counter() - started, model=model_name)
+                    metrics.CLAUDE_REQUESTS.inc(model=model_name, outcome=type(e).__name__)
+                    raise
+        metrics.CLAUDE_LATENCY.observe(time.perf_counter() - started, model=model_name)
+        metrics.CLAUDE_REQUESTS.inc(model=model_name, outcome="success")
+        self._record_usage(response, model_name)
+        return response
+
+    # Campo de uso da API -> rótulo "type" da métrica de tokens
+    _TOKEN_TYPES = {
+        "input_tokens": "input",
+        "output_tokens": "output",
+        "cache_creation_input_tokens": "cache_creation",
+        "cache_read_input_tokens": "cache_read",
+    }
+
+    @classmethod
+    def _record_usage(cls, response: Any, model_name: str = "") -> None:
+        usage = getattr(response, "usage", None)
+        cls._usage["calls"] += 1
+        if usage is None:
+            return
+        for field, token_type in cls._TOKEN_TYPES.items():
+            count = getattr(usage, field, None) or 0
+            cls._usage[field] += count
+            if count:
+                metrics.CLAUDE_TOKENS.inc(count, model=model_name, type=token_type)
+
+    @classmethod
+    def usage_stats(cls) -> Dict[str, Any]:
+        """Tokens consumidos desde o início do processo (totais e média por chamada)."""
+        calls = cls._usage["calls"]
+        return {
+            **cls._usage,
+            "avg_input_tokens": round(cls._usage["input_tokens"] / calls, 1) if calls else 0.0,
+            "avg_output_tokens": round(cls._usage["output_tokens"] / calls, 1) if calls else 0.0,
+        }
+
+    def model_status(self) -> Dict[str, Any]:
+        """Modelo selecionado atualmente e saúde de cada candidato (diagnóstico)."""
+        return model_health.snapshot(self._candidate_models())
 
     def _candidate_models(self) -> List[str]:
         """
@@ -35,6 +174,38 @@ class ClaudeService:
                 models.append(m)
         return models
 
+    async def _complete(self, prompt: str, max_tokens: int = 1000, system: Optional[List[Dict[str, Any]]] = None) -> Tuple[str, str, Optional[str]]:
+        """
+        Envia o prompt percorrendo os modelos candidatos.
+
+        Returns:
+            (texto da resposta, modelo que respondeu, stop_reason).
+        """
+        last_error = None
+        response = None
+        answered_by = ""
+        # Reason: O registro de saúde pula modelos em resfriamento e prioriza o último que funcionou.
+        for model_name in model_health.order(self._candidate_models()):
+            try:
+                response = await self._create_message(model_name, prompt, max_tokens=max_tokens, system=system)
+                model_health.record_success(model_name)
+                answered_by = model_name
+                last_error = None
+                break
+            except Exception as e:
+                model_health.record_failure(model_name, e)
+                last_error = e
+                if model_health.classify(e) is None:
+                    # Reason: Falha que não depende do modelo (ex: 401, requisição inválida);
+                    # os outros candidatos falhariam do mesmo jeito.
+                    break
+                continue
+        if response is None:
+            raise last_error or RuntimeError("Falha ao chamar Claude: nenhum modelo disponível.")
+
+        # Extrair o conteúdo da resposta
+        return response.content[0].text, answered_by, getattr(response, "stop_reason", None)
+
     @staticmethod
     def _extract_json_object(text: str) -> Dict[str, Any]:
         """
@@ -51,62 +222,212 @@ class ClaudeService:
         except Exception:
             return {}
 
-    async def enrich_product_data(self, product_title: str, product_description: str, required_attributes: List[str]) -> Dict[str, Any]:
+    @staticmethod
+    def _cache() -> Optional[EnrichmentCache]:
+        return get_enrichment_cache() if settings.ENRICHMENT_CACHE_ENABLED else None
+
+    def _cache_key(self, title: str, description: str, required_attributes: List[str], model_name: str) -> str:
+        return EnrichmentCache.make_key(title, description, required_attributes, model_name, self.PROMPT_VERSION)
+
+    async def _cached(self, cache: EnrichmentCache, title: str, description: str, required_attributes: List[str]) -> Optional[Dict[str, Any]]:
         """
-        Analisa o produto e extrai os valores para os atributos solicitados.
+        Procura uma resposta em cache de qualquer modelo candidato (o preferido primeiro).
+        Reason: A entrada é gravada com o modelo que de fato respondeu (que pode ser um fallback).
         """
-        prompt = f"""
-Você é um especialista em cadastro de produtos para marketplaces.
+        models = self._candidate_models()
+        if model_health.preferred in models:
+            models.remove(model_health.preferred)
+            models.insert(0, model_health.preferred)
+        try:
+            return await cache.get_first([self._cache_key(title, description, required_attributes, m) for m in models])
+        except Exception:
+            # Reason: O cache é só uma otimização; uma falha nele vira um miss, não um SKU com erro.
+            logger.warning("Falha ao consultar o cache de enriquecimento", exc_info=True)
+            return None
 
-Tarefa: preencher os atributos abaixo, baseado APENAS no título e descrição do produto.
+    async def _store(self, cache: Optional[EnrichmentCache], title: str, description: str, required_attributes: List[str],
+                     values: Dict[str, Any], model_name: Optional[str]) -> None:
+        """
+        Grava no cache apenas respostas completas (todos os atributos pedidos) de um modelo conhecido.
+        Uma falha ao gravar é só registrada: a resposta do Claude já foi obtida e continua válida.
+        """
+        if cache and model_name and self._is_complete(values, required_attributes):
+            try:
+                await cache.put(
+                    self._cache_key(title, description, required_attributes, model_name),
+                    {attr: values[attr] for attr in required_attributes}, model_name, self.PROMPT_VERSION,
+                )
+            except Exception:
+                logger.warning("Falha ao gravar no cache de enriquecimento", exc_info=True)
 
-TÍTULO:
-{product_title}
+    @staticmethod
+    def _is_complete(values: Any, required_attributes: List[str]) -> bool:
+        return isinstance(values, dict) and bool(values) and "_error" not in values \
+            and all(attr in values for attr in required_attributes)
 
-DESCRIÇÃO:
-{product_description}
+    async def enrich_product_data(self, product_title: str, product_description: str, required_attributes: List[str]) -> Dict[str, Any]:
+        """
+        Analisa o produto e extrai os valores para os atributos solicitados.
 
-ATRIBUTOS (use exatamente esses nomes como chaves do JSON):
-{json.dumps(required_attributes, ensure_ascii=False)}
+        Reason: Resultados ficam em cache por hash do conteúdo (título, descrição, atributos,
+        modelo e versão do prompt); um acerto não chama o Claude.
+        """
+        cache = self._cache()
+        if cache:
+            cached = await self._cached(cache, product_title, product_description, required_attributes)
+            if cached is not None:
+                return cached
 
-Regras:
-- Responda com um ÚNICO objeto JSON (sem markdown, sem texto fora do JSON)
-- As chaves devem ser exatamente os nomes dos atributos listados
-- Se não for possível inferir com segurança, use "N/A"
+        result, parsed, model_name = await self._enrich_uncached(product_title, product_description, required_attributes)
+        # Erros e respostas incompletas não são cacheados: a próxima execução tenta de novo.
+        if "_error" not in result:
+            await self._store(cache, product_title, product_description, required_attributes, parsed, model_name)
+        return result
 
-Exemplo de resposta (formato):
-{{"Marca":"Clink","Material":"Bambu","Capacidade":"N/A"}}
-"""
+    async def _enrich_uncached(
+        self, product_title: str, product_description: str, required_attributes: List[str]
+    ) -> Tuple[Dict[str, Any], Dict[str, Any], Optional[str]]:
+        """
+        Monta o prompt (compactado) e chama o Claude (sem consultar o cache).
+
+        Returns:
+            (resultado com todos os atributos, JSON interpretado da resposta, modelo que respondeu).
+        """
+        description = prompt_builder.compact_description(product_description, product_title)
+        prompt = prompt_builder.single_prompt(product_title, description, required_attributes)
 
         try:
-            last_error = None
-            response = None
-            for model_name in self._candidate_models():
-                try:
-                    response = self.client.messages.create(
-                        model=model_name,
-                        max_tokens=1000,
-                        messages=[{"role": "user", "content": prompt}],
-                    )
-                    last_error = None
-                    break
-                except Exception as e:
-                    last_error = e
-                    continue
-            if response is None:
-                raise last_error or RuntimeError("Falha ao chamar Claude: nenhum modelo disponível.")
-            
-            # Extrair o conteúdo da resposta
-            content = response.content[0].text
+            content, model_name, stop_reason = await self._complete(
+                prompt,
+                max_tokens=prompt_builder.output_token_budget(len(required_attributes)),
+                system=prompt_builder.system_blocks(prompt_builder.SINGLE_INSTRUCTIONS),
+            )
+            if stop_reason == "max_tokens":
+                raise IncompleteReplyError("Resposta cortada em max_tokens")
             parsed = self._extract_json_object(content)
             # Garantir que todos os atributos existam no retorno
             result = {attr: parsed.get(attr, "N/A") for attr in required_attributes}
-            return result
+            # Reason: Sem isso, uma resposta que não é JSON vira um resultado "N/A" aparentemente válido.
+            missing = [attr for attr in required_attributes if attr not in parsed]
+            if not parsed or missing:
+                result["_error"] = f"{IncompleteReplyError.__name__}: atributos ausentes na resposta: {missing}"
+            return result, parsed, model_name
         except Exception as e:
             # Reason: Não queremos travar o processo; mas precisamos visibilidade do motivo.
             # Não inclui segredos; apenas a mensagem do erro.
             return {
                 **{attr: "N/A" for attr in required_attributes},
                 "_error": f"{type(e).__name__}: {str(e)[:300]}",
-            }
+            }, {}, None
+
+    @staticmethod
+    def _compacted(product: Dict[str, Any]) -> Dict[str, Any]:
+        return {**product, "description": prompt_builder.compact_description(product["description"], product["title"])}
+
+    def _split_batches(self, products: List[Dict[str, Any]], required_attributes: List[str]) -> List[List[Dict[str, Any]]]:
+        """Agrupa produtos em lotes respeitando o limite de produtos e de tokens estimados."""
+        estimate = prompt_builder.estimate_tokens
+        base_tokens = estimate(prompt_builder.BATCH_INSTRUCTIONS) + estimate(json.dumps(required_attributes, ensure_ascii=False))
+        batches: List[List[Dict[str, Any]]] = []
+        current: List[Dict[str, Any]] = []
+        current_tokens = base_tokens
+        for product in products:
+            compacted = self._compacted(product)
+            cost = estimate(compacted["title"]) + estimate(compacted["description"]) + 20
+            too_big = current_tokens + cost > settings.CLAUDE_BATCH_MAX_INPUT_TOKENS
+            if current and (too_big or len(current) >= settings.CLAUDE_BATCH_MAX_PRODUCTS):
+                batches.append(current)
+                current, current_tokens = [], base_tokens
+            current.append(product)
+            current_tokens += cost
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _enrich_batch_uncached(self, products: List[Dict[str, Any]], required_attributes: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Enriquece um lote em uma única chamada.
+
+        Reason: Se a resposta do lote não puder ser interpretada ou vier incompleta, o lote é
+        dividido ao meio; um produto sozinho cai no prompt individual (`enrich_product_data`).
+        Já uma falha da API (indisponível, 401, 429 esgotado) encerra o lote com `_error` em
+        cada SKU - dividir só multiplicaria as chamadas que vão falhar do mesmo jeito.
+        """
+        if len(products) == 1:
+            p = products[0]
+            return {p["sku"]: await self.enrich_product_data(p["title"], p["description"], required_attributes)}
+
+        model_name: Optional[str] = None
+        try:
+            content, model_name, stop_reason = await self._complete(
+                prompt_builder.batch_prompt([self._compacted(p) for p in products], required_attributes),
+                max_tokens=prompt_builder.output_token_budget(len(required_attributes), len(products)),
+                system=prompt_builder.system_blocks(prompt_builder.BATCH_INSTRUCTIONS),
+            )
+            # Resposta cortada: o JSON do lote não é confiável; o lote é dividido abaixo.
+            parsed = self._extract_json_object(content) if stop_reason != "max_tokens" else {}
+        except Exception as e:
+            error = f"{type(e).__name__}: {str(e)[:300]}"
+            return {p["sku"]: {**{attr: "N/A" for attr in required_attributes}, "_error": error} for p in products}
+
+        cache = self._cache()
+        results: Dict[str, Dict[str, Any]] = {}
+        failed: List[Dict[str, Any]] = []
+        for p in products:
+            values = parsed.get(p["sku"])
+            if self._is_complete(values, required_attributes):
+                results[p["sku"]] = {attr: values.get(attr, "N/A") for attr in required_attributes}
+                await self._store(cache, p["title"], p["description"], required_attributes, values, model_name)
+            else:
+                failed.append(p)
+
+        if failed and not results:
+            # Lote inteiro falhou: divide ao meio e tenta de novo
+            middle = len(failed) // 2
+            halves = await asyncio.gather(
+                self._enrich_batch_uncached(failed[:middle], required_attributes),
+                self._enrich_batch_uncached(failed[middle:], required_attributes),
+            )
+            for half in halves:
+                results.update(half)
+        elif failed:
+            # Apenas alguns SKUs não vieram (completos) no JSON: fallback individual
+            singles = await asyncio.gather(*(
+                self._enrich_batch_uncached([p], required_attributes) for p in failed
+            ))
+            for single in singles:
+                results.update(single)
+        return results
+
+    async def enrich_products_batch(self, products: List[Dict[str, Any]], required_attributes: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Enriquece vários produtos que compartilham a mesma lista de atributos.
+
+        Args:
+            products: Itens com as chaves "sku", "title" e "description".
+            required_attributes: Atributos da categoria (AttributeRequirement).
+
+        Returns:
+            Dicionário SKU -> atributos (mesmo formato de `enrich_product_data`).
+        """
+        cache = self._cache()
+        results: Dict[str, Dict[str, Any]] = {}
+        pending: List[Dict[str, Any]] = []
+        seen = set()
+
+        for p in products:
+            if p["sku"] in seen:
+                continue
+            seen.add(p["sku"])
+            cached = await self._cached(cache, p["title"], p["description"], required_attributes) if cache else None
+            if cached is not None:
+                results[p["sku"]] = cached
+            else:
+                pending.append(p)
 
+        batches = self._split_batches(pending, required_attributes)
+        for batch_result in await asyncio.gather(*(
+            self._enrich_batch_uncached(batch, required_attributes) for batch in batches
+        )):
+            results.update(batch_result)
+        return results
@@ -0,0 +1,196 @@
+import hashlib
+import json
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select, func, delete
+from app.core.config import settings
+from app.core.database import async_session
+from app.core import metrics
+from app.models.enrichment import EnrichmentCacheEntry
+
+class EnrichmentCache:
+    """
+    Cache persistente (banco) + LRU em memória para o enriquecimento por IA.
+    Reason: Acertos em memória retornam em microssegundos e não consomem tokens;
+    o banco mantém os resultados entre execuções (dry run -> apply -> ajustes).
+    O acesso ao banco usa a sessão assíncrona: o cache é consultado dentro do enriquecimento
+    (async) e uma consulta síncrona bloquearia o event loop para todos os SKUs em paralelo.
+    """
+
+    # Quantidade de chaves com acertos pendentes que dispara a gravação do contador
+    HIT_FLUSH_SIZE = 100
+
+    def __init__(self, ttl_hours: float, max_entries: int, memory_size: int):
+        self.ttl = timedelta(hours=ttl_hours)
+        self.max_entries = max_entries
+        self.memory_size = memory_size
+        self._memory: "OrderedDict[str, Tuple[datetime, Dict[str, Any]]]" = OrderedDict()
+        self._writes_since_prune = 0
+        # Acertos no banco ainda não gravados: chave -> (quantidade, último acerto)
+        self._pending_hits: Dict[str, Tuple[int, datetime]] = {}
+        self.counters: Dict[str, int] = {
+            "hits_memory": 0,
+            "hits_db": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+        }
+
+    @staticmethod
+    def make_key(title: str, description: str, required_attributes: List[str], model: str, prompt_version: str) -> str:
+        payload = json.dumps(
+            [title or "", description or "", sorted(required_attributes), model, prompt_version],
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def _flush_hits(self, session) -> None:
+        """Grava os acertos acumulados (usados pela poda para manter as entradas mais usadas)."""
+        pending, self._pending_hits = self._pending_hits, {}
+        for key, (hits, last_hit_at) in pending.items():
+            await session.exec(
+                update(EnrichmentCacheEntry)
+                .where(EnrichmentCacheEntry.key == key)
+                .values(hits=EnrichmentCacheEntry.hits + hits, last_hit_at=last_hit_at)
+            )
+
+    def _remember(self, key: str, created_at: datetime, value: Dict[str, Any]) -> None:
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return await self.get_first([key])
+
+    async def get_first(self, keys: List[str]) -> Optional[Dict[str, Any]]:
+        """
+        Primeiro acerto válido entre as chaves, na ordem dada (uma única consulta ao banco).
+        Reason: A chave inclui o modelo que respondeu; o chamador passa uma chave por modelo candidato.
+        """
+        now = datetime.utcnow()
+        for key in keys:
+            cached = self._memory.get(key)
+            if cached and now - cached[0] < self.ttl:
+                self._memory.move_to_end(key)
+                self.counters["hits_memory"] += 1
+                return dict(cached[1])
+
+        async with async_session() as session:
+            entries = {
+                entry.key: entry
+                for entry in (await session.exec(
+                    select(EnrichmentCacheEntry).where(EnrichmentCacheEntry.key.in_(keys))
+                )).all()
+            }
+            for key in keys:
+                entry = entries.get(key)
+                if entry and now - entry.created_at < self.ttl:
+                    # Reason: O contador de acertos é gravado em lote (ver `_flush_hits`);
+                    # um UPDATE + commit por acerto custaria mais que a própria leitura.
+                    hits, _ = self._pending_hits.get(key, (0, now))
+                    self._pending_hits[key] = (hits + 1, now)
+                    if len(self._pending_hits) >= self.HIT_FLUSH_SIZE:
+                        await self._flush_hits(session)
+                        await session.commit()
+                    value = json.loads(entry.result_json)
+                    self._remember(key, entry.created_at, value)
+                    self.counters["hits_db"] += 1
+                    return dict(value)
+
+        for key in keys:
+            self._memory.pop(key, None)
+        self.counters["misses"] += 1
+        return None
+
+    async def put(self, key: str, value: Dict[str, Any], model: str, prompt_version: str) -> None:
+        now = datetime.utcnow()
+        async with async_session() as session:
+            entry = await session.get(EnrichmentCacheEntry, key) or EnrichmentCacheEntry(
+                key=key, model=model, prompt_version=prompt_version, result_json=""
+            )
+            entry.result_json = json.dumps(value, ensure_ascii=False)
+            entry.created_at = now
+            session.add(entry)
+            try:
+                await session.commit()
+            except IntegrityError:
+                # Reason: Duas gravações concorrentes da mesma chave (ex: SKUs duplicados no
+                # lote). O conteúdo é o mesmo (a chave é o hash dele); vale a que chegou antes.
+                await session.rollback()
+        self._remember(key, now, value)
+        self.counters["stores"] += 1
+
+        # Reason: A poda é amortizada para não pagar um DELETE a cada escrita.
+        self._writes_since_prune += 1
+        if self._writes_since_prune >= 100:
+            await self.prune()
+
+    async def prune(self) -> int:
+        """Remove entradas expiradas e as menos usadas acima do limite de tamanho."""
+        self._writes_since_prune = 0
+        cutoff = datetime.utcnow() - self.ttl
+        removed = 0
+        async with async_session() as session:
+            await self._flush_hits(session)
+            result = await session.exec(delete(EnrichmentCacheEntry).where(EnrichmentCacheEntry.created_at < cutoff))
+            removed += result.rowcount or 0
+
+            total = (await session.exec(select(func.count()).select_from(EnrichmentCacheEntry))).one()
+            excess = total - self.max_entries
+            if excess > 0:
+                recency = func.coalesce(EnrichmentCacheEntry.last_hit_at, EnrichmentCacheEntry.created_at)
+                oldest = (await session.exec(
+                    select(EnrichmentCacheEntry.key).order_by(recency).limit(excess)
+                )).all()
+                result = await session.exec(delete(EnrichmentCacheEntry).where(EnrichmentCacheEntry.key.in_(oldest)))
+                removed += result.rowcount or 0
+            await session.commit()
+        self.counters["evictions"] += removed
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.counters["hits_memory"] + self.counters["hits_db"]
+        lookups = hits + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+
+_cache: Optional[EnrichmentCache] = None
+
+
+def get_enrichment_cache() -> EnrichmentCache:
+    """Cache único no processo (compartilhado por todas as instâncias de ClaudeService)."""
+    global _cache
+    if _cache is None:
+        _cache = EnrichmentCache(
+            ttl_hours=settings.ENRICHMENT_CACHE_TTL_HOURS,
+            max_entries=settings.ENRICHMENT_CACHE_MAX_ENTRIES,
+            memory_size=settings.ENRICHMENT_CACHE_MEMORY_SIZE,
+        )
+    return _cache
+
+
+def _cache_samples(counter: str):
+    return [((), _cache.counters[counter])] if _cache else []
+
+
+metrics.registry.counter_callback(
+    "enrichment_cache_lookups_total", "Consultas ao cache de enriquecimento por resultado.", ("result",),
+    callback=lambda: [((name,), _cache.counters[name]) for name in ("hits_memory", "hits_db", "misses")] if _cache else [],
+)
+metrics.registry.counter_callback(
+    "enrichment_cache_evictions_total", "Entradas removidas do cache de enriquecimento (validade/tamanho).",
+    callback=lambda: _cache_samples("evictions"),
+)
+metrics.registry.gauge(
+    "enrichment_cache_hit_ratio", "Fração de consultas ao cache de enriquecimento atendidas sem chamar o Claude.",
+    callback=lambda: [((), _cache.stats()["hit_ratio"])] if _cache else [],
+)
@@ -0,0 +1,320 @@
+import asyncio
+import json
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Tuple
+from sqlalchemy import and_, or_, update
+from sqlmodel import Session, select, func
+from app.core.config import settings
+from app.core.database import engine, async_session
+from app.models.jobs import NormalizationJob, NormalizationJobItem
+from app.services.audit_service import AuditService
+from app.services.normalization_service import NormalizationService
+
+class JobService:
+    """
+    Jobs de normalização retomáveis.
+    Reason: O lote roda fora da requisição HTTP, com checkpoint por SKU no banco;
+    se o processo cair, o job retoma do ponto em que parou.
+    """
+
+    # Reason: Evita que o mesmo job rode duas vezes em paralelo no mesmo processo.
+    _running: Dict[str, "asyncio.Task[Dict[str, Any]]"] = {}
+
+    def __init__(self, norm_service: NormalizationService, audit_service: AuditService):
+        self.norm_service = norm_service
+        self.audit_service = audit_service
+
+    def submit(
+        self,
+        skus: List[str],
+        category_id: int,
+        dry_run: bool = True,
+        use_ai: bool = True,
+        concurrency: Optional[int] = None,
+    ) -> NormalizationJob:
+        """Cria o job e um item pendente por SKU (um único commit)."""
+        job = NormalizationJob(
+            id=uuid.uuid4().hex,
+            category_id=category_id,
+            dry_run=dry_run,
+            use_ai=use_ai,
+            concurrency=concurrency,
+            total=len(skus),
+        )
+        with Session(engine) as session:
+            session.add(job)
+            for position, sku in enumerate(skus):
+                session.add(NormalizationJobItem(job_id=job.id, position=position, sku=sku))
+            session.commit()
+            session.refresh(job)
+            return job
+
+    def submit_pending(self, category_id: int, dry_run: bool = True, use_ai: bool = True, concurrency: Optional[int] = None) -> NormalizationJob:
+        """Cria um job com a lista de SKUs pendentes (data/pending_skus.json)."""
+        return self.submit(self.audit_service.load_pending_skus(), category_id, dry_run, use_ai, concurrency)
+
+    @staticmethod
+    def _claimable(now: datetime):
+        """Itens pendentes ou reservados por uma execução cuja reserva venceu."""
+        return or_(
+            NormalizationJobItem.status == "pending",
+            and_(NormalizationJobItem.status == "processing", NormalizationJobItem.lease_until < now),
+        )
+
+    async def _claim(self, job_id: str, owner: str, limit: int) -> List[NormalizationJobItem]:
+        """
+        Reserva até `limit` itens para esta execução.
+        Reason: O UPDATE condicional é atômico por linha - duas execuções concorrentes
+        (/step, /resume ou outra instância) nunca recebem o mesmo SKU.
+        """
+        now = datetime.utcnow()
+        async with async_session() as session:
+            candidates = (await session.exec(
+                select(NormalizationJobItem.id)
+                .where(NormalizationJobItem.job_id == job_id, self._claimable(now))
+                .order_by(NormalizationJobItem.position)
+                .limit(limit)
+            )).all()
+            if not candidates:
+                return []
+            await session.exec(
+                update(NormalizationJobItem)
+                .where(NormalizationJobItem.id.in_(candidates), self._claimable(now))
+                .values(
+                    status="processing",
+                    lease_owner=owner,
+                    lease_until=now + timedelta(seconds=settings.JOB_ITEM_LEASE_SECONDS),
+                    updated_at=now,
+                )
+            )
+            await session.commit()
+            return (await session.exec(
+                select(NormalizationJobItem)
+                .where(
+                    NormalizationJobItem.id.in_(candidates),
+                    NormalizationJobItem.status == "processing",
+                    NormalizationJobItem.lease_owner == owner,
+                )
+                .order_by(NormalizationJobItem.position)
+            )).all()
+
+    async def _checkpoint(self, job_id: str, item_id: int, owner: str, result: Dict[str, Any]) -> None:
+        """
+        Grava o resultado de um SKU e atualiza os contadores do job.
+        Reason: Só conta na transição processing -> final da própria reserva; se a reserva
+        foi retomada por outra execução, o resultado não é contado duas vezes.
+        Roda na sessão assíncrona: é chamado a cada SKU, no meio do lote, dentro do event loop.
+        """
+        now = datetime.utcnow()
+        status = result.get("status", "error")
+        async with async_session() as session:
+            claimed = (await session.exec(
+                update(NormalizationJobItem)
+                .where(
+                    NormalizationJobItem.id == item_id,
+                    NormalizationJobItem.status == "processing",
+                    NormalizationJobItem.lease_owner == owner,
+                )
+                .values(
+                    status=status,
+                    result_json=json.dumps(result, ensure_ascii=False, default=str),
+                    lease_owner=None,
+                    lease_until=None,
+                    updated_at=now,
+                )
+            )).rowcount
+            if claimed:
+                await session.exec(
+                    update(NormalizationJob)
+                    .where(NormalizationJob.id == job_id)
+                    .values(
+                        processed=NormalizationJob.processed + 1,
+                        errors=NormalizationJob.errors + (1 if status == "error" else 0),
+                        updated_at=now,
+                    )
+                )
+            await session.commit()
+
+    async def run(self, job_id: str, max_skus: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Processa os SKUs ainda pendentes do job.
+
+        Args:
+            max_skus: Processa no máximo essa quantidade e retorna (útil para avançar o job
+                em fatias dentro do timeout de uma requisição). None = até o fim.
+        """
+        async with async_session() as session:
+            job = await session.get(NormalizationJob, job_id)
+            if not job:
+                raise ValueError(f"Job {job_id} não encontrado")
+            job.status = "running"
+            job.updated_at = datetime.utcnow()
+            session.add(job)
+            await session.commit()
+
+        owner = uuid.uuid4().hex
+        chunk_size = max(1, settings.JOB_CHUNK_SIZE)
+        remaining_budget = max_skus
+        checkpoint_errors: List[Exception] = []
+
+        async def checkpoint(item_id: int, result: Dict[str, Any]) -> None:
+            # Reason: Uma falha no checkpoint não pode sair do gather do lote - os demais SKUs
+            # continuariam rodando com reservas já devolvidas (e outra execução os pegaria de
+            # novo, repetindo o PATCH). O erro é levantado só depois que o lote inteiro terminou.
+            try:
+                await self._checkpoint(job_id, item_id, owner, result)
+            except Exception as e:
+                checkpoint_errors.append(e)
+
+        try:
+            while remaining_budget is None or remaining_budget > 0:
+                limit = chunk_size if remaining_budget is None else min(chunk_size, remaining_budget)
+                items = await self._claim(job_id, owner, limit)
+                if not items:
+                    break
+
+                await self.norm_service.batch_normalize(
+                    [item.sku for item in items],
+                    job.category_id,
+                    job.dry_run,
+                    job.use_ai,
+                    concurrency=job.concurrency,
+                    on_result=lambda index, result, items=items: checkpoint(items[index].id, result),
+                )
+                if checkpoint_errors:
+                    raise checkpoint_errors[0]
+                if remaining_budget is not None:
+                    remaining_budget -= len(items)
+        except Exception as e:
+            await self._release(job_id, owner)
+            await self._finish(job_id, "failed", f"{type(e).__name__}: {str(e)[:300]}")
+            raise
+
+        pending, leased = await self._open_counts(job_id)
+        if pending == 0 and leased == 0:
+            await self._finish(job_id, "completed")
+        elif pending == 0:
+            # Os SKUs restantes estão reservados por outra execução ainda ativa
+            await self._finish(job_id, "running")
+        else:
+            await self._finish(job_id, "pending")
+        # get_status também atende os endpoints síncronos; aqui roda fora do event loop
+        return await asyncio.to_thread(self.get_status, job_id)
+
+    @staticmethod
+    async def _release(job_id: str, owner: str) -> None:
+        """Devolve à fila os itens ainda reservados por esta execução (ex: após uma exceção)."""
+        async with async_session() as session:
+            await session.exec(
+                update(NormalizationJobItem)
+                .where(
+                    NormalizationJobItem.job_id == job_id,
+                    NormalizationJobItem.status == "processing",
+                    NormalizationJobItem.lease_owner == owner,
+                )
+                .values(status="pending", lease_owner=None, lease_until=None)
+            )
+            await session.commit()
+
+    async def _open_counts(self, job_id: str) -> Tuple[int, int]:
+        """(itens a processar, incluindo reservas vencidas; itens com reserva ativa)."""
+        now = datetime.utcnow()
+        async with async_session() as session:
+            pending = (await session.exec(
+                select(func.count()).select_from(NormalizationJobItem)
+                .where(NormalizationJobItem.job_id == job_id, self._claimable(now))
+            )).one()
+            leased = (await session.exec(
+                select(func.count()).select_from(NormalizationJobItem)
+                .where(
+                    NormalizationJobItem.job_id == job_id,
+                    NormalizationJobItem.status == "processing",
+                    NormalizationJobItem.lease_until >= now,
+                )
+            )).one()
+            return pending, leased
+
+    async def _finish(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        async with async_session() as session:
+            job = await session.get(NormalizationJob, job_id)
+            job.status = status
+            job.last_error = error or job.last_error
+            job.updated_at = datetime.utcnow()
+            if status in ("completed", "failed"):
+                job.finished_at = job.updated_at
+            session.add(job)
+            await session.commit()
+
+    def start_background(self, job_id: str) -> bool:
+        """
+        Dispara o job em segundo plano no processo atual.
+
+        Returns:
+            False se o job já estiver rodando neste processo.
+        """
+        task = self._running.get(job_id)
+        if task and not task.done():
+            return False
+        task = asyncio.create_task(self.run(job_id))
+        self._running[job_id] = task
+        task.add_done_callback(lambda t: self._running.pop(job_id, None))
+        return True
+
+    def is_running_here(self, job_id: str) -> bool:
+        task = self._running.get(job_id)
+        return bool(task and not task.done())
+
+    def get_status(self, job_id: str, include_items: bool = True) -> Optional[Dict[str, Any]]:
+        """Progresso do job e status por SKU."""
+        with Session(engine) as session:
+            job = session.get(NormalizationJob, job_id)
+            if not job:
+                return None
+            counts = session.exec(
+                select(NormalizationJobItem.status, func.count())
+                .where(NormalizationJobItem.job_id == job_id)
+                .group_by(NormalizationJobItem.status)
+            ).all()
+            job_status = job.status
+            if job_status == "running" and not self.is_running_here(job_id):
+                # Reason: Uma execução que caiu deixa o job "running"; sem reserva ativa,
+                # ele é exibido como interrompido (retome com /resume).
+                live = session.exec(
+                    select(func.count()).select_from(NormalizationJobItem)
+                    .where(
+                        NormalizationJobItem.job_id == job_id,
+                        NormalizationJobItem.status == "processing",
+                        NormalizationJobItem.lease_until >= datetime.utcnow(),
+                    )
+                ).one()
+                stale = job.updated_at < datetime.utcnow() - timedelta(seconds=settings.JOB_ITEM_LEASE_SECONDS)
+                if not live and stale:
+                    job_status = "interrupted"
+            status = {
+                **job.model_dump(),
+                "status": job_status,
+                "running_in_this_process": self.is_running_here(job_id),
+                "progress": round(job.processed / job.total, 4) if job.total else 1.0,
+                "status_counts": {name: count for name, count in counts},
+            }
+            if include_items:
+                items = session.exec(
+                    select(NormalizationJobItem.sku, NormalizationJobItem.status)
+                    .where(NormalizationJobItem.job_id == job_id)
+                    .order_by(NormalizationJobItem.position)
+                ).all()
+                status["items"] = [{"sku": sku, "status": item_status} for sku, item_status in items]
+            return status
+
+    def get_results(self, job_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Resultados dos SKUs já concluídos, na ordem de submissão."""
+        with Session(engine) as session:
+            if not session.get(NormalizationJob, job_id):
+                return None
+            items = session.exec(
+                select(NormalizationJobItem)
+                .where(NormalizationJobItem.job_id == job_id, NormalizationJobItem.result_json.is_not(None))
+                .order_by(NormalizationJobItem.position)
+            ).all()
+            return [json.loads(item.result_json) for item in items]
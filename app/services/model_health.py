@@ -0,0 +1,106 @@
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from app.core.config import settings
+
+class ModelHealthRegistry:
+    """
+    Registro de saúde dos modelos do Claude (circuit breaker por modelo).
+    Reason: Um modelo indisponível para a conta não deve custar uma ida e volta
+    com falha em cada produto antes de cair no fallback.
+    """
+
+    UNAVAILABLE = "unavailable"  # 404/permissão: o modelo não existe ou não é liberado para a conta
+    TRANSIENT = "transient"      # 429/5xx/timeout: pode voltar a funcionar em instantes
+
+    def __init__(self):
+        self._models: Dict[str, Dict[str, Any]] = {}
+        self.preferred: Optional[str] = None
+
+    @classmethod
+    def classify(cls, error: Exception) -> Optional[str]:
+        """
+        Classifica a falha. Retorna None para erros que não dependem do modelo
+        (ex: API key inválida), que não devem abrir o circuito de um modelo específico.
+        """
+        status = getattr(error, "status_code", None)
+        message = str(error).lower()
+        if status in (403, 404):
+            return cls.UNAVAILABLE
+        if status == 400 and "model" in message:
+            return cls.UNAVAILABLE
+        if status == 401:
+            return None
+        if status is None or status == 429 or status >= 500:
+            # Sem status: timeout ou falha de conexão
+            return cls.TRANSIENT
+        return None
+
+    def _entry(self, model: str) -> Dict[str, Any]:
+        return self._models.setdefault(model, {
+            "status": "unknown",
+            "failures": 0,
+            "cooldown_until": 0.0,
+            "last_error": None,
+            "last_success_at": None,
+        })
+
+    def record_success(self, model: str) -> None:
+        entry = self._entry(model)
+        entry.update(status="ok", failures=0, cooldown_until=0.0, last_success_at=datetime.utcnow().isoformat())
+        self.preferred = model
+
+    def record_failure(self, model: str, error: Exception) -> None:
+        entry = self._entry(model)
+        kind = self.classify(error)
+        entry["failures"] += 1
+        entry["last_error"] = f"{type(error).__name__}: {str(error)[:200]}"
+        if kind == self.UNAVAILABLE:
+            cooldown = settings.CLAUDE_MODEL_UNAVAILABLE_COOLDOWN_SECONDS
+        elif kind == self.TRANSIENT:
+            # Reason: Falhas transitórias seguidas aumentam o resfriamento (com teto).
+            cooldown = min(
+                settings.CLAUDE_MODEL_TRANSIENT_COOLDOWN_SECONDS * (2 ** (entry["failures"] - 1)),
+                settings.CLAUDE_MODEL_UNAVAILABLE_COOLDOWN_SECONDS,
+            )
+        else:
+            return
+        entry["status"] = kind
+        entry["cooldown_until"] = time.monotonic() + cooldown
+        if self.preferred == model:
+            self.preferred = None
+
+    def order(self, candidates: List[str]) -> List[str]:
+        """
+        Ordena os candidatos: o último modelo que funcionou primeiro, e os que estão
+        em resfriamento são pulados. Se todos estiverem em resfriamento, tenta todos
+        (o que libera mais cedo primeiro) para não ficar sem resposta.
+        """
+        now = time.monotonic()
+        healthy = [m for m in candidates if self._entry(m)["cooldown_until"] <= now]
+        if self.preferred in healthy:
+            healthy.remove(self.preferred)
+            healthy.insert(0, self.preferred)
+        if healthy:
+            return healthy
+        return sorted(candidates, key=lambda m: self._entry(m)["cooldown_until"])
+
+    def snapshot(self, candidates: List[str]) -> Dict[str, Any]:
+        """Estado atual para diagnóstico."""
+        now = time.monotonic()
+        ordered = self.order(candidates)
+        return {
+            "current_model": ordered[0] if ordered else None,
+            "preferred": self.preferred,
+            "models": {
+                m: {
+                    **{k: v for k, v in self._entry(m).items() if k != "cooldown_until"},
+                    "cooldown_remaining_s": round(max(self._entry(m)["cooldown_until"] - now, 0.0), 1),
+                }
+                for m in candidates
+            },
+        }
+
+
+# Reason: Registro único no processo, compartilhado por todas as instâncias de ClaudeService.
+model_health = ModelHealthRegistry()
@@ -1,9 +1,16 @@
-from sqlmodel import Session, select
-from app.core.database import engine
+from contextlib import aclosing
+import asyncio
+import inspect
+from sqlmodel import select
+from app.core.config import settings
+from app.core.database import async_session
+from app.core import tracing
 from app.models.catalog import Category, AttributeRequirement
 from app.services.bling_client import BlingClient
 from app.services.claude_service import ClaudeService
-from typing import List, Dict, Any
+from app.services.product_mirror_service import ProductMirrorService
+from app.services.product_diff import diff_update
+from typing import List, Dict, Any, Optional, Tuple, Callable, Awaitable, Union
 
 class NormalizationService:
     """
@@ -14,99 +21,280 @@ class NormalizationService:
     def __init__(self):
         self.bling_client = BlingClient()
         self.claude_service = ClaudeService()
+        self.product_mirror = ProductMirrorService(self.bling_client)
+
+    async def _find_product_by_sku(self, sku: str) -> Optional[Dict[str, Any]]:
+        """
+        Resolve o SKU para o produto do Bling.
+
+        Reason: Com o espelho local carregado, é uma consulta indexada sem ida à API;
+        antes da carga inicial, a listagem do Bling é filtrada pelo SKU (`codigo`) - uma
+        chamada por SKU, e não uma varredura do catálogo inteiro para cada um. Um SKU ausente
+        no espelho (ex: produto criado depois da última sincronização) dispara uma
+        atualização incremental antes de ser dado como não encontrado.
+        """
+        if await self.product_mirror.is_loaded_async():
+            row = await self.product_mirror.resolve_sku_async(sku)
+            if not row and await self.product_mirror.refresh_if_stale():
+                row = await self.product_mirror.resolve_sku_async(sku)
+            if not row:
+                return None
+            return {"id": row.bling_id, "codigo": row.codigo, "nome": row.nome}
+
+        matches: List[Dict[str, Any]] = []
+        listing = self.bling_client.iter_products(
+            filters={"codigo": sku}, fields=("id", "codigo", "nome", "situacao"), max_pages=1,
+        )
+        async with aclosing(listing) as products:
+            async for product in products:
+                # O filtro do Bling pode ser por prefixo; só vale o SKU exato e não excluído
+                if product.get("codigo") == sku and product.get("situacao") != ProductMirrorService.DELETED:
+                    matches.append(product)
+        if not matches:
+            return None
+        # Mesma preferência do espelho: o produto ativo primeiro
+        return min(matches, key=lambda p: p.get("situacao") != ProductMirrorService.ACTIVE)
+
+    @staticmethod
+    async def _load_category(internal_category_id: int) -> Tuple[Optional[Category], List[AttributeRequirement]]:
+        """
+        Carrega a categoria interna e seus requisitos de atributos.
+
+        Reason: A sessão é fechada antes das chamadas de rede, para que SKUs em paralelo
+        não segurem conexões do pool enquanto aguardam Bling/Claude.
+        """
+        async with async_session() as session:
+            category = await session.get(Category, internal_category_id)
+            attribute_reqs = (await session.exec(
+                select(AttributeRequirement).where(AttributeRequirement.category_id == internal_category_id)
+            )).all()
+            return category, list(attribute_reqs)
+
+    async def _prepare(self, sku: str) -> Dict[str, Any]:
+        """
+        Etapa de rede anterior à IA: resolve o SKU e busca o produto completo.
+
+        Returns:
+            {"product_id", "full_product"} ou um resultado de erro (com "status").
+        """
+        # 3. Buscar o produto no Bling para pegar o ID
+        product_summary = await self._find_product_by_sku(sku)
+
+        if not product_summary:
+            return {"sku": sku, "status": "error", "message": "Produto não encontrado no Bling"}
+
+        product_id = product_summary.get("id")
+
+        # NOVO: Buscar detalhes completos para a IA ter o que analisar
+        full_product = await self.bling_client.get_product_by_id(product_id)
+        return {"product_id": product_id, "full_product": full_product}
+
+    @staticmethod
+    def _ai_input(sku: str, full_product: Dict[str, Any]) -> Dict[str, Any]:
+        """Título e descrição enviados ao Claude."""
+        return {
+            "sku": sku,
+            "title": full_product.get("nome", ""),
+            "description": full_product.get("descricaoCurta", "") or full_product.get("nome", ""),
+        }
+
+    async def _finalize(
+        self,
+        sku: str,
+        prepared: Dict[str, Any],
+        category: Category,
+        attribute_reqs: List[AttributeRequirement],
+        ai_results: Optional[Dict[str, Any]],
+        dry_run: bool,
+    ) -> Dict[str, Any]:
+        """Monta o payload com a categoria/atributos e aplica (ou simula) a atualização."""
+        product_id = prepared["product_id"]
+        full_product = prepared["full_product"]
+
+        # 4. Inteligência: atributos preenchidos via Claude (quando habilitado)
+        enriched_attributes = []
+        ai_details = {}
+        ai_error = None
+
+        if ai_results is not None:
+            for req in attribute_reqs:
+                val = ai_results.get(req.attribute_name, req.default_value or "N/A")
+                enriched_attributes.append({
+                    "nome": req.attribute_name,
+                    "valor": val
+                })
+                ai_details[req.attribute_name] = val
+
+            ai_error = ai_results.get("_error")
+
+        # 5. Preparar dados para atualização
+        update_data = {
+            "categoria": {"id": int(category.bling_id)},
+        }
+
+        if enriched_attributes:
+            # No Bling v3, 'caracteristicas' é o campo para atributos de produto
+            update_data["caracteristicas"] = enriched_attributes
+
+        # 6. Enviar só o que mudou em relação ao produto atual (PATCH sem efeito é pulado)
+        changes = diff_update(full_product, update_data)
+        if not changes:
+            if not dry_run:
+                await self.product_mirror.set_category(product_id, category.bling_id, category.name)
+            return {
+                "sku": sku,
+                "status": "unchanged",
+                "category": category.name,
+                "suggested_attributes": ai_details,
+                "ai_error": ai_error,
+            }
+
+        if dry_run:
+            return {
+                "sku": sku, 
+                "status": "dry_run_pending", 
+                "changed_fields": list(changes.keys()),
+                "new_category": category.name,
+                "suggested_attributes": ai_details,
+                "ai_error": ai_error,
+                "ai_input_preview": {
+                    "title": (full_product.get("nome", "") or "")[:120],
+                    "description": (full_product.get("descricaoCurta", "") or "")[:200],
+                },
+            }
+
+        # 7. Executar atualização real
+        try:
+            await self.bling_client.update_product(product_id, changes)
+            await self.product_mirror.set_category(product_id, category.bling_id, category.name)
+            return {
+                "sku": sku, 
+                "status": "success", 
+                "category": category.name,
+                "changed_fields": list(changes.keys()),
+                "attributes_updated": list(ai_details.keys()) if "caracteristicas" in changes else []
+            }
+        except Exception as e:
+            return {"sku": sku, "status": "error", "message": str(e)}
 
     async def apply_category_to_product(self, sku: str, internal_category_id: int, dry_run: bool = True, use_ai: bool = True) -> Dict[str, Any]:
         """
         Vincula um produto a uma categoria e preenche atributos obrigatórios usando IA.
         """
-        with Session(engine) as session:
-            # 1. Buscar categoria interna
-            category = session.get(Category, internal_category_id)
-            if not category or not category.bling_id:
-                return {"sku": sku, "status": "error", "message": "Categoria interna não sincronizada com Bling"}
-
-            # 2. Buscar requisitos de atributos (campos customizados/características)
-            attribute_reqs = session.exec(
-                select(AttributeRequirement).where(AttributeRequirement.category_id == internal_category_id)
-            ).all()
-
-            # 3. Buscar o produto no Bling para pegar o ID
-            all_products = await self.bling_client.get_products(limit=100)
-            product_summary = next((p for p in all_products if p.get("codigo") == sku), None)
-
-            if not product_summary:
-                return {"sku": sku, "status": "error", "message": "Produto não encontrado no Bling"}
-
-            product_id = product_summary.get("id")
-            
-            # NOVO: Buscar detalhes completos para a IA ter o que analisar
-            full_product = await self.bling_client.get_product_by_id(product_id)
-            
-            # 4. Inteligência: Preencher atributos via Claude se habilitado
-            enriched_attributes = []
-            ai_details = {}
-            
-            if use_ai and attribute_reqs:
-                required_names = [req.attribute_name for req in attribute_reqs]
-                
-                # Agora passamos o nome completo e a descrição real
+        # 1-2. Buscar categoria interna e requisitos de atributos (campos customizados/características)
+        category, attribute_reqs = await self._load_category(internal_category_id)
+        if not category or not category.bling_id:
+            return {"sku": sku, "status": "error", "message": "Categoria interna não sincronizada com Bling"}
+
+        with tracing.span("prepare", sku=sku):
+            prepared = await self._prepare(sku)
+        if "status" in prepared:
+            return prepared
+
+        ai_results = None
+        if use_ai and attribute_reqs:
+            ai_input = self._ai_input(sku, prepared["full_product"])
+            with tracing.span("enrich", sku=sku):
                 ai_results = await self.claude_service.enrich_product_data(
-                    product_title=full_product.get("nome", ""),
-                    product_description=full_product.get("descricaoCurta", "") or full_product.get("nome", ""),
-                    required_attributes=required_names
+                    product_title=ai_input["title"],
+                    product_description=ai_input["description"],
+                    required_attributes=[req.attribute_name for req in attribute_reqs]
                 )
-                
-                for req in attribute_reqs:
-                    val = ai_results.get(req.attribute_name, req.default_value or "N/A")
-                    enriched_attributes.append({
-                        "nome": req.attribute_name,
-                        "valor": val
-                    })
-                    ai_details[req.attribute_name] = val
-                
-                ai_error = ai_results.get("_error")
+
+        with tracing.span("finalize", sku=sku):
+            return await self._finalize(sku, prepared, category, attribute_reqs, ai_results, dry_run)
+
+    @staticmethod
+    def summarize(results: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Contagem do lote: atualizados, já no estado desejado (sem PATCH), simulados e erros."""
+        summary = {"total": len(results), "updated": 0, "unchanged": 0, "dry_run_pending": 0, "errors": 0}
+        for result in results:
+            status = result.get("status")
+            if status == "success":
+                summary["updated"] += 1
+            elif status == "unchanged":
+                summary["unchanged"] += 1
+            elif status == "dry_run_pending":
+                summary["dry_run_pending"] += 1
             else:
-                ai_error = None
+                summary["errors"] += 1
+        return summary
 
-            # 5. Preparar dados para atualização
-            update_data = {
-                "categoria": {"id": int(category.bling_id)},
-            }
-            
-            if enriched_attributes:
-                # No Bling v3, 'caracteristicas' é o campo para atributos de produto
-                update_data["caracteristicas"] = enriched_attributes
-
-            if dry_run:
-                return {
-                    "sku": sku, 
-                    "status": "dry_run_pending", 
-                    "new_category": category.name,
-                    "suggested_attributes": ai_details,
-                    "ai_error": ai_error,
-                    "ai_input_preview": {
-                        "title": (full_product.get("nome", "") or "")[:120],
-                        "description": (full_product.get("descricaoCurta", "") or "")[:200],
-                    },
-                }
-
-            # 6. Executar atualização real
-            try:
-                await self.bling_client.update_product(product_id, update_data)
-                return {
-                    "sku": sku, 
-                    "status": "success", 
-                    "category": category.name,
-                    "attributes_updated": list(ai_details.keys())
-                }
-            except Exception as e:
-                return {"sku": sku, "status": "error", "message": str(e)}
-
-    async def batch_normalize(self, skus: List[str], internal_category_id: int, dry_run: bool = True, use_ai: bool = True) -> List[Dict[str, Any]]:
-        """Aplica normalização em massa para uma lista de SKUs."""
-        results = []
-        for sku in skus:
-            res = await self.apply_category_to_product(sku, internal_category_id, dry_run, use_ai)
-            results.append(res)
-        return results
+    async def batch_normalize(
+        self,
+        skus: List[str],
+        internal_category_id: int,
+        dry_run: bool = True,
+        use_ai: bool = True,
+        concurrency: Optional[int] = None,
+        on_result: Optional[Callable[[int, Dict[str, Any]], Union[None, Awaitable[None]]]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Aplica normalização em massa para uma lista de SKUs.
+
+        Args:
+            concurrency: Quantidade máxima de SKUs processados em paralelo
+                (padrão: NORMALIZATION_CONCURRENCY). Use 1 para o modo sequencial.
+            on_result: Chamado com (índice, resultado) assim que cada SKU termina
+                (ex: checkpoint de jobs). Pode ser uma coroutine function; nesse caso é aguardada.
+
+        Returns:
+            Resultados na mesma ordem de `skus`. Um erro em um SKU não afeta os demais.
+
+        Reason: Com IA habilitada, os produtos são enriquecidos em lotes (um prompt para
+        vários SKUs da mesma categoria) em vez de um prompt por produto.
+        """
+        limit = max(1, concurrency or settings.NORMALIZATION_CONCURRENCY)
+        semaphore = asyncio.Semaphore(limit)
+
+        async def isolated(sku: str, coro, stage: str = "sku") -> Dict[str, Any]:
+            # Reason: Um span por SKU e etapa, para ver no trace qual SKU/etapa dominou o lote.
+            async with semaphore:
+                try:
+                    with tracing.span(stage, sku=sku):
+                        return await coro
+                except Exception as e:
+                    # Reason: Isolamento por SKU - uma falha não derruba o lote inteiro.
+                    return {"sku": sku, "status": "error", "message": str(e)}
+
+        async def final(index: int, sku: str, coro, stage: str = "sku") -> Dict[str, Any]:
+            result = await isolated(sku, coro, stage)
+            if on_result:
+                outcome = on_result(index, result)
+                if inspect.isawaitable(outcome):
+                    await outcome
+            return result
+
+        category, attribute_reqs = await self._load_category(internal_category_id)
+        if not (use_ai and attribute_reqs and category and category.bling_id):
+            # Reason: gather preserva a ordem de entrada nos resultados.
+            return list(await asyncio.gather(*(
+                final(i, sku, self.apply_category_to_product(sku, internal_category_id, dry_run, use_ai))
+                for i, sku in enumerate(skus)
+            )))
+
+        # Fase 1: resolver SKUs e buscar produtos completos
+        prepared = list(await asyncio.gather(*(isolated(sku, self._prepare(sku), "prepare") for sku in skus)))
+
+        # Fase 2: enriquecimento em lote
+        required_names = [req.attribute_name for req in attribute_reqs]
+        ai_inputs = [
+            self._ai_input(sku, prep["full_product"])
+            for sku, prep in zip(skus, prepared) if "status" not in prep
+        ]
+        try:
+            with tracing.span("enrich_batch", products=len(ai_inputs)):
+                ai_by_sku = await self.claude_service.enrich_products_batch(ai_inputs, required_names)
+        except Exception as e:
+            error = {**{name: "N/A" for name in required_names}, "_error": f"{type(e).__name__}: {str(e)[:300]}"}
+            ai_by_sku = {item["sku"]: error for item in ai_inputs}
+
+        # Fase 3: aplicar (ou simular) as atualizações
+        async def finalize(sku: str, prep: Dict[str, Any]) -> Dict[str, Any]:
+            if "status" in prep:
+                return prep
+            return await self._finalize(sku, prep, category, attribute_reqs, ai_by_sku.get(sku), dry_run)
 
+        return list(await asyncio.gather(*(
+            final(i, sku, finalize(sku, prep), "finalize") for i, (sku, prep) in enumerate(zip(skus, prepared))
+        )))
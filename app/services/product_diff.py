@@ -0,0 +1,67 @@
+import hashlib
+import json
+import re
+from typing import Dict, Any, Optional
+
+def _normalize_text(value: Any) -> str:
+    """Normaliza valores de atributo para comparação (espaços e caixa)."""
+    if value is None:
+        return ""
+    return re.sub(r"\s+", " ", str(value)).strip().casefold()
+
+
+def _category_id(value: Any) -> Optional[str]:
+    if isinstance(value, dict):
+        value = value.get("id")
+    if value in (None, "", 0, "0"):
+        return None
+    return str(value)
+
+
+def _characteristics(value: Any) -> Dict[str, str]:
+    """
+    Converte 'caracteristicas' em {nome normalizado: valor normalizado}.
+    Reason: O Bling pode devolver uma lista [{"nome", "valor"}] ou um objeto {nome: valor}.
+    """
+    if isinstance(value, dict):
+        items = value.items()
+    else:
+        items = ((item.get("nome"), item.get("valor")) for item in value or [] if isinstance(item, dict))
+    return {_normalize_text(name): _normalize_text(val) for name, val in items if name}
+
+
+def normalized_state(data: Dict[str, Any], fields: Optional[set] = None) -> Dict[str, Any]:
+    """Projeção normalizada dos campos gerenciados pela normalização (categoria e características)."""
+    state: Dict[str, Any] = {}
+    if fields is None or "categoria" in fields:
+        state["categoria"] = _category_id(data.get("categoria"))
+    if fields is None or "caracteristicas" in fields:
+        state["caracteristicas"] = _characteristics(data.get("caracteristicas"))
+    return state
+
+
+def state_hash(state: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(state, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def diff_update(current: Dict[str, Any], update_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compara o produto atual do Bling com o estado desejado e devolve apenas os campos alterados.
+
+    Returns:
+        Payload do PATCH só com o que mudou ({} = produto já está no estado desejado).
+
+    Reason: Reexecuções de normalização não devem gastar a cota do Bling com PATCHes sem efeito.
+    Apenas as características enviadas são comparadas (as demais do produto são ignoradas).
+    """
+    desired = normalized_state(update_data, set(update_data))
+    existing = normalized_state(current, set(update_data))
+    if "caracteristicas" in existing:
+        existing["caracteristicas"] = {
+            name: existing["caracteristicas"].get(name, "") for name in desired["caracteristicas"]
+        }
+    if state_hash(desired) == state_hash(existing):
+        return {}
+
+    # Reason: 'caracteristicas' vai inteira quando algum valor mudou (o Bling substitui a lista).
+    return {field: update_data[field] for field in desired if desired[field] != existing.get(field)}
@@ -0,0 +1,285 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Iterable, AsyncIterator
+from sqlalchemy import case, or_
+from sqlmodel import Session, select, func
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.core.config import settings
+from app.core.database import engine, async_session
+from app.models.catalog import BlingProduct, MirrorSyncState
+from app.services.bling_client import BlingClient
+
+class ProductMirrorService:
+    """
+    Espelho local dos produtos do Bling, indexado por SKU (`codigo`).
+    Reason: Evita listar o catálogo inteiro na API a cada SKU normalizado/auditado.
+    """
+
+    STATE_NAME = "products"
+    # Reason: Bling v3 - criterio=5 lista todos os produtos (ativos, inativos e excluídos).
+    ALL_PRODUCTS_CRITERIA = 5
+    # Situação no Bling: A = ativo, I = inativo, E = excluído
+    ACTIVE = "A"
+    DELETED = "E"
+
+    # Reason: Uma única atualização por vez quando vários SKUs não são achados ao mesmo tempo.
+    _refresh_lock: Optional[asyncio.Lock] = None
+    _lock_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def __init__(self, bling_client: Optional[BlingClient] = None):
+        self.bling_client = bling_client or BlingClient()
+
+    @staticmethod
+    def _to_bling_datetime(value: datetime) -> str:
+        """Converte um datetime UTC para o formato/fuso esperado nos filtros do Bling."""
+        local = value + timedelta(hours=settings.BLING_UTC_OFFSET_HOURS)
+        return local.strftime("%Y-%m-%d %H:%M:%S")
+
+    @staticmethod
+    def _apply(row: BlingProduct, product: Dict[str, Any], synced_at: datetime, partial: bool = False) -> None:
+        """
+        Copia os campos do produto do Bling para a linha do espelho.
+
+        Args:
+            partial: Payload parcial (ex: webhook) - só altera os campos presentes nele.
+                Reason: O webhook de alteração pode trazer só parte do produto; tratar a
+                ausência como vazio apagaria SKU, nome, situação e categoria do espelho.
+        """
+        if not partial or "codigo" in product:
+            row.codigo = product.get("codigo") or None
+        if not partial or "nome" in product:
+            row.nome = product.get("nome")
+        if not partial or "situacao" in product:
+            row.situacao = product.get("situacao")
+        if not partial or "categoria" in product:
+            categoria = product.get("categoria") or {}
+            categoria_id = str(categoria["id"]) if categoria.get("id") else None
+            categoria_nome = categoria.get("nome") or categoria.get("descricao")
+            if partial and categoria_nome is None and categoria_id == row.categoria_bling_id:
+                # Mesma categoria sem o nome no payload: mantém o nome já conhecido
+                categoria_nome = row.categoria_nome
+            row.categoria_bling_id = categoria_id
+            row.categoria_nome = categoria_nome
+        row.synced_at = synced_at
+
+    async def _upsert_page(
+        self, session: AsyncSession, products: List[Dict[str, Any]], synced_at: datetime, partial: bool = False
+    ) -> int:
+        """Insere/atualiza uma página de produtos com uma única consulta de leitura."""
+        by_id = {str(p["id"]): p for p in products if p.get("id") is not None}
+        if not by_id:
+            return 0
+        existing = (await session.exec(
+            select(BlingProduct).where(BlingProduct.bling_id.in_(list(by_id)))
+        )).all()
+        rows = {row.bling_id: row for row in existing}
+        for bling_id, product in by_id.items():
+            row = rows.get(bling_id) or BlingProduct(bling_id=bling_id)
+            self._apply(row, product, synced_at, partial=partial)
+            session.add(row)
+        return len(by_id)
+
+    async def upsert_products(self, products: List[Dict[str, Any]]) -> int:
+        """
+        Aplica ao espelho produtos recebidos fora da listagem (ex: webhooks).
+        Os payloads são tratados como parciais: campos ausentes mantêm o valor atual.
+        """
+        async with async_session() as session:
+            count = await self._upsert_page(session, products, datetime.utcnow(), partial=True)
+            await session.commit()
+            return count
+
+    async def delete_product(self, bling_id: str) -> bool:
+        """Remove um produto excluído no Bling do espelho."""
+        async with async_session() as session:
+            row = (await session.exec(select(BlingProduct).where(BlingProduct.bling_id == str(bling_id)))).first()
+            if not row:
+                return False
+            await session.delete(row)
+            await session.commit()
+            return True
+
+    async def get_state(self) -> Optional[MirrorSyncState]:
+        async with async_session() as session:
+            return await session.get(MirrorSyncState, self.STATE_NAME)
+
+    def is_loaded(self) -> bool:
+        """Indica se a carga inicial do espelho já foi feita (para código síncrono)."""
+        with Session(engine) as session:
+            state = session.get(MirrorSyncState, self.STATE_NAME)
+        return bool(state and state.last_full_sync_at)
+
+    async def is_loaded_async(self) -> bool:
+        """Versão assíncrona de `is_loaded` (para handlers async)."""
+        state = await self.get_state()
+        return bool(state and state.last_full_sync_at)
+
+    @classmethod
+    def _get_lock(cls) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if cls._refresh_lock is None or cls._lock_loop is not loop:
+            cls._refresh_lock = asyncio.Lock()
+            cls._lock_loop = loop
+        return cls._refresh_lock
+
+    async def refresh_if_stale(self) -> bool:
+        """
+        Atualização incremental após um SKU não ser encontrado no espelho.
+        Reason: Produtos criados depois da última sincronização precisam ser normalizáveis;
+        o intervalo mínimo evita uma varredura por SKU ausente.
+
+        Returns:
+            True se o espelho foi atualizado (por esta chamada ou por uma concorrente).
+        """
+        state = await self.get_state()
+        seen = state.last_synced_at if state else None
+        async with self._get_lock():
+            state = await self.get_state()
+            last = state.last_synced_at if state else None
+            if last != seen:
+                # Outro chamador atualizou enquanto esperávamos o lock
+                return True
+            if last and datetime.utcnow() - last < timedelta(seconds=settings.PRODUCT_MIRROR_MISS_REFRESH_SECONDS):
+                return False
+            await self.refresh()
+            return True
+
+    async def refresh(self, full: bool = False) -> Dict[str, Any]:
+        """
+        Atualiza o espelho local.
+
+        Args:
+            full: Força a carga completa. Sem isso, busca apenas produtos alterados
+                desde a última sincronização (ou faz a carga inicial, se nunca houve).
+        """
+        started_at = datetime.utcnow()
+        state = await self.get_state()
+        incremental = not full and bool(state and state.last_synced_at)
+
+        filters: Dict[str, Any] = {"criterio": self.ALL_PRODUCTS_CRITERIA}
+        if incremental:
+            since = state.last_synced_at - timedelta(minutes=settings.PRODUCT_MIRROR_OVERLAP_MINUTES)
+            filters["dataAlteracaoInicial"] = self._to_bling_datetime(since)
+
+        upserted = 0
+        page: List[Dict[str, Any]] = []
+        # Reason: Sessão assíncrona - a varredura intercala chamadas ao Bling e gravações
+        # por página, e roda no event loop (inclusive a partir de um SKU não encontrado).
+        async with async_session() as session:
+            async for product in self.bling_client.iter_products(filters=filters):
+                page.append(product)
+                if len(page) >= BlingClient.MAX_PAGE_SIZE:
+                    upserted += await self._upsert_page(session, page, started_at)
+                    await session.commit()
+                    page = []
+            if page:
+                upserted += await self._upsert_page(session, page, started_at)
+
+            # Reason: A marca d'água só avança se a varredura terminou sem erro.
+            state = await session.get(MirrorSyncState, self.STATE_NAME) or MirrorSyncState(name=self.STATE_NAME)
+            state.last_synced_at = started_at
+            if not incremental:
+                state.last_full_sync_at = started_at
+            state.updated_at = datetime.utcnow()
+            session.add(state)
+            await session.commit()
+
+        return {
+            "mode": "incremental" if incremental else "full",
+            "since": filters.get("dataAlteracaoInicial"),
+            "upserted": upserted,
+            "synced_at": started_at.isoformat(),
+        }
+
+    @classmethod
+    def _listed(cls):
+        """Produtos ativos (ou sem situação conhecida) - o que a auditoria deve contar."""
+        return or_(BlingProduct.situacao == cls.ACTIVE, BlingProduct.situacao.is_(None))
+
+    @classmethod
+    def _sku_query(cls, *conditions):
+        """
+        Consulta por SKU que ignora excluídos e prefere o ativo.
+        Reason: O espelho guarda todos os produtos (criterio=5) e `codigo` não é único;
+        um duplicado excluído não pode ser o alvo da normalização.
+        """
+        preference = case((BlingProduct.situacao == cls.ACTIVE, 0), (BlingProduct.situacao.is_(None), 1), else_=2)
+        return (
+            select(BlingProduct)
+            .where(*conditions, or_(BlingProduct.situacao.is_(None), BlingProduct.situacao != cls.DELETED))
+            .order_by(preference, BlingProduct.id.desc())
+        )
+
+    def resolve_sku(self, sku: str) -> Optional[BlingProduct]:
+        """Busca um produto do espelho pelo SKU (consulta indexada)."""
+        with Session(engine) as session:
+            return session.exec(self._sku_query(BlingProduct.codigo == sku)).first()
+
+    async def resolve_sku_async(self, sku: str) -> Optional[BlingProduct]:
+        """Versão assíncrona de `resolve_sku` (não bloqueia o event loop)."""
+        async with async_session() as session:
+            return (await session.exec(self._sku_query(BlingProduct.codigo == sku))).first()
+
+    async def resolve_skus(self, skus: Iterable[str]) -> Dict[str, BlingProduct]:
+        """Resolve vários SKUs de uma vez (uma única consulta IN)."""
+        wanted = list(dict.fromkeys(skus))
+        if not wanted:
+            return {}
+        async with async_session() as session:
+            rows = (await session.exec(self._sku_query(BlingProduct.codigo.in_(wanted)))).all()
+            resolved: Dict[str, BlingProduct] = {}
+            for row in rows:
+                # Linhas já vêm na ordem de preferência; fica a primeira de cada SKU
+                resolved.setdefault(row.codigo, row)
+            return resolved
+
+    async def count(self) -> int:
+        """Produtos ativos no espelho."""
+        async with async_session() as session:
+            return (await session.exec(select(func.count()).select_from(BlingProduct).where(self._listed()))).one()
+
+    async def products_without_category(self) -> List[BlingProduct]:
+        async with async_session() as session:
+            return list((await session.exec(
+                select(BlingProduct).where(BlingProduct.categoria_bling_id.is_(None), self._listed())
+            )).all())
+
+    def iter_products_without_category(self, batch_size: int = 500) -> AsyncIterator[BlingProduct]:
+        """
+        Percorre os produtos ativos sem categoria em blocos (paginação por chave).
+        Reason: Mantém a memória constante em catálogos grandes, ao contrário de `.all()`.
+        """
+        return self._iter_keyset(batch_size, BlingProduct.categoria_bling_id.is_(None), self._listed())
+
+    def iter_products(self, batch_size: int = 500) -> AsyncIterator[BlingProduct]:
+        """Percorre todo o espelho em blocos (paginação por chave)."""
+        return self._iter_keyset(batch_size)
+
+    @staticmethod
+    async def _iter_keyset(batch_size: int, *conditions) -> AsyncIterator[BlingProduct]:
+        # Reason: Consumido dentro de geradores async (auditoria em streaming, snapshot);
+        # uma sessão por bloco, sem prender conexão enquanto o consumidor processa.
+        last_id = 0
+        while True:
+            async with async_session() as session:
+                rows = (await session.exec(
+                    select(BlingProduct)
+                    .where(BlingProduct.id > last_id, *conditions)
+                    .order_by(BlingProduct.id)
+                    .limit(batch_size)
+                )).all()
+            if not rows:
+                return
+            for row in rows:
+                yield row
+            last_id = rows[-1].id
+
+    async def set_category(self, bling_id: str, categoria_bling_id: str, categoria_nome: Optional[str] = None) -> None:
+        """Reflete localmente uma troca de categoria feita por nós no Bling."""
+        async with async_session() as session:
+            row = (await session.exec(select(BlingProduct).where(BlingProduct.bling_id == str(bling_id)))).first()
+            if row:
+                row.categoria_bling_id = str(categoria_bling_id)
+                row.categoria_nome = categoria_nome
+                session.add(row)
+                await session.commit()
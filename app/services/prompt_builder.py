@@ -0,0 +1,122 @@
+import html
+import json
+import re
+from typing import Dict, Any, List
+from app.core.config import settings
+
+# Reason: As instruções são estáticas e vão no `system` com cache_control, para que o
+# prefixo seja reaproveitado entre chamadas (prompt caching) e não repetido no texto variável.
+SINGLE_INSTRUCTIONS = """Você é um especialista em cadastro de produtos para marketplaces.
+
+Tarefa: preencher os atributos pedidos, baseado APENAS no título e descrição do produto.
+
+Regras:
+- Responda com um ÚNICO objeto JSON (sem markdown, sem texto fora do JSON)
+- As chaves devem ser exatamente os nomes dos atributos listados
+- Se não for possível inferir com segurança, use "N/A"
+
+Exemplo de resposta (formato):
+{"Marca":"Clink","Material":"Bambu","Capacidade":"N/A"}"""
+
+BATCH_INSTRUCTIONS = """Você é um especialista em cadastro de produtos para marketplaces.
+
+Tarefa: para CADA produto enviado, preencher os atributos pedidos, baseado APENAS no título e descrição do próprio produto.
+
+Regras:
+- Responda com um ÚNICO objeto JSON (sem markdown, sem texto fora do JSON)
+- As chaves de primeiro nível são os SKUs; cada valor é um objeto com os atributos
+- As chaves de cada objeto devem ser exatamente os nomes dos atributos listados
+- Se não for possível inferir com segurança, use "N/A"
+
+Exemplo de resposta (formato):
+{"SKU1":{"Marca":"Clink","Material":"Bambu"},"SKU2":{"Marca":"N/A","Material":"Vidro"}}"""
+
+_DROP_BLOCKS = re.compile(r"<(script|style)[^>]*>.*?</\1>", re.IGNORECASE | re.DOTALL)
+_BREAK_TAGS = re.compile(r"<\s*(br|/p|/div|/li|/h\d|/tr)\s*/?>", re.IGNORECASE)
+_TAGS = re.compile(r"<[^>]+>")
+_SPACES = re.compile(r"[ \t\r\f\v]+")
+_SENTENCES = re.compile(r"(?<=[.!?;])\s+|\n+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa grosseira de tokens (~4 caracteres por token)."""
+    return len(text or "") // 4 + 1
+
+
+def strip_markup(text: str) -> str:
+    """Remove HTML (tags, scripts/estilos e entidades), preservando quebras de bloco."""
+    if not text:
+        return ""
+    text = _DROP_BLOCKS.sub(" ", text)
+    text = _BREAK_TAGS.sub("\n", text)
+    text = _TAGS.sub(" ", text)
+    text = html.unescape(text)
+    lines = (_SPACES.sub(" ", line).strip() for line in text.split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def dedupe_boilerplate(text: str, title: str = "") -> str:
+    """
+    Remove frases repetidas (inclusive a repetição do título).
+    Reason: Descrições do Bling costumam repetir o título e blocos padrão de loja.
+    """
+    seen = {re.sub(r"\W+", " ", title).strip().lower()} if title else set()
+    kept: List[str] = []
+    for sentence in _SENTENCES.split(text):
+        sentence = sentence.strip()
+        key = re.sub(r"\W+", " ", sentence).strip().lower()
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        kept.append(sentence)
+    return " ".join(kept)
+
+
+def truncate_to_budget(text: str, max_tokens: int) -> str:
+    """Corta o texto no orçamento de tokens, em fronteira de palavra."""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(" ", 1)[0]
+    return cut + "…"
+
+
+def compact_description(description: str, title: str = "") -> str:
+    """Pipeline completo: remove markup, deduplica e trunca no orçamento configurado."""
+    text = dedupe_boilerplate(strip_markup(description), title)
+    return truncate_to_budget(text, settings.CLAUDE_PROMPT_MAX_DESCRIPTION_TOKENS)
+
+
+def output_token_budget(attribute_count: int, product_count: int = 1) -> int:
+    """
+    Dimensiona max_tokens pelo tamanho esperado do JSON de resposta, com folga.
+    Reason: max_tokens é só um teto (não se paga pelo que não é gerado); justo demais,
+    uma resposta com valores longos é cortada no meio do JSON.
+    """
+    per_product = 16 + settings.CLAUDE_OUTPUT_TOKENS_PER_ATTRIBUTE * attribute_count
+    expected = 32 + per_product * product_count
+    return min(settings.CLAUDE_MAX_OUTPUT_TOKENS, int(expected * max(1.0, settings.CLAUDE_OUTPUT_TOKENS_HEADROOM)) + 64)
+
+
+def system_blocks(instructions: str) -> List[Dict[str, Any]]:
+    return [{"type": "text", "text": instructions, "cache_control": {"type": "ephemeral"}}]
+
+
+def single_prompt(title: str, description: str, required_attributes: List[str]) -> str:
+    return (
+        f"ATRIBUTOS (use exatamente esses nomes como chaves do JSON):\n"
+        f"{json.dumps(required_attributes, ensure_ascii=False)}\n\n"
+        f"TÍTULO:\n{title}\n\n"
+        f"DESCRIÇÃO:\n{description}"
+    )
+
+
+def batch_prompt(products: List[Dict[str, Any]], required_attributes: List[str]) -> str:
+    items = "\n\n".join(
+        f"SKU: {p['sku']}\nTÍTULO:\n{p['title']}\nDESCRIÇÃO:\n{p['description']}" for p in products
+    )
+    return (
+        f"ATRIBUTOS (use exatamente esses nomes como chaves):\n"
+        f"{json.dumps(required_attributes, ensure_ascii=False)}\n\n"
+        f"PRODUTOS:\n{items}"
+    )
@@ -0,0 +1,147 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional
+
+class TokenBucket:
+    """
+    Token bucket assíncrono para cadenciar requisições.
+    Reason: Respeitar o limite por segundo da API sem depender de estourar 429 para descobrir o teto.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = max(rate, 0.001)
+        self.capacity = max(capacity, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def available(self) -> float:
+        self._refill(time.monotonic())
+        return self._tokens
+
+    def pause(self, seconds: float) -> None:
+        """Suspende a emissão de tokens (ex: após um 429), afetando todos os chamadores."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+    async def acquire(self) -> float:
+        """Aguarda até haver um token disponível. Retorna o tempo esperado (s)."""
+        waited = 0.0
+        # Reason: O lock garante ordem FIFO entre os chamadores que aguardam.
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                else:
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return waited
+                    delay = (1 - self._tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+
+
+class DailyQuota:
+    """
+    Contador da cota diária de requisições.
+    Reason: O Bling zera a cota à meia-noite no horário de Brasília.
+    """
+
+    def __init__(self, limit: int, utc_offset_hours: int, reported_ttl_seconds: float = 60.0):
+        self.limit = limit
+        self.utc_offset_hours = utc_offset_hours
+        self.used = 0
+        self._day = self._today()
+        # Valores informados pelo próprio Bling (quando enviados nos headers)
+        self.reported_remaining: Optional[int] = None
+        self.reported_ttl = reported_ttl_seconds
+        self._reported_at = 0.0
+
+    def _today(self):
+        return (datetime.utcnow() + timedelta(hours=self.utc_offset_hours)).date()
+
+    def _roll(self) -> None:
+        today = self._today()
+        if today != self._day:
+            self._day = today
+            self.used = 0
+            self.reported_remaining = None
+
+    def report(self, remaining: int) -> None:
+        self.reported_remaining = remaining
+        self._reported_at = time.monotonic()
+
+    @property
+    def local_remaining(self) -> int:
+        """Restante pelo contador local (o único usado para recusar requisições)."""
+        self._roll()
+        return max(self.limit - self.used, 0)
+
+    @property
+    def remaining(self) -> int:
+        """
+        Restante considerando também o último valor informado pelo Bling.
+        Reason: O valor informado expira após `reported_ttl` - o header pode ser de uma
+        janela curta, e um 0 antigo não pode travar as chamadas até a meia-noite.
+        """
+        local = self.local_remaining
+        if self.reported_remaining is not None and time.monotonic() - self._reported_at < self.reported_ttl:
+            return min(local, self.reported_remaining)
+        return local
+
+    def consume(self) -> None:
+        self._roll()
+        self.used += 1
+
+
+class RequestScheduler:
+    """
+    Agendador de requisições: token bucket por segundo + cota diária + contadores ao vivo.
+    """
+
+    def __init__(self, rate_per_second: float, burst: int, daily_limit: int, utc_offset_hours: int,
+                 reported_ttl_seconds: float = 60.0):
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.daily = DailyQuota(daily_limit, utc_offset_hours, reported_ttl_seconds)
+        self.counters: Dict[str, float] = {
+            "requests": 0,
+            "throttled_429": 0,
+            "server_errors": 0,
+            "retries": 0,
+            "wait_seconds": 0.0,
+        }
+
+    async def acquire(self) -> None:
+        waited = await self.bucket.acquire()
+        self.daily.consume()
+        self.counters["requests"] += 1
+        self.counters["wait_seconds"] += waited
+
+    def update_from_headers(self, headers) -> None:
+        """Lê contadores de cota enviados pela API, se existirem."""
+        remaining = headers.get("x-ratelimit-remaining")
+        if remaining is not None:
+            try:
+                self.daily.report(int(remaining))
+            except ValueError:
+                pass
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "rate_per_second": self.bucket.rate,
+            "burst": self.bucket.capacity,
+            "tokens_available": round(self.bucket.available, 3),
+            "daily_limit": self.daily.limit,
+            "daily_used": self.daily.used,
+            "daily_remaining": self.daily.remaining,
+            **{k: round(v, 3) if isinstance(v, float) else v for k, v in self.counters.items()},
+        }
@@ -0,0 +1,116 @@
+import re
+from typing import List, Dict, Any, Optional, Set, Tuple
+from app.models.catalog import Category, CategoryMapping
+from app.services.bling_client import BlingClient
+
+def normalize_name(name: Optional[str]) -> str:
+    """Normaliza nomes de categoria para comparação (caixa e espaços)."""
+    return re.sub(r"\s+", " ", (name or "")).strip().casefold()
+
+
+class RemoteCatalog:
+    """
+    Árvore de categorias e vínculos multiloja existentes no Bling (lidos uma única vez).
+    """
+
+    def __init__(self, categories: List[Dict[str, Any]], links: Optional[List[Dict[str, Any]]]):
+        self.category_ids: Set[str] = set()
+        # (id do pai ou None, nome normalizado) -> id da categoria no Bling
+        self.by_parent_and_name: Dict[Tuple[Optional[str], str], str] = {}
+        for cat in categories:
+            cat_id = str(cat.get("id"))
+            parent = (cat.get("categoriaPai") or {}).get("id")
+            parent_id = str(parent) if parent else None
+            self.category_ids.add(cat_id)
+            self.by_parent_and_name.setdefault((parent_id, normalize_name(cat.get("descricao"))), cat_id)
+
+        # Reason: Se a listagem de vínculos não estiver disponível, links=None e
+        # todos os vínculos são tratados como pendentes (comportamento anterior).
+        self.links_known = links is not None
+        self.links: Set[Tuple[str, str, str]] = set()
+        for link in links or []:
+            key = self._link_key(link)
+            if key:
+                self.links.add(key)
+
+    @staticmethod
+    def _link_key(link: Dict[str, Any]) -> Optional[Tuple[str, str, str]]:
+        category = (link.get("categoriaProduto") or {}).get("id") or link.get("idCategoriaBling")
+        store = (link.get("loja") or {}).get("id") or link.get("idLoja")
+        code = link.get("codigo") or link.get("codigoNoMarketplace")
+        if not (category and store and code):
+            return None
+        return str(category), str(store), str(code)
+
+    def has_category(self, bling_id: Optional[str]) -> bool:
+        return bool(bling_id) and str(bling_id) in self.category_ids
+
+    def find_child(self, parent_bling_id: Optional[str], name: str) -> Optional[str]:
+        return self.by_parent_and_name.get((parent_bling_id, normalize_name(name)))
+
+    def has_link(self, bling_id: Optional[str], store_id: str, external_category_id: str) -> bool:
+        return bool(bling_id) and (str(bling_id), str(store_id), str(external_category_id)) in self.links
+
+
+class ReconciliationService:
+    """
+    Compara as categorias/vínculos locais com o que já existe no Bling e gera o plano mínimo.
+    Reason: Com o banco local zerado (SQLite em /tmp na Vercel), categorias existentes no Bling
+    não devem ser recriadas, nem vínculos já cadastrados reenviados.
+    """
+
+    # Ações do plano
+    SKIP = "skip"      # já existe no Bling com o bling_id local
+    ADOPT = "adopt"    # existe no Bling pelo caminho, mas o banco local não sabe o ID
+    CREATE = "create"  # não existe no Bling
+    LINK = "link"
+
+    def __init__(self, bling_client: Optional[BlingClient] = None):
+        self.bling_client = bling_client or BlingClient()
+
+    async def fetch_remote(self) -> RemoteCatalog:
+        """Lê a árvore de categorias e os vínculos existentes no Bling."""
+        categories = [cat async for cat in self.bling_client.iter_categories()]
+        try:
+            links: Optional[List[Dict[str, Any]]] = [link async for link in self.bling_client.iter_category_links()]
+        except Exception:
+            links = None
+        return RemoteCatalog(categories, links)
+
+    def build_plan(
+        self,
+        levels: List[List[Category]],
+        mappings_by_category: Dict[int, List[CategoryMapping]],
+        remote: RemoteCatalog,
+    ) -> Dict[int, Dict[str, Any]]:
+        """
+        Gera o plano por categoria, casando pelo caminho (pai no Bling + nome).
+
+        Returns:
+            category_id -> {"action", "bling_id", "stale_bling_id", "links": {mapping_id: ação}}
+        """
+        plan: Dict[int, Dict[str, Any]] = {}
+        for level in levels:
+            for cat in level:
+                parent_plan = plan.get(cat.parent_id) if cat.parent_id else None
+                parent_bling_id = parent_plan["bling_id"] if parent_plan else None
+                entry: Dict[str, Any] = {"action": self.CREATE, "bling_id": None, "stale_bling_id": None}
+
+                if remote.has_category(cat.bling_id):
+                    entry.update(action=self.SKIP, bling_id=cat.bling_id)
+                else:
+                    if cat.bling_id:
+                        # ID local não existe mais no Bling
+                        entry["stale_bling_id"] = cat.bling_id
+                    # Pai novo (ainda sem ID) => o filho também não pode existir no Bling
+                    can_match = parent_plan is None or parent_bling_id is not None
+                    match = remote.find_child(parent_bling_id, cat.name) if can_match else None
+                    if match:
+                        entry.update(action=self.ADOPT, bling_id=match)
+
+                entry["links"] = {
+                    mapping.id: self.SKIP if remote.has_link(entry["bling_id"], mapping.bling_store_id, mapping.external_category_id) else self.LINK
+                    for mapping in mappings_by_category.get(cat.id, [])
+                }
+                plan[cat.id] = entry
+        return plan
@@ -0,0 +1,241 @@
+import json
+import os
+import re
+import uuid
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Iterable
+from app.core.config import settings
+from app.services.bling_client import BlingClient
+from app.services.product_mirror_service import ProductMirrorService
+
+# Nome com microssegundos; nomes antigos (só até o segundo) continuam válidos
+_NAME = re.compile(r"^catalog_\d{8}T\d{6}(\d{6})?Z$")
+
+
+def _name_order(name: str) -> str:
+    """Chave de ordenação cronológica (iguala nomes com e sem microssegundos)."""
+    return name[len("catalog_"):-1].ljust(21, "0")
+
+# Colunas do snapshot (uma linha por produto)
+COLUMNS = ("sku", "id", "nome", "categoria_id", "categoria_nome", "caracteristicas")
+
+
+def _arrow():
+    """
+    Importa o pyarrow sob demanda.
+    Reason: Dependência pesada, usada só pelos snapshots; não deve pesar no boot da API.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Snapshots de catálogo exigem o pacote 'pyarrow' (pip install pyarrow).") from e
+    return pa, pc, pq
+
+
+class CatalogSnapshotService:
+    """
+    Snapshots colunares (Parquet) do catálogo de produtos.
+    Reason: Permite auditar e comparar o catálogo em momentos diferentes
+    ("quais produtos perderam a categoria desde ontem?") sem consultar o Bling de novo.
+    """
+
+    def __init__(self, bling_client: Optional[BlingClient] = None, product_mirror: Optional[ProductMirrorService] = None):
+        self.bling_client = bling_client or BlingClient()
+        self.product_mirror = product_mirror or ProductMirrorService(self.bling_client)
+        self.snapshot_dir = settings.SNAPSHOT_DIR
+
+    def _path(self, name: str) -> str:
+        # Reason: O nome vem da URL; o formato fixo impede acesso fora da pasta de snapshots.
+        if not _NAME.match(name or ""):
+            raise ValueError(f"Snapshot inválido: {name}")
+        path = os.path.join(self.snapshot_dir, f"{name}.parquet")
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Snapshot {name} não encontrado")
+        return path
+
+    @staticmethod
+    def _row_from_bling(product: Dict[str, Any]) -> Dict[str, Any]:
+        categoria = product.get("categoria") or {}
+        caracteristicas = product.get("caracteristicas")
+        return {
+            "sku": product.get("codigo"),
+            "id": str(product.get("id")),
+            "nome": product.get("nome"),
+            "categoria_id": str(categoria["id"]) if categoria.get("id") else None,
+            "categoria_nome": categoria.get("nome") or categoria.get("descricao"),
+            "caracteristicas": json.dumps(caracteristicas, ensure_ascii=False) if caracteristicas else None,
+        }
+
+    def _write_rows(self, writer, rows: List[Dict[str, Any]]) -> None:
+        pa, _, _ = _arrow()
+        writer.write_table(pa.Table.from_pylist(rows, schema=writer.schema))
+
+    async def create(self, source: str = "bling") -> Dict[str, Any]:
+        """
+        Grava um snapshot do catálogo em `SNAPSHOT_DIR` (Parquet comprimido com zstd).
+
+        Args:
+            source: "bling" lista o catálogo na API; "mirror" usa o espelho local (sem rede).
+
+        Reason: As linhas são escritas em blocos (row groups) à medida que as páginas chegam,
+        então a memória não cresce com o tamanho do catálogo.
+        """
+        pa, _, pq = _arrow()
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        # Reason: Microssegundos no nome - dois snapshots no mesmo segundo não podem se sobrescrever.
+        name = "catalog_" + datetime.utcnow().strftime("%Y%m%dT%H%M%S%fZ")
+        final_path = os.path.join(self.snapshot_dir, f"{name}.parquet")
+        tmp_path = f"{final_path}.{uuid.uuid4().hex[:8]}.tmp"
+        schema = pa.schema([(column, pa.string()) for column in COLUMNS])
+        batch_size = max(1, settings.SNAPSHOT_ROW_GROUP_SIZE)
+
+        total = 0
+        rows: List[Dict[str, Any]] = []
+        try:
+            with pq.ParquetWriter(tmp_path, schema, compression="zstd") as writer:
+                if source == "mirror":
+                    async for row in self.product_mirror.iter_products():
+                        rows.append({
+                            "sku": row.codigo,
+                            "id": row.bling_id,
+                            "nome": row.nome,
+                            "categoria_id": row.categoria_bling_id,
+                            "categoria_nome": row.categoria_nome,
+                            "caracteristicas": None,
+                        })
+                        if len(rows) >= batch_size:
+                            self._write_rows(writer, rows)
+                            total += len(rows)
+                            rows = []
+                else:
+                    async for product in self.bling_client.iter_products():
+                        rows.append(self._row_from_bling(product))
+                        if len(rows) >= batch_size:
+                            self._write_rows(writer, rows)
+                            total += len(rows)
+                            rows = []
+                if rows:
+                    self._write_rows(writer, rows)
+                    total += len(rows)
+
+            # Reason: Renomeia só no fim, para nunca expor um snapshot pela metade.
+            if os.path.exists(final_path):
+                raise FileExistsError(f"Snapshot {name} já existe")
+            os.replace(tmp_path, final_path)
+        finally:
+            # Falha no meio da escrita (ex: erro do Bling): não deixa o .tmp para trás
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return {"snapshot": name, "source": source, "rows": total, "bytes": os.path.getsize(final_path)}
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Snapshots disponíveis, do mais recente para o mais antigo."""
+        if not os.path.isdir(self.snapshot_dir):
+            return []
+        names = sorted(
+            (
+                name for name in (
+                    entry[:-len(".parquet")] for entry in os.listdir(self.snapshot_dir) if entry.endswith(".parquet")
+                )
+                if _NAME.match(name)
+            ),
+            key=_name_order,
+            reverse=True,
+        )
+        return [
+            {"snapshot": name, "bytes": os.path.getsize(os.path.join(self.snapshot_dir, f"{name}.parquet"))}
+            for name in names
+        ]
+
+    def latest(self) -> Optional[str]:
+        snapshots = self.list()
+        return snapshots[0]["snapshot"] if snapshots else None
+
+    def load(self, name: str, columns: Optional[Iterable[str]] = None):
+        """Lê o snapshot como uma tabela Arrow (apenas as colunas pedidas)."""
+        _, _, pq = _arrow()
+        return pq.read_table(self._path(name), columns=list(columns) if columns else None)
+
+    def audit(self, name: str, pending_skus: List[str]) -> Dict[str, Any]:
+        """
+        Auditoria sobre um snapshot, no mesmo formato de `AuditService.run_audit`.
+        Reason: Filtros vetorizados (is_in / is_null) em vez de laços por produto.
+        """
+        pa, pc, _ = _arrow()
+        table = self.load(name, ("sku", "id", "nome", "categoria_nome", "categoria_id"))
+
+        pending = pa.array(list(dict.fromkeys(pending_skus)), type=pa.string())
+        found_table = table.filter(pc.is_in(table["sku"], value_set=pending))
+        found: Dict[str, Dict[str, Any]] = {}
+        for row in found_table.to_pylist():
+            found.setdefault(row["sku"], {
+                "sku": row["sku"],
+                "id": row["id"],
+                "nome": row["nome"],
+                "categoria": row["categoria_nome"] or "SEM CATEGORIA",
+            })
+
+        without_category = table.filter(pc.is_null(table["categoria_id"])).select(["sku", "nome"]).to_pylist()
+        audit_results = {
+            "snapshot": name,
+            "total_bling_products": table.num_rows,
+            "pending_skus_found_in_bling": [found[sku] for sku in pending_skus if sku in found],
+            "pending_skus_missing_in_bling": [sku for sku in pending_skus if sku not in found],
+            "products_without_category": without_category,
+        }
+        audit_results["summary"] = {
+            "total_pending_requested": len(pending_skus),
+            "found_pending": len(audit_results["pending_skus_found_in_bling"]),
+            "missing_pending": len(audit_results["pending_skus_missing_in_bling"]),
+            "total_without_category": len(without_category),
+        }
+        return audit_results
+
+    def diff(self, old: str, new: str, limit: int = 1000) -> Dict[str, Any]:
+        """
+        Compara dois snapshots pelo ID do produto (join colunar).
+
+        Returns:
+            Contagens e até `limit` exemplos por tipo de mudança: added, removed,
+            lost_category, gained_category, category_changed e renamed.
+        """
+        pa, pc, _ = _arrow()
+        columns = ("id", "sku", "nome", "categoria_id", "categoria_nome")
+        old_table = self.load(old, columns)
+        new_table = self.load(new, columns)
+        # Reason: Marcador não nulo de cada lado - `sku` pode ser nulo (produto sem código),
+        # então não serve para saber de qual snapshot a linha veio.
+        old_table = old_table.append_column("present_old", pa.repeat(True, old_table.num_rows))
+        new_table = new_table.append_column("present_new", pa.repeat(True, new_table.num_rows))
+        joined = old_table.join(
+            new_table, keys="id", join_type="full outer",
+            left_suffix="_old", right_suffix="_new", coalesce_keys=True,
+        )
+
+        in_old = pc.is_valid(joined["present_old"])
+        in_new = pc.is_valid(joined["present_new"])
+        both = pc.and_(in_old, in_new)
+        had_category = pc.is_valid(joined["categoria_id_old"])
+        has_category = pc.is_valid(joined["categoria_id_new"])
+
+        masks = {
+            "added": pc.and_not(in_new, in_old),
+            "removed": pc.and_not(in_old, in_new),
+            "lost_category": pc.and_(both, pc.and_not(had_category, has_category)),
+            "gained_category": pc.and_(both, pc.and_not(has_category, had_category)),
+            "category_changed": pc.and_(
+                pc.and_(both, pc.and_(had_category, has_category)),
+                pc.not_equal(joined["categoria_id_old"], joined["categoria_id_new"]),
+            ),
+            "renamed": pc.and_(both, pc.not_equal(pc.fill_null(joined["nome_old"], ""), pc.fill_null(joined["nome_new"], ""))),
+        }
+
+        joined = joined.drop_columns(["present_old", "present_new"])
+        result: Dict[str, Any] = {"old": old, "new": new, "counts": {}, "changes": {}}
+        for change, mask in masks.items():
+            rows = joined.filter(mask)
+            result["counts"][change] = rows.num_rows
+            result["changes"][change] = rows.slice(0, limit).to_pylist()
+        return result
@@ -0,0 +1,109 @@
+import logging
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Set
+from sqlmodel import select, func
+from app.core.config import settings
+from app.core.database import async_session
+from app.models.catalog import Category
+from app.models.sync import SyncJournalEntry
+from app.services.reconciliation_service import ReconciliationService, RemoteCatalog
+
+logger = logging.getLogger(__name__)
+
+class SyncJournalService:
+    """
+    Diário de escritas da sincronização de categorias e recuperação de entradas em dúvida.
+    """
+
+    CREATE = "create_category"
+    LINK = "link_category"
+
+    # Execuções em andamento neste processo (suas entradas nunca são recuperadas)
+    active_runs: Set[str] = set()
+
+    def __init__(self, reconciler: Optional[ReconciliationService] = None):
+        self.reconciler = reconciler or ReconciliationService()
+
+    @staticmethod
+    def finish(entry: SyncJournalEntry, status: str, bling_id: Optional[str] = None, error: Optional[str] = None) -> None:
+        """Registra o resultado em memória (o commit é feito em lote por quem chamou)."""
+        entry.status = status
+        entry.bling_id = bling_id or entry.bling_id
+        entry.error = error
+        entry.updated_at = datetime.utcnow()
+
+    @classmethod
+    def _in_doubt(cls):
+        """
+        Entradas "pending" de execuções que provavelmente morreram.
+        Reason: Na Vercel cada cold start roda a recuperação; uma sincronização viva em outra
+        instância tem entradas "pending" recentes que não podem ser resolvidas nem abandonadas.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.SYNC_JOURNAL_LEASE_SECONDS)
+        conditions = [SyncJournalEntry.status == "pending", SyncJournalEntry.updated_at < cutoff]
+        if cls.active_runs:
+            conditions.append(SyncJournalEntry.run_id.not_in(list(cls.active_runs)))
+        return conditions
+
+    async def pending_count(self) -> int:
+        """Entradas em dúvida (pendentes além do prazo da execução)."""
+        async with async_session() as session:
+            return (await session.exec(
+                select(func.count()).select_from(SyncJournalEntry).where(*self._in_doubt())
+            )).one()
+
+    async def recover(self, remote: Optional[RemoteCatalog] = None) -> Dict[str, Any]:
+        """
+        Resolve entradas que ficaram "pending" (processo caiu entre o POST e o commit).
+
+        Reason: Consultamos o Bling para saber se a escrita foi aplicada; se foi, gravamos o
+        ID localmente (evita recriar a categoria); se não, a entrada é abandonada e a
+        próxima sincronização refaz a escrita.
+        """
+        summary = {"resolved": 0, "abandoned": 0}
+        async with async_session() as session:
+            entries = (await session.exec(
+                select(SyncJournalEntry).where(*self._in_doubt()).order_by(SyncJournalEntry.id)
+            )).all()
+            if not entries:
+                return summary
+
+            remote = remote or await self.reconciler.fetch_remote()
+            category_ids = {entry.category_id for entry in entries}
+            categories = {
+                cat.id: cat for cat in (await session.exec(select(Category).where(Category.id.in_(category_ids)))).all()
+            }
+
+            # Criações primeiro: os vínculos dependem do bling_id recuperado
+            for entry in sorted(entries, key=lambda e: e.operation != self.CREATE):
+                cat = categories.get(entry.category_id)
+                found = None
+                if entry.operation == self.CREATE:
+                    found = remote.find_child(entry.parent_bling_id, entry.name or "")
+                    if found and cat and not cat.bling_id:
+                        cat.bling_id = found
+                        session.add(cat)
+                elif cat and remote.links_known and remote.has_link(cat.bling_id, entry.bling_store_id, entry.external_category_id):
+                    found = cat.bling_id
+
+                if found:
+                    self.finish(entry, "done", bling_id=found, error="recuperado após falha")
+                    summary["resolved"] += 1
+                else:
+                    self.finish(entry, "abandoned", error="escrita não encontrada no Bling; será refeita")
+                    summary["abandoned"] += 1
+                session.add(entry)
+            await session.commit()
+
+        logger.info("Recuperação do diário de sincronização: %s", summary)
+        return summary
+
+
+async def recover_on_startup() -> None:
+    """Executa a recuperação no startup sem derrubar o boot (ex: sem token do Bling ainda)."""
+    journal = SyncJournalService()
+    try:
+        if await journal.pending_count():
+            await journal.recover()
+    except Exception:
+        logger.exception("Falha ao recuperar o diário de sincronização; será tentado na próxima sincronização.")
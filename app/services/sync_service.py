@@ -1,8 +1,16 @@
-from sqlmodel import Session, select
-from app.core.database import engine
+import asyncio
+import uuid
+from sqlmodel import select
+from app.core.config import settings
+from app.core.database import async_session
+from app.core import tracing
 from app.models.catalog import Category, CategoryMapping
 from app.services.bling_client import BlingClient
-from typing import List, Optional
+from app.services.reconciliation_service import ReconciliationService
+from app.services.sync_journal_service import SyncJournalService
+from app.models.sync import SyncJournalEntry
+from collections import defaultdict
+from typing import List, Optional, Dict, Tuple, Any
 
 class SyncService:
     """
@@ -12,70 +20,277 @@ class SyncService:
     
     def __init__(self):
         self.bling_client = BlingClient()
+        self.reconciler = ReconciliationService(self.bling_client)
+        self.journal = SyncJournalService(self.reconciler)
 
-    async def sync_categories(self, dry_run: bool = True) -> List[dict]:
+    @staticmethod
+    def _build_levels(categories: List[Category]) -> Tuple[List[List[Category]], List[Category]]:
+        """
+        Organiza as categorias por nível da árvore (BFS a partir das raízes).
+
+        Returns:
+            (níveis, órfãs): níveis[0] são as raízes; órfãs são categorias inalcançáveis
+            a partir de uma raiz (ciclo na hierarquia).
+
+        Reason: Índice de adjacência em memória, sem consultar o pai de cada filho no banco.
+        """
+        by_id = {cat.id: cat for cat in categories}
+        children: Dict[int, List[Category]] = defaultdict(list)
+        roots: List[Category] = []
+        for cat in sorted(categories, key=lambda c: c.id):
+            # Pai inexistente é tratado como raiz
+            if cat.parent_id is not None and cat.parent_id in by_id and cat.parent_id != cat.id:
+                children[cat.parent_id].append(cat)
+            else:
+                roots.append(cat)
+
+        levels: List[List[Category]] = []
+        visited = set()
+        current = roots
+        while current:
+            levels.append(current)
+            visited.update(cat.id for cat in current)
+            current = [child for cat in current for child in children.get(cat.id, []) if child.id not in visited]
+
+        orphans = [cat for cat in categories if cat.id not in visited]
+        return levels, orphans
+
+    @staticmethod
+    def _index_mappings(mappings: List[CategoryMapping]) -> Dict[int, List[CategoryMapping]]:
+        """Agrupa os vínculos multiloja por categoria."""
+        index: Dict[int, List[CategoryMapping]] = defaultdict(list)
+        for mapping in mappings:
+            index[mapping.category_id].append(mapping)
+        return index
+
+    async def sync_categories(self, dry_run: bool = True, concurrency: Optional[int] = None, reconcile: bool = True) -> List[dict]:
         """
         Sincroniza a árvore de categorias e SEUS VÍNCULOS MULTILOJA com o Bling.
+
+        Args:
+            concurrency: Máximo de chamadas simultâneas ao Bling (padrão: SYNC_CONCURRENCY).
+            reconcile: Lê a árvore e os vínculos do Bling antes e escreve apenas as diferenças
+                (categorias existentes são adotadas pelo caminho, vínculos existentes são pulados).
+
+        Reason: Irmãos do mesmo nível não dependem entre si; cada nível é criado em paralelo
+        depois que os pais já têm `bling_id`, e os vínculos de cada categoria também rodam em paralelo.
         """
+        run_id = uuid.uuid4().hex
+        # Reason: A recuperação do diário (ex: no startup de outra requisição) ignora esta execução.
+        SyncJournalService.active_runs.add(run_id)
+        try:
+            return await self._run(run_id, dry_run, concurrency, reconcile)
+        finally:
+            SyncJournalService.active_runs.discard(run_id)
+
+    async def _run(self, run_id: str, dry_run: bool, concurrency: Optional[int], reconcile: bool) -> List[dict]:
         sync_log = []
-        
-        with Session(engine) as session:
-            # 1. Buscar todas as categorias internas
-            categories = session.exec(select(Category)).all()
-            categories_sorted = sorted(categories, key=lambda x: (x.parent_id is not None, x.id))
-
-            for cat in categories_sorted:
-                # A. Garantir que a categoria existe no Bling
-                if not cat.bling_id:
-                    if dry_run:
-                        sync_log.append({"name": cat.name, "status": "dry_run_pending_creation"})
-                    else:
-                        parent_bling_id = None
-                        if cat.parent_id:
-                            parent_cat = session.get(Category, cat.parent_id)
-                            parent_bling_id = parent_cat.bling_id if parent_cat else None
-
-                        try:
-                            bling_data = await self.bling_client.create_category(cat.name, parent_bling_id)
-                            cat.bling_id = str(bling_data.get("id"))
+        semaphore = asyncio.Semaphore(max(1, concurrency or settings.SYNC_CONCURRENCY))
+
+        remote = await self.reconciler.fetch_remote() if reconcile else None
+        if not dry_run:
+            # Resolve escritas em dúvida de uma execução anterior antes de planejar esta
+            await self.journal.recover(remote)
+
+        # Reason: Sessão assíncrona - os commits de cada lote não bloqueiam o event loop enquanto
+        # as chamadas ao Bling do lote seguinte aguardam. expire_on_commit=False (padrão de
+        # async_session) evita que cada commit force um novo SELECT por categoria.
+        async with async_session() as session:
+            # 1. Carregar a árvore inteira e todos os vínculos (número constante de consultas)
+            categories = (await session.exec(select(Category))).all()
+            mappings_by_category = self._index_mappings((await session.exec(select(CategoryMapping))).all())
+            levels, orphans = self._build_levels(categories)
+            by_id = {cat.id: cat for cat in categories}
+
+            for cat in orphans:
+                sync_log.append({"name": cat.name, "status": "error", "message": "Hierarquia com ciclo: categoria ignorada"})
+
+            plan: Dict[int, Dict[str, Any]] = {}
+            if remote is not None:
+                plan = self.reconciler.build_plan(levels, mappings_by_category, remote)
+
+            # Reason: Ordem por nível garante que todo pai é processado antes dos filhos.
+            # Cada nível é dividido em lotes: um commit com as intenções antes das escritas
+            # no Bling e um commit com os resultados depois (em vez de um commit por linha).
+            batch_size = max(1, settings.SYNC_COMMIT_BATCH_SIZE)
+            for level in levels:
+                for start in range(0, len(level), batch_size):
+                    chunk = level[start:start + batch_size]
+                    journal: Dict[Tuple[str, int], SyncJournalEntry] = {}
+                    if not dry_run:
+                        journal = self._journal_intents(run_id, chunk, by_id, mappings_by_category, plan)
+                        session.add_all(journal.values())
+                        await session.commit()
+
+                    chunk_logs = await asyncio.gather(*(
+                        self._traced_category(
+                            cat, by_id, mappings_by_category.get(cat.id, []), dry_run, semaphore,
+                            plan.get(cat.id), journal,
+                        )
+                        for cat in chunk
+                    ))
+                    for cat, logs in zip(chunk, chunk_logs):
+                        sync_log.extend(logs)
+                        if any(entry.get("status") in ("created", "adopted_existing") for entry in logs):
                             session.add(cat)
-                            session.commit()
-                            sync_log.append({"name": cat.name, "status": "created", "bling_id": cat.bling_id})
-                        except Exception as e:
-                            sync_log.append({"name": cat.name, "status": "error", "message": str(e)})
-                            continue # Pula vínculos se a criação falhou
-                else:
-                    sync_log.append({"name": cat.name, "status": "already_exists", "bling_id": cat.bling_id})
-
-                # B. Processar Vínculos Multiloja para esta categoria
-                mappings = session.exec(select(CategoryMapping).where(CategoryMapping.category_id == cat.id)).all()
-                for mapping in mappings:
-                    if dry_run:
-                        sync_log.append({
-                            "category": cat.name,
-                            "marketplace": mapping.marketplace_name,
-                            "status": "dry_run_pending_link",
-                            "external_id": mapping.external_category_id
-                        })
-                    else:
-                        try:
-                            await self.bling_client.link_category_to_store(
-                                category_id=cat.bling_id,
-                                store_id=mapping.bling_store_id,
-                                external_category_id=mapping.external_category_id
-                            )
-                            sync_log.append({
-                                "category": cat.name,
-                                "marketplace": mapping.marketplace_name,
-                                "status": "linked_success"
-                            })
-                        except Exception as e:
-                            sync_log.append({
-                                "category": cat.name,
-                                "marketplace": mapping.marketplace_name,
-                                "status": "link_error",
-                                "message": str(e)
-                            })
+
+                    if not dry_run:
+                        for entry in journal.values():
+                            if entry.status == "pending":
+                                # Não executada (ex: criação da categoria falhou antes do vínculo)
+                                self.journal.finish(entry, "skipped")
+                            session.add(entry)
+                        await session.commit()
 
         return sync_log
 
+    def _journal_intents(
+        self,
+        run_id: str,
+        chunk: List[Category],
+        by_id: Dict[int, Category],
+        mappings_by_category: Dict[int, List[CategoryMapping]],
+        plan: Dict[int, Dict[str, Any]],
+    ) -> Dict[Tuple[str, int], SyncJournalEntry]:
+        """Monta as intenções de escrita no Bling de um lote (criações e vínculos)."""
+        journal: Dict[Tuple[str, int], SyncJournalEntry] = {}
+        for cat in chunk:
+            plan_entry = plan.get(cat.id)
+            action = plan_entry["action"] if plan_entry else (
+                ReconciliationService.SKIP if cat.bling_id else ReconciliationService.CREATE
+            )
+            if action == ReconciliationService.CREATE:
+                parent_cat = by_id.get(cat.parent_id) if cat.parent_id else None
+                journal[(SyncJournalService.CREATE, cat.id)] = SyncJournalEntry(
+                    run_id=run_id,
+                    operation=SyncJournalService.CREATE,
+                    category_id=cat.id,
+                    name=cat.name,
+                    parent_bling_id=parent_cat.bling_id if parent_cat else None,
+                )
+            link_plan = plan_entry["links"] if plan_entry else {}
+            for mapping in mappings_by_category.get(cat.id, []):
+                if link_plan.get(mapping.id) == ReconciliationService.SKIP:
+                    continue
+                journal[(SyncJournalService.LINK, mapping.id)] = SyncJournalEntry(
+                    run_id=run_id,
+                    operation=SyncJournalService.LINK,
+                    category_id=cat.id,
+                    mapping_id=mapping.id,
+                    bling_store_id=mapping.bling_store_id,
+                    external_category_id=mapping.external_category_id,
+                )
+        return journal
+
+    async def _traced_category(self, cat: Category, *args: Any) -> List[dict]:
+        """Um span por categoria no trace da requisição."""
+        with tracing.span("category", name=cat.name):
+            return await self._sync_category(cat, *args)
+
+    async def _sync_category(
+        self,
+        cat: Category,
+        by_id: Dict[int, Category],
+        mappings: List[CategoryMapping],
+        dry_run: bool,
+        semaphore: asyncio.Semaphore,
+        plan_entry: Optional[Dict[str, Any]] = None,
+        journal: Optional[Dict[Tuple[str, int], SyncJournalEntry]] = None,
+    ) -> List[dict]:
+        """
+        Cria a categoria (se preciso) e processa seus vínculos multiloja em paralelo.
+
+        Com `plan_entry` (reconciliação), só executa o que o plano marcou como diferença.
+        """
+        logs: List[dict] = []
+        action = plan_entry["action"] if plan_entry else (
+            ReconciliationService.SKIP if cat.bling_id else ReconciliationService.CREATE
+        )
+
+        # A. Garantir que a categoria existe no Bling
+        if action == ReconciliationService.ADOPT:
+            # Já existe no Bling pelo caminho: só gravamos o ID localmente, sem escrita no Bling
+            if dry_run:
+                logs.append({"name": cat.name, "status": "dry_run_adopt_existing", "bling_id": plan_entry["bling_id"]})
+            else:
+                cat.bling_id = plan_entry["bling_id"]
+                logs.append({"name": cat.name, "status": "adopted_existing", "bling_id": cat.bling_id})
+        elif action == ReconciliationService.CREATE:
+            if dry_run:
+                logs.append({"name": cat.name, "status": "dry_run_pending_creation"})
+            else:
+                parent_cat = by_id.get(cat.parent_id) if cat.parent_id else None
+                parent_bling_id = parent_cat.bling_id if parent_cat else None
+                if parent_cat and not parent_bling_id:
+                    # Sem o pai no Bling a categoria seria criada na raiz
+                    logs.append({"name": cat.name, "status": "error", "message": "Categoria pai não sincronizada com Bling"})
+                    return logs
+
+                entry = (journal or {}).get((SyncJournalService.CREATE, cat.id))
+                try:
+                    async with semaphore:
+                        bling_data = await self.bling_client.create_category(cat.name, parent_bling_id)
+                    cat.bling_id = str(bling_data.get("id"))
+                    if entry:
+                        self.journal.finish(entry, "done", bling_id=cat.bling_id)
+                    logs.append({"name": cat.name, "status": "created", "bling_id": cat.bling_id})
+                except Exception as e:
+                    if entry:
+                        self.journal.finish(entry, "failed", error=str(e)[:500])
+                    logs.append({"name": cat.name, "status": "error", "message": str(e)})
+                    return logs # Pula vínculos se a criação falhou
+        else:
+            logs.append({"name": cat.name, "status": "already_exists", "bling_id": cat.bling_id})
+
+        # B. Processar Vínculos Multiloja para esta categoria
+        link_plan = plan_entry["links"] if plan_entry else {}
+        pending = []
+        for mapping in mappings:
+            if link_plan.get(mapping.id) == ReconciliationService.SKIP:
+                logs.append({"category": cat.name, "marketplace": mapping.marketplace_name, "status": "already_linked"})
+            else:
+                pending.append(mapping)
+        logs.extend(await asyncio.gather(*(
+            self._sync_mapping(cat, mapping, dry_run, semaphore, (journal or {}).get((SyncJournalService.LINK, mapping.id)))
+            for mapping in pending
+        )))
+        return logs
+
+    async def _sync_mapping(
+        self,
+        cat: Category,
+        mapping: CategoryMapping,
+        dry_run: bool,
+        semaphore: asyncio.Semaphore,
+        entry: Optional[SyncJournalEntry] = None,
+    ) -> dict:
+        if dry_run:
+            return {
+                "category": cat.name,
+                "marketplace": mapping.marketplace_name,
+                "status": "dry_run_pending_link",
+                "external_id": mapping.external_category_id
+            }
+        try:
+            async with semaphore:
+                await self.bling_client.link_category_to_store(
+                    category_id=cat.bling_id,
+                    store_id=mapping.bling_store_id,
+                    external_category_id=mapping.external_category_id
+                )
+            if entry:
+                self.journal.finish(entry, "done", bling_id=cat.bling_id)
+            return {
+                "category": cat.name,
+                "marketplace": mapping.marketplace_name,
+                "status": "linked_success"
+            }
+        except Exception as e:
+            if entry:
+                self.journal.finish(entry, "failed", error=str(e)[:500])
+            return {
+                "category": cat.name,
+                "marketplace": mapping.marketplace_name,
+                "status": "link_error",
+                "message": str(e)
+            }
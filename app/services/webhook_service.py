@@ -0,0 +1,243 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from app.core.config import settings
+from app.core.database import async_session
+from app.models.catalog import Category, BlingProduct
+from app.models.webhooks import WebhookEvent
+from app.services.product_mirror_service import ProductMirrorService
+
+logger = logging.getLogger(__name__)
+
+class WebhookService:
+    """
+    Recebimento de webhooks do Bling (produtos e categorias).
+    Reason: Mantém o espelho local atualizado por push, sem listar o catálogo de novo.
+    O endpoint só valida, registra e enfileira; a aplicação roda em um worker assíncrono.
+    """
+
+    SIGNATURE_HEADER = "X-Bling-Signature-256"
+
+    # Reason: Fila e worker por processo, recriados se o event loop mudar.
+    _queue: Optional[asyncio.Queue] = None
+    _queue_loop: Optional[asyncio.AbstractEventLoop] = None
+    _worker: Optional["asyncio.Task[None]"] = None
+
+    def __init__(self, product_mirror: Optional[ProductMirrorService] = None):
+        self.product_mirror = product_mirror or ProductMirrorService()
+
+    @staticmethod
+    def _secret() -> str:
+        return settings.BLING_WEBHOOK_SECRET or settings.BLING_CLIENT_SECRET
+
+    @classmethod
+    def sign(cls, body: bytes, secret: Optional[str] = None) -> str:
+        """Assinatura no formato enviado pelo Bling: "sha256=<hmac hex do corpo>"."""
+        digest = hmac.new((secret or cls._secret()).encode("utf-8"), body, hashlib.sha256).hexdigest()
+        return f"sha256={digest}"
+
+    @classmethod
+    def verify_signature(cls, body: bytes, signature: Optional[str]) -> bool:
+        if not cls._secret() or not signature:
+            return False
+        return hmac.compare_digest(cls.sign(body), signature.strip())
+
+    @staticmethod
+    def _resource_id(payload: Dict[str, Any]) -> Optional[str]:
+        resource_id = (payload.get("data") or {}).get("id")
+        return str(resource_id) if resource_id is not None else None
+
+    async def record(self, payload: Dict[str, Any]) -> Optional[WebhookEvent]:
+        """
+        Registra o evento. Retorna None se o ID já foi recebido (reenvio do Bling).
+        """
+        event = WebhookEvent(
+            event_id=str(payload["eventId"]),
+            event=str(payload.get("event") or ""),
+            resource_id=self._resource_id(payload),
+            payload_json=json.dumps(payload, ensure_ascii=False),
+        )
+        async with async_session() as session:
+            if await session.get(WebhookEvent, event.event_id):
+                return None
+            session.add(event)
+            try:
+                await session.commit()
+            except IntegrityError:
+                # Reason: Dois reenvios simultâneos do mesmo evento; só o primeiro é aceito.
+                await session.rollback()
+                return None
+        return event
+
+    # Fila e worker
+
+    @classmethod
+    def _get_queue(cls) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if cls._queue is None or cls._queue_loop is not loop:
+            cls._queue = asyncio.Queue(maxsize=max(1, settings.WEBHOOK_QUEUE_MAXSIZE))
+            cls._queue_loop = loop
+        return cls._queue
+
+    def enqueue(self, event_id: str) -> bool:
+        """
+        Enfileira o evento para aplicação.
+
+        Returns:
+            False se a fila estiver cheia; o evento continua "received" no banco
+            e é reenfileirado pela varredura do worker (`_sweep`).
+        """
+        try:
+            self._get_queue().put_nowait(event_id)
+            return True
+        except asyncio.QueueFull:
+            logger.warning("Fila de webhooks cheia; evento %s será aplicado depois.", event_id)
+            return False
+
+    def start_worker(self) -> None:
+        """Inicia o worker; ele começa reenfileirando os eventos recebidos e ainda não aplicados."""
+        if self._worker and not self._worker.done():
+            return
+        WebhookService._worker = asyncio.create_task(self._run_worker())
+
+    async def _sweep(self, min_age_seconds: float) -> int:
+        """
+        Reenfileira eventos ainda "received" há mais de `min_age_seconds`.
+        Reason: Com a fila cheia (rajada), `enqueue` descarta o evento da memória; sem a
+        varredura ele só seria aplicado no próximo restart. A idade mínima evita pegar
+        eventos que outra instância acabou de registrar e ainda vai aplicar.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=min_age_seconds)
+        async with async_session() as session:
+            pending = (await session.exec(
+                select(WebhookEvent.event_id)
+                .where(WebhookEvent.status == "received", WebhookEvent.received_at <= cutoff)
+                .order_by(WebhookEvent.received_at)
+                .limit(max(1, settings.WEBHOOK_QUEUE_MAXSIZE))
+            )).all()
+        queued = 0
+        for event_id in pending:
+            if not self.enqueue(event_id):
+                break
+            queued += 1
+        return queued
+
+    @classmethod
+    async def stop_worker(cls) -> None:
+        if cls._worker and not cls._worker.done():
+            cls._worker.cancel()
+            try:
+                await cls._worker
+            except asyncio.CancelledError:
+                pass
+        cls._worker = None
+
+    async def _run_worker(self) -> None:
+        queue = self._get_queue()
+        interval = max(0.1, settings.WEBHOOK_SWEEP_INTERVAL_SECONDS)
+        await self._safe_sweep(0)
+        last_sweep = time.monotonic()
+        while True:
+            try:
+                event_id = await asyncio.wait_for(queue.get(), timeout=interval)
+            except asyncio.TimeoutError:
+                event_id = None
+            if event_id is not None:
+                try:
+                    await self.process(event_id)
+                except Exception:
+                    logger.exception("Falha ao aplicar o webhook %s", event_id)
+                finally:
+                    queue.task_done()
+            # Reason: Só varre com a fila vazia - assim nenhum evento reenfileirado já está nela.
+            if queue.empty() and time.monotonic() - last_sweep >= interval:
+                await self._safe_sweep(settings.WEBHOOK_SWEEP_MIN_AGE_SECONDS)
+                last_sweep = time.monotonic()
+
+    async def _safe_sweep(self, min_age_seconds: float) -> None:
+        try:
+            await self._sweep(min_age_seconds)
+        except Exception:
+            logger.exception("Falha ao reenfileirar webhooks pendentes")
+
+    async def drain(self) -> None:
+        """Aguarda a fila esvaziar (usado pela ferramenta de replay e em testes)."""
+        await self._get_queue().join()
+
+    # Aplicação dos eventos
+
+    async def process(self, event_id: str) -> str:
+        """Aplica um evento registrado ao estado local e grava o resultado."""
+        async with async_session() as session:
+            event = await session.get(WebhookEvent, event_id)
+            if not event or event.status != "received":
+                return event.status if event else "missing"
+            payload = json.loads(event.payload_json)
+
+        try:
+            status = await self.apply(event.event, payload.get("data") or {})
+            error = None
+        except Exception as e:
+            status, error = "failed", f"{type(e).__name__}: {str(e)[:300]}"
+
+        async with async_session() as session:
+            event = await session.get(WebhookEvent, event_id)
+            event.status = status
+            event.error = error
+            event.processed_at = datetime.utcnow()
+            session.add(event)
+            await session.commit()
+        return status
+
+    async def apply(self, event_name: str, data: Dict[str, Any]) -> str:
+        """
+        Aplica a mudança ao espelho de produtos / categorias locais.
+
+        Returns:
+            "applied" ou "ignored" (evento sem interesse para o catálogo).
+        """
+        resource, _, action = event_name.partition(".")
+        if resource == "product":
+            if action == "deleted":
+                await self.product_mirror.delete_product(data["id"])
+            else:
+                await self.product_mirror.upsert_products([data])
+            return "applied"
+
+        if resource == "category":
+            await self._apply_category(action, data)
+            return "applied"
+
+        return "ignored"
+
+    @staticmethod
+    async def _apply_category(action: str, data: Dict[str, Any]) -> None:
+        bling_id = str(data["id"])
+        async with async_session() as session:
+            products = (await session.exec(
+                select(BlingProduct).where(BlingProduct.categoria_bling_id == bling_id)
+            )).all()
+            if action == "deleted":
+                # Reason: Sem o bling_id, a próxima sincronização recria (ou adota) a categoria.
+                for cat in (await session.exec(select(Category).where(Category.bling_id == bling_id))).all():
+                    cat.bling_id = None
+                    cat.updated_at = datetime.utcnow()
+                    session.add(cat)
+                for row in products:
+                    row.categoria_bling_id = None
+                    row.categoria_nome = None
+                    session.add(row)
+            else:
+                name = data.get("descricao") or data.get("nome")
+                if name:
+                    for row in products:
+                        row.categoria_nome = name
+                        session.add(row)
+            await session.commit()
@@ -0,0 +1 @@
+"""Benchmarks offline (Bling e Anthropic falsos em processo)."""
@@ -0,0 +1,229 @@
+"""
+Servidores falsos em processo (httpx.MockTransport) para a API v3 do Bling e para a API
+de mensagens da Anthropic. Nenhuma chamada sai para a rede.
+"""
+import asyncio
+import json
+import random
+import re
+import sys
+from collections import Counter
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs
+
+import httpx
+
+_NUMERIC_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+class FaultInjector:
+    """Latência simulada e respostas 429 injetadas (com semente, para repetir execuções)."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, rate_429: float = 0.0, seed: int = 42):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.random = random.Random(seed)
+
+    async def delay(self) -> None:
+        wait = self.latency + (self.random.random() * self.jitter if self.jitter else 0.0)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def throttle(self) -> bool:
+        return self.rate_429 > 0 and self.random.random() < self.rate_429
+
+
+class FakeBling:
+    """
+    Bling v3 falso: produtos (listagem paginada, detalhe, PATCH), categorias, vínculos
+    multiloja, lojas e o endpoint de token OAuth.
+    """
+
+    def __init__(
+        self,
+        catalog_size: int = 1000,
+        categories: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        rate_429: float = 0.0,
+        max_page_size: int = 100,
+        seed: int = 42,
+    ):
+        self.faults = FaultInjector(latency, jitter, rate_429, seed)
+        self.max_page_size = max_page_size
+        self.requests: Counter = Counter()
+        self.throttled = 0
+        self.products: List[Dict[str, Any]] = [self._product(i) for i in range(1, catalog_size + 1)]
+        self.products_by_id = {product["id"]: product for product in self.products}
+        self.categories: List[Dict[str, Any]] = [
+            {"id": 900000 + i, "descricao": f"Remota {i}", "categoriaPai": None} for i in range(categories)
+        ]
+        self.links: List[Dict[str, Any]] = []
+        self._next_id = 1000000
+        self.transport = httpx.MockTransport(self.handle)
+
+    @staticmethod
+    def _product(i: int) -> Dict[str, Any]:
+        return {
+            "id": i,
+            "codigo": f"SKU{i:06d}",
+            "nome": f"Copo Térmico Inox {i} 500ml",
+            "situacao": "A",
+            "descricaoCurta": f"<p>Copo térmico de aço inox modelo {i}.</p><p>Mantém a bebida gelada por 12h.</p>",
+            "categoria": {"id": 1 + i % 40} if i % 7 else None,
+            "caracteristicas": [],
+        }
+
+    @staticmethod
+    def _page(items: List[Dict[str, Any]], params: Dict[str, str], max_page_size: int) -> Dict[str, Any]:
+        page = max(1, int(params.get("pagina", 1)))
+        size = max(1, min(int(params.get("limite", 100)), max_page_size))
+        start = (page - 1) * size
+        return {"data": items[start:start + size]}
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path.split("/Api/v3/", 1)[-1]
+        template = _NUMERIC_SEGMENT.sub("/{id}", "/" + path)[1:]
+        self.requests[f"{request.method} {template}"] += 1
+
+        await self.faults.delay()
+        if self.faults.throttle():
+            self.throttled += 1
+            return httpx.Response(429, headers={"retry-after": "0"}, json={"error": "too many requests"})
+
+        params = {key: values[-1] for key, values in parse_qs(request.url.query.decode()).items()}
+        body = json.loads(request.content) if request.content and request.method in ("POST", "PATCH") \
+            and request.headers.get("content-type", "").startswith("application/json") else {}
+
+        if path == "oauth/token":
+            return httpx.Response(200, json={"access_token": "bench", "refresh_token": "bench", "expires_in": 21600})
+        if path == "produtos" and request.method == "GET":
+            products = self.products
+            if "codigo" in params:
+                products = [p for p in products if p["codigo"] == params["codigo"]]
+            return httpx.Response(200, json=self._page(products, params, self.max_page_size))
+        if template == "produtos/{id}":
+            product = self.products_by_id.get(int(path.rsplit("/", 1)[1]))
+            if product is None:
+                return httpx.Response(404, json={"error": "not found"})
+            if request.method == "PATCH":
+                product.update(body)
+                return httpx.Response(204)
+            return httpx.Response(200, json={"data": product})
+        if path == "categorias/produtos":
+            if request.method == "POST":
+                self._next_id += 1
+                parent = body.get("idCategoriaPai")
+                self.categories.append({
+                    "id": self._next_id,
+                    "descricao": body.get("descricao"),
+                    "categoriaPai": {"id": int(parent)} if parent else None,
+                })
+                return httpx.Response(201, json={"data": {"id": self._next_id}})
+            return httpx.Response(200, json=self._page(self.categories, params, self.max_page_size))
+        if path == "categorias/lojas":
+            if request.method == "POST":
+                self.links.append({
+                    "categoriaProduto": {"id": body.get("idCategoriaBling")},
+                    "loja": {"id": body.get("idLoja")},
+                    "codigo": body.get("codigoNoMarketplace"),
+                })
+                return httpx.Response(201, json={"data": {"id": len(self.links)}})
+            return httpx.Response(200, json=self._page(self.links, params, self.max_page_size))
+        if path == "lojas":
+            return httpx.Response(200, json={"data": [{"id": 1, "descricao": "Mercado Livre"}]})
+        return httpx.Response(404, json={"error": f"endpoint falso não implementado: {template}"})
+
+
+class FakeAnthropic:
+    """
+    API de mensagens falsa: responde com um JSON preenchendo os atributos pedidos
+    para cada SKU do prompt (lote) ou para o produto único.
+    """
+
+    _ATTRIBUTES = re.compile(r"ATRIBUTOS[^\n]*\n(\[.*?\])", re.DOTALL)
+    _SKUS = re.compile(r"^SKU: (.+)$", re.MULTILINE)
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, rate_429: float = 0.0, seed: int = 7):
+        self.faults = FaultInjector(latency, jitter, rate_429, seed)
+        self.requests: Counter = Counter()
+        self.throttled = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self._http = httpx
+
+    def _answer(self, prompt: str) -> Dict[str, Any]:
+        match = self._ATTRIBUTES.search(prompt)
+        attributes = json.loads(match.group(1)) if match else []
+        values = {name: f"valor {name}" for name in attributes}
+        skus = self._SKUS.findall(prompt)
+        if skus:
+            return {sku.strip(): values for sku in skus}
+        return values
+
+    async def handle(self, request):
+        http = self._http
+        self.requests[f"{request.method} {request.url.path}"] += 1
+        await self.faults.delay()
+        if self.faults.throttle():
+            self.throttled += 1
+            return http.Response(
+                429,
+                headers={"retry-after": "0", "x-should-retry": "true"},
+                json={"type": "error", "error": {"type": "rate_limit_error", "message": "fake 429"}},
+            )
+
+        body = json.loads(request.content)
+        prompt = body["messages"][0]["content"]
+        answer = self._answer(prompt if isinstance(prompt, str) else json.dumps(prompt))
+        text = json.dumps(answer, ensure_ascii=False)
+        input_tokens = len(json.dumps(body)) // 4
+        output_tokens = len(text) // 4
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        return http.Response(200, json={
+            "id": f"msg_bench_{sum(self.requests.values())}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model"),
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+        })
+
+    def client(self, max_retries: int = 2):
+        """Cliente AsyncAnthropic apontando para o servidor falso."""
+        import anthropic
+
+        # Reason: O transporte precisa ser do mesmo pacote HTTP do cliente do SDK (o SDK
+        # valida isso); o pacote é o da classe AsyncClient de que DefaultAsyncHttpxClient deriva.
+        base = next(cls for cls in anthropic.DefaultAsyncHttpxClient.__mro__ if cls.__name__ == "AsyncClient")
+        self._http = sys.modules[base.__module__.partition(".")[0]]
+        return anthropic.AsyncAnthropic(
+            api_key="bench",
+            base_url="http://fake-anthropic.local",
+            max_retries=max_retries,
+            http_client=self._http.AsyncClient(transport=self._http.MockTransport(self.handle)),
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": dict(self.requests),
+            "throttled_429": self.throttled,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+        }
+
+
+def bling_stats(fake: FakeBling) -> Dict[str, Any]:
+    return {"requests": dict(fake.requests), "throttled_429": fake.throttled, "total": sum(fake.requests.values())}
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
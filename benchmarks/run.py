@@ -0,0 +1,318 @@
+"""
+Benchmark offline de normalização, sincronização de categorias e auditoria.
+
+Uso:
+    python -m benchmarks.run                                  # cenários padrão
+    python -m benchmarks.run --scenario normalize --skus 5000 --bling-latency 0.05
+    python -m benchmarks.run --scenario audit --catalog 50000 --bling-429 0.02
+    python -m benchmarks.run --scenario sync --categories 5000 --output bench_output.txt
+
+Tudo roda em processo: Bling e Anthropic são servidores falsos (httpx.MockTransport)
+e o banco é um SQLite temporário.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+
+def _configure_environment(args: argparse.Namespace, workdir: str) -> None:
+    """
+    Ajusta as settings ANTES de importar a aplicação (são lidas no import).
+    Reason: O limite real do Bling (3 req/s) tornaria o benchmark uma medida do token bucket;
+    por padrão ele é aberto, e --bling-rate permite simular o limite real.
+    """
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "BLING_CLIENT_ID": "bench",
+        "BLING_CLIENT_SECRET": "bench",
+        "ANTHROPIC_API_KEY": "bench",
+        "BLING_RATE_LIMIT_PER_SECOND": str(args.bling_rate),
+        "BLING_RATE_LIMIT_BURST": str(max(1, int(args.bling_rate))),
+        "BLING_DAILY_QUOTA": "100000000",
+        "BLING_RETRY_BASE_DELAY": "0.01",
+        "ENRICHMENT_CACHE_ENABLED": "true" if args.cache else "false",
+        "TRACE_MAX_SPANS": "10000000",
+        "SNAPSHOT_DIR": os.path.join(workdir, "snapshots"),
+    })
+
+
+def _measure(name: str, run: Callable[[], Any], items: int, use_tracemalloc: bool) -> Dict[str, Any]:
+    """Executa o cenário dentro de um trace (latências por SKU/chamada) e mede memória."""
+    from app.core import tracing
+
+    if use_tracemalloc:
+        tracemalloc.start()
+    started = time.perf_counter()
+    with tracing.start_trace(name) as trace:
+        result = run()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1] if use_tracemalloc else None
+    if use_tracemalloc:
+        tracemalloc.stop()
+
+    return {
+        "scenario": name,
+        "items": items,
+        "seconds": round(elapsed, 3),
+        "items_per_second": round(items / elapsed, 1) if elapsed else None,
+        "breakdown_ms": {k: round(v, 1) for k, v in trace.breakdown().items()},
+        "latency_ms": _latencies(trace.root),
+        "peak_memory_mb": round(peak / 1024 / 1024, 2) if peak is not None else None,
+        "result": result,
+    }
+
+
+def _latencies(root) -> Dict[str, Any]:
+    """p50/p99 por tipo de span: por SKU (soma das etapas), por categoria e por chamada externa."""
+    from benchmarks.fakes import percentile
+
+    per_sku: Dict[str, float] = {}
+    by_kind: Dict[str, List[float]] = {}
+    stack = [root]
+    while stack:
+        span = stack.pop()
+        stack.extend(span.children)
+        if span.end is None or span is root:
+            continue
+        duration = (span.end - span.start) * 1000
+        sku = span.attrs.get("sku")
+        if sku is not None:
+            per_sku[sku] = per_sku.get(sku, 0.0) + duration
+        elif span.name in ("bling", "claude", "category"):
+            by_kind.setdefault(span.name, []).append(duration)
+    if per_sku:
+        by_kind["sku"] = list(per_sku.values())
+
+    def summary(values: List[float]) -> Dict[str, Any]:
+        return {
+            "count": len(values),
+            "p50": round(percentile(values, 50), 2),
+            "p99": round(percentile(values, 99), 2),
+        }
+
+    return {kind: summary(values) for kind, values in by_kind.items()}
+
+
+def _seed_token() -> None:
+    from datetime import datetime, timedelta
+    from sqlmodel import Session
+    from app.core.database import engine
+    from app.models.auth import BlingToken
+
+    with Session(engine) as session:
+        session.add(BlingToken(
+            access_token="bench",
+            refresh_token="bench",
+            expires_at=datetime.utcnow() + timedelta(days=1),
+            scope="bench",
+        ))
+        session.commit()
+
+
+def _install_bling(fake) -> None:
+    import httpx
+    from app.core import http_client
+
+    # Reason: O BlingClient usa o cliente compartilhado; trocamos só o transporte.
+    http_client._client = httpx.AsyncClient(transport=fake.transport)
+
+
+def scenario_normalize(args: argparse.Namespace) -> Dict[str, Any]:
+    import asyncio
+    from sqlmodel import Session
+    from app.core.database import engine
+    from app.models.catalog import Category, AttributeRequirement
+    from app.services.normalization_service import NormalizationService
+    from benchmarks.fakes import FakeBling, FakeAnthropic, bling_stats
+
+    bling = FakeBling(catalog_size=max(args.catalog, args.skus), latency=args.bling_latency,
+                      jitter=args.bling_jitter, rate_429=args.bling_429)
+    claude = FakeAnthropic(latency=args.claude_latency, jitter=args.claude_jitter, rate_429=args.claude_429)
+    _install_bling(bling)
+
+    with Session(engine) as session:
+        category = Category(name="Bench > Copos", bling_id="77")
+        session.add(category)
+        session.commit()
+        session.refresh(category)
+        for name in ("Marca", "Modelo", "Material", "Capacidade", "Cor"):
+            session.add(AttributeRequirement(category_id=category.id, marketplace_id="bench", attribute_name=name))
+        session.commit()
+        category_id = category.id
+
+    service = NormalizationService()
+    service.claude_service.client = claude.client()
+    skus = [product["codigo"] for product in bling.products[:args.skus]]
+
+    # Carga do espelho (fora da medição principal): sem ele, cada SKU varreria o catálogo.
+    mirror_started = time.perf_counter()
+    asyncio.run(service.product_mirror.refresh(full=True))
+    mirror_seconds = time.perf_counter() - mirror_started
+    bling.requests.clear()
+
+    def run():
+        results = asyncio.run(service.batch_normalize(
+            skus, category_id, dry_run=args.dry_run, use_ai=not args.no_ai, concurrency=args.concurrency,
+        ))
+        return service.summarize(results)
+
+    report = _measure("normalize", run, len(skus), not args.no_tracemalloc)
+    report["setup"] = {"mirror_refresh_seconds": round(mirror_seconds, 3)}
+    report["bling"] = bling_stats(bling)
+    report["claude"] = claude.stats()
+    return report
+
+
+def scenario_sync(args: argparse.Namespace) -> Dict[str, Any]:
+    import asyncio
+    from sqlmodel import Session
+    from app.core.database import engine
+    from app.models.catalog import Category, CategoryMapping
+    from app.services.sync_service import SyncService
+    from benchmarks.fakes import FakeBling, bling_stats
+
+    bling = FakeBling(catalog_size=0, latency=args.bling_latency, jitter=args.bling_jitter, rate_429=args.bling_429)
+    _install_bling(bling)
+
+    # Árvore com `branching` filhos por nó até completar --categories; um vínculo por folha
+    with Session(engine) as session:
+        created: List[Category] = []
+        frontier: List[Category] = [None]
+        while len(created) < args.categories:
+            next_frontier = []
+            for parent in frontier:
+                for i in range(args.branching):
+                    if len(created) >= args.categories:
+                        break
+                    cat = Category(name=f"Cat {len(created)}", parent_id=parent.id if parent else None)
+                    session.add(cat)
+                    created.append(cat)
+                    next_frontier.append(cat)
+            session.commit()
+            for cat in next_frontier:
+                session.refresh(cat)
+            frontier = next_frontier
+        for cat in frontier:
+            session.add(CategoryMapping(
+                category_id=cat.id, marketplace_name="Mercado Livre",
+                bling_store_id="1", external_category_id=f"MLB{cat.id}",
+            ))
+        session.commit()
+
+    service = SyncService()
+
+    def run():
+        log = asyncio.run(service.sync_categories(dry_run=False, concurrency=args.concurrency))
+        statuses: Dict[str, int] = {}
+        for entry in log:
+            statuses[entry.get("status", "?")] = statuses.get(entry.get("status", "?"), 0) + 1
+        return statuses
+
+    report = _measure("sync", run, args.categories, not args.no_tracemalloc)
+    report["bling"] = bling_stats(bling)
+    return report
+
+
+def scenario_audit(args: argparse.Namespace) -> Dict[str, Any]:
+    import asyncio
+    from app.services.audit_service import AuditService
+    from benchmarks.fakes import FakeBling, bling_stats
+
+    bling = FakeBling(catalog_size=args.catalog, latency=args.bling_latency, jitter=args.bling_jitter, rate_429=args.bling_429)
+    _install_bling(bling)
+
+    service = AuditService()
+    pending_path = os.path.join(args.workdir, "pending_skus.json")
+    with open(pending_path, "w") as f:
+        # Metade existe no catálogo, metade não
+        json.dump([f"SKU{i:06d}" for i in range(1, args.catalog + 1, max(1, args.catalog // 500))]
+                  + [f"MISSING{i}" for i in range(500)], f)
+    service.pending_skus_path = pending_path
+
+    def run():
+        if args.stream:
+            async def consume():
+                summary = None
+                async for event in service.stream_audit():
+                    if event["type"] == "summary":
+                        summary = event
+                return summary
+            return asyncio.run(consume())
+        return asyncio.run(service.run_audit())["summary"]
+
+    report = _measure("audit", run, args.catalog, not args.no_tracemalloc)
+    report["bling"] = bling_stats(bling)
+    return report
+
+
+SCENARIOS = {"normalize": scenario_normalize, "sync": scenario_sync, "audit": scenario_audit}
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    print(f"\n== {report['scenario']} ==")
+    print(f"itens: {report['items']}  tempo: {report['seconds']}s  itens/s: {report['items_per_second']}")
+    print(f"pico de memória: {report['peak_memory_mb']} MB")
+    print(f"divisão (ms): {report['breakdown_ms']}")
+    for kind, stats in report["latency_ms"].items():
+        print(f"latência {kind}: n={stats['count']} p50={stats['p50']}ms p99={stats['p99']}ms")
+    print(f"bling: {report['bling']['total']} requisições, {report['bling']['throttled_429']} 429 injetados")
+    if "claude" in report:
+        print(f"claude: {report['claude']}")
+    print(f"resultado: {report['result']}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark offline com Bling e Anthropic falsos.")
+    parser.add_argument("--scenario", choices=[*SCENARIOS, "all"], default="all")
+    parser.add_argument("--skus", type=int, default=1000, help="SKUs normalizados (normalize)")
+    parser.add_argument("--catalog", type=int, default=10000, help="Produtos no catálogo falso")
+    parser.add_argument("--categories", type=int, default=5000, help="Categorias locais (sync)")
+    parser.add_argument("--branching", type=int, default=10, help="Filhos por categoria (sync)")
+    parser.add_argument("--concurrency", type=int, default=None)
+    parser.add_argument("--bling-latency", type=float, default=0.02, help="Latência base do Bling falso (s)")
+    parser.add_argument("--bling-jitter", type=float, default=0.01)
+    parser.add_argument("--bling-429", type=float, default=0.0, help="Fração de respostas 429 do Bling")
+    parser.add_argument("--bling-rate", type=float, default=10000.0, help="Limite do token bucket (req/s)")
+    parser.add_argument("--claude-latency", type=float, default=0.5)
+    parser.add_argument("--claude-jitter", type=float, default=0.2)
+    parser.add_argument("--claude-429", type=float, default=0.0)
+    parser.add_argument("--dry-run", action="store_true", help="Não envia PATCH (normalize)")
+    parser.add_argument("--no-ai", action="store_true", help="Normaliza sem Claude")
+    parser.add_argument("--cache", action="store_true", help="Liga o cache de enriquecimento")
+    parser.add_argument("--stream", action="store_true", help="Usa a auditoria em streaming (audit)")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="Não mede memória (tracemalloc deixa tudo mais lento)")
+    parser.add_argument("--output", help="Grava os relatórios em JSON neste arquivo")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="cathalog-bench-") as workdir:
+        args.workdir = workdir
+        _configure_environment(args, workdir)
+
+        from sqlmodel import SQLModel
+        from app.core.database import engine
+        import app.core.schema  # noqa: F401 - registra todos os modelos no metadata
+
+        reports = []
+        names = list(SCENARIOS) if args.scenario == "all" else [args.scenario]
+        for name in names:
+            # Banco limpo por cenário
+            SQLModel.metadata.drop_all(engine)
+            SQLModel.metadata.create_all(engine)
+            _seed_token()
+            report = SCENARIOS[name](args)
+            _print_report(report)
+            reports.append(report)
+
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(reports, f, ensure_ascii=False, indent=2, default=str)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
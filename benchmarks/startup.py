@@ -0,0 +1,120 @@
+"""
+Benchmark do cold start da aplicação (entrada da Vercel: api/index.py).
+
+Uso:
+    python -m benchmarks.startup                 # 5 boots
+    python -m benchmarks.startup --runs 20 --output startup.json
+
+Cada boot roda em um processo Python novo (como um cold start serverless) e mede:
+import de api.index, evento de startup (schema + worker de webhooks) e a primeira requisição.
+O primeiro boot usa um banco vazio (cria o schema); os demais reaproveitam o mesmo banco
+e devem pular o create_all.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Any, Dict, List
+
+from benchmarks.fakes import percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Roda dentro do processo filho; imprime uma linha JSON com as medições.
+_BOOT = """
+import json, sys, time
+started = time.perf_counter()
+from api.index import app
+imported = time.perf_counter()
+
+# Fora da medição: o schema do banco já está na versão atual (o boot vai pular o create_all)?
+from app.core import schema
+from app.core.database import engine
+schema_current = schema._stored_fingerprint(engine) == schema.schema_fingerprint()
+
+from fastapi.testclient import TestClient
+boot = time.perf_counter()
+with TestClient(app) as client:
+    booted = time.perf_counter()
+    status = client.get("/").status_code
+    first = time.perf_counter()
+
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "startup_ms": (booted - boot) * 1000,
+    "first_request_ms": (first - booted) * 1000,
+    "total_ms": (imported - started + first - boot) * 1000,
+    "status": status,
+    "create_all": not schema_current,
+    "anthropic_imported": "anthropic" in sys.modules,
+}))
+"""
+
+# Custo de importar o SDK da Anthropic (o que o boot deixa de pagar).
+_ANTHROPIC = """
+import json, time
+started = time.perf_counter()
+try:
+    import anthropic
+    print(json.dumps({"import_ms": (time.perf_counter() - started) * 1000}))
+except ImportError:
+    print(json.dumps({"import_ms": None}))
+"""
+
+
+def _run(code: str, env: Dict[str, str]) -> Dict[str, Any]:
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _summary(values: List[float]) -> Dict[str, Any]:
+    return {
+        "p50": round(percentile(values, 50), 1) if values else None,
+        "p99": round(percentile(values, 99), 1) if values else None,
+        "max": round(max(values), 1) if values else None,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark do cold start (import + startup + 1ª requisição)")
+    parser.add_argument("--runs", type=int, default=5, help="Boots medidos (o primeiro cria o schema)")
+    parser.add_argument("--output", help="Grava o relatório em JSON neste arquivo")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="cathalog-startup-") as workdir:
+        env = {
+            **os.environ,
+            "PYTHONPATH": ROOT,
+            "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'startup.db')}",
+            # Reason: Sem credenciais, como num deploy novo - o boot não pode depender delas.
+            "ANTHROPIC_API_KEY": "",
+            "SYNC_JOURNAL_RECOVER_ON_STARTUP": "false",
+        }
+        boots = [_run(_BOOT, env) for _ in range(max(1, args.runs))]
+        anthropic_import = _run(_ANTHROPIC, env)["import_ms"]
+
+    warm = boots[1:] or boots
+    report = {
+        "runs": len(boots),
+        "first_boot": {key: round(value, 1) if isinstance(value, float) else value for key, value in boots[0].items()},
+        "next_boots_ms": {
+            key: _summary([boot[key] for boot in warm])
+            for key in ("import_ms", "startup_ms", "first_request_ms", "total_ms")
+        },
+        "create_all_skipped": sum(1 for boot in boots[1:] if not boot["create_all"]),
+        "anthropic_imported_on_boot": any(boot["anthropic_imported"] for boot in boots),
+        "anthropic_sdk_import_ms": round(anthropic_import, 1) if anthropic_import is not None else None,
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"boots": boots, **report}, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
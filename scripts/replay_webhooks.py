@@ -0,0 +1,75 @@
+"""
+Reenvia payloads de webhook gravados para o endpoint local, assinados com o segredo configurado.
+
+Uso:
+    python -m scripts.replay_webhooks eventos.ndjson
+    python -m scripts.replay_webhooks pasta_com_json/ --url http://localhost:8000/webhooks/bling
+
+Aceita arquivos .json (um evento ou uma lista de eventos) e .ndjson (um evento por linha).
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Any, Dict, Iterator, List
+
+import httpx
+
+from app.services.webhook_service import WebhookService
+
+
+def _load_file(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".ndjson"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+            return
+        data = json.load(f)
+    yield from (data if isinstance(data, list) else [data])
+
+
+def load_payloads(paths: List[str]) -> Iterator[Dict[str, Any]]:
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.endswith((".json", ".ndjson")):
+                    yield from _load_file(os.path.join(path, name))
+        else:
+            yield from _load_file(path)
+
+
+def replay(paths: List[str], url: str, secret: str = "") -> Dict[str, int]:
+    """Posta cada payload (com assinatura HMAC) e conta as respostas por status."""
+    counts: Dict[str, int] = {}
+    with httpx.Client(timeout=30.0) as client:
+        for payload in load_payloads(paths):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            response = client.post(
+                url,
+                content=body,
+                headers={
+                    "Content-Type": "application/json",
+                    WebhookService.SIGNATURE_HEADER: WebhookService.sign(body, secret or None),
+                },
+            )
+            key = response.json().get("status", str(response.status_code)) if response.status_code < 300 else str(response.status_code)
+            counts[key] = counts.get(key, 0) + 1
+            print(f"{payload.get('eventId')} {payload.get('event')} -> {response.status_code} {response.text}")
+    return counts
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Reenvia webhooks gravados do Bling para a API local.")
+    parser.add_argument("paths", nargs="+", help="Arquivos .json/.ndjson ou pastas com eles")
+    parser.add_argument("--url", default="http://localhost:8000/webhooks/bling")
+    parser.add_argument("--secret", default="", help="Segredo do HMAC (padrão: o configurado na aplicação)")
+    args = parser.parse_args()
+
+    counts = replay(args.paths, args.url, args.secret)
+    print(json.dumps(counts, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+import os
+import tempfile
+
+# Reason: O engine é criado no import de app.core.database; o banco de teste precisa
+# estar no ambiente antes de qualquer import do app.
+_DB_DIR = tempfile.mkdtemp(prefix="cathalog-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+os.environ["ANTHROPIC_API_KEY"] = ""
+os.environ["SYNC_JOURNAL_RECOVER_ON_STARTUP"] = "false"
+os.environ["BLING_CLIENT_ID"] = "test"
+os.environ["BLING_CLIENT_SECRET"] = "test"
+# O token bucket real é testado à parte; aqui ele não pode atrasar os testes.
+os.environ["BLING_RATE_LIMIT_PER_SECOND"] = "10000"
+os.environ["BLING_RATE_LIMIT_BURST"] = "10000"
+
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from sqlmodel import Session, SQLModel, delete
+
+from app.core import http_client
+from app.core.database import engine
+from app.core.schema import ensure_schema
+from app.models.auth import BlingToken
+from app.services.auth_service import AuthService
+from benchmarks.fakes import FakeBling
+
+
+@pytest.fixture(autouse=True)
+def clean_db():
+    """Banco com o schema atual e sem linhas de testes anteriores."""
+    ensure_schema(engine)
+    with Session(engine) as session:
+        for table in reversed(SQLModel.metadata.sorted_tables):
+            session.exec(delete(table))
+        session.commit()
+    yield
+
+
+def seed_token(expires_in: timedelta = timedelta(days=1)) -> None:
+    with Session(engine) as session:
+        session.add(BlingToken(
+            access_token="test", refresh_token="test",
+            expires_at=datetime.utcnow() + expires_in, scope="test",
+        ))
+        session.commit()
+
+
+@pytest.fixture
+def fake_bling(monkeypatch):
+    """Bling falso (benchmarks.fakes) no lugar do transporte HTTP, com um token válido no banco."""
+    fake = FakeBling(catalog_size=20)
+    monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=fake.transport))
+    AuthService.invalidate_cache()
+    seed_token()
+    yield fake
+    AuthService.invalidate_cache()
@@ -0,0 +1,43 @@
+import asyncio
+import json
+
+from app.services.audit_service import AuditService
+
+
+def _mirror_audit(tmp_path, stream: bool):
+    service = AuditService()
+    pending = tmp_path / "pending_skus.json"
+    pending.write_text(json.dumps(["S1", "S2", "NOPE"]))
+    service.pending_skus_path = str(pending)
+
+    async def no_refresh(full: bool = False):
+        return {"mode": "skipped"}
+
+    service.product_mirror.refresh = no_refresh
+
+    async def scenario():
+        await service.product_mirror.upsert_products([
+            {"id": 1, "codigo": "S1", "nome": "A", "situacao": "A", "categoria": {"id": 9, "descricao": "Cat"}},
+            {"id": 2, "codigo": "S2", "nome": "B", "situacao": "A"},
+            {"id": 3, "codigo": "S3", "nome": "C", "situacao": "E"},
+        ])
+        if not stream:
+            return await service.run_audit(source="mirror")
+        return [event async for event in service.stream_audit(source="mirror")]
+
+    return asyncio.run(scenario())
+
+
+def test_mirror_audit_ignores_deleted_products(tmp_path):
+    result = _mirror_audit(tmp_path, stream=False)
+    assert result["total_bling_products"] == 2
+    assert [p["sku"] for p in result["pending_skus_found_in_bling"]] == ["S1", "S2"]
+    assert result["pending_skus_missing_in_bling"] == ["NOPE"]
+    assert result["products_without_category"] == [{"sku": "S2", "nome": "B"}]
+
+
+def test_mirror_stream_audit_matches_summary(tmp_path):
+    events = _mirror_audit(tmp_path, stream=True)
+    summary = events[-1]
+    assert summary["type"] == "summary"
+    assert (summary["found_pending"], summary["missing_pending"], summary["total_without_category"]) == (2, 1, 1)
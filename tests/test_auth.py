@@ -0,0 +1,37 @@
+import asyncio
+from datetime import timedelta
+
+import httpx
+
+from app.core import http_client
+from app.services.auth_service import AuthService
+from conftest import seed_token
+
+
+def test_concurrent_callers_share_a_single_refresh(monkeypatch):
+    refreshes = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.path.endswith("/oauth/token")
+        refreshes.append(request)
+        # Janela para que todos os chamadores cheguem enquanto o refresh está em voo
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"access_token": "new", "refresh_token": "new-refresh", "expires_in": 3600})
+
+    monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    AuthService.invalidate_cache()
+    seed_token(expires_in=timedelta(minutes=-5))
+
+    async def scenario():
+        return await asyncio.gather(*(AuthService.get_valid_token() for _ in range(10)))
+
+    try:
+        tokens = asyncio.run(scenario())
+        assert tokens == ["new"] * 10
+        assert len(refreshes) == 1
+        # Outro loop (novo asyncio.run) relê o token renovado do banco, sem novo refresh
+        AuthService.invalidate_cache()
+        assert asyncio.run(AuthService.get_valid_token()) == "new"
+        assert len(refreshes) == 1
+    finally:
+        AuthService.invalidate_cache()
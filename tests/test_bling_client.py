@@ -0,0 +1,96 @@
+import asyncio
+
+import httpx
+import pytest
+from sqlmodel import Session, select
+
+from app.core import http_client
+from app.core.database import engine
+from app.models.auth import BlingToken
+from app.services import bling_client
+from app.services.auth_service import AuthService
+from app.services.bling_client import BlingAPIError, BlingClient
+from app.services.rate_limiter import RequestScheduler
+from conftest import seed_token
+
+
+def _scheduler(daily_limit: int = 1000) -> RequestScheduler:
+    return RequestScheduler(rate_per_second=1000, burst=1000, daily_limit=daily_limit, utc_offset_hours=-3)
+
+
+@pytest.fixture
+def bling(monkeypatch):
+    """Transporte HTTP programável: `responses` é consumida em ordem e `seen` guarda as requisições."""
+    state = {"responses": [], "seen": []}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        state["seen"].append(request)
+        response = state["responses"].pop(0)
+        return response(request) if callable(response) else response
+
+    scheduler = _scheduler()
+    monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(bling_client, "_scheduler", scheduler)
+    AuthService.invalidate_cache()
+    seed_token()
+    state["scheduler"] = scheduler
+    yield state
+    AuthService.invalidate_cache()
+
+
+def _get(endpoint: str = "produtos/1"):
+    return asyncio.run(BlingClient()._request("GET", endpoint))
+
+
+def test_exhausted_local_quota_refuses_before_sending(bling, monkeypatch):
+    monkeypatch.setattr(bling_client, "_scheduler", _scheduler(daily_limit=1))
+    bling["responses"].append(httpx.Response(200, json={"data": {}}))
+    _get()
+    with pytest.raises(BlingAPIError) as error:
+        _get()
+    assert error.value.status_code == 429
+    assert len(bling["seen"]) == 1
+
+
+def test_reported_zero_quota_does_not_block_the_next_call(bling):
+    bling["responses"] += [
+        httpx.Response(200, json={"data": {}}, headers={"x-ratelimit-remaining": "0"}),
+        httpx.Response(200, json={"data": {}}),
+    ]
+    _get()
+    assert bling["scheduler"].daily.remaining == 0
+    _get()
+    assert len(bling["seen"]) == 2
+
+
+def test_429_is_retried_after_retry_after(bling):
+    bling["responses"] += [
+        httpx.Response(429, headers={"retry-after": "0"}),
+        httpx.Response(200, json={"data": {}}),
+    ]
+    assert _get().status_code == 200
+    counters = bling["scheduler"].counters
+    assert (counters["throttled_429"], counters["retries"], counters["requests"]) == (1, 1, 2)
+
+
+def test_401_rereads_the_token_once_and_retries(bling):
+    def rotated_elsewhere(request):
+        # Outra instância renovou o token: o banco já tem o novo
+        with Session(engine) as session:
+            token = session.exec(select(BlingToken)).one()
+            token.access_token = "rotated"
+            session.add(token)
+            session.commit()
+        return httpx.Response(401)
+
+    bling["responses"] += [rotated_elsewhere, httpx.Response(200, json={"data": {}})]
+    assert _get().status_code == 200
+    assert [r.headers["authorization"] for r in bling["seen"]] == ["Bearer test", "Bearer rotated"]
+
+
+def test_second_401_is_not_retried(bling):
+    bling["responses"] += [httpx.Response(401), httpx.Response(401)]
+    with pytest.raises(BlingAPIError) as error:
+        _get()
+    assert error.value.status_code == 401
+    assert len(bling["seen"]) == 2
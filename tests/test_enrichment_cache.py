@@ -0,0 +1,86 @@
+import asyncio
+import json
+import types
+
+from sqlmodel import Session, select
+
+from app.core.database import engine
+from app.models.enrichment import EnrichmentCacheEntry
+from app.services import enrichment_cache
+from app.services.claude_service import ClaudeService
+from app.services.enrichment_cache import EnrichmentCache
+
+
+def _cache() -> EnrichmentCache:
+    return EnrichmentCache(ttl_hours=1, max_entries=100, memory_size=100)
+
+
+def _entries():
+    with Session(engine) as session:
+        return session.exec(select(EnrichmentCacheEntry)).all()
+
+
+def test_put_tolerates_a_concurrent_insert_of_the_same_key(monkeypatch):
+    cache = _cache()
+    asyncio.run(cache.put("k", {"cor": "azul"}, "model", "v2"))
+
+    # Simula a corrida: a outra gravação entra entre a leitura e o commit desta.
+    real_session = enrichment_cache.async_session
+
+    def racing_session():
+        session = real_session()
+
+        async def not_found_yet(*args, **kwargs):
+            return None
+
+        session.get = not_found_yet
+        return session
+
+    monkeypatch.setattr(enrichment_cache, "async_session", racing_session)
+    asyncio.run(cache.put("k", {"cor": "azul"}, "model", "v2"))
+    assert [entry.key for entry in _entries()] == ["k"]
+
+
+def test_db_hits_are_written_in_batches():
+    cache = _cache()
+
+    async def scenario():
+        await cache.put("k", {"cor": "azul"}, "model", "v2")
+        cache._memory.clear()
+        for _ in range(3):
+            assert await cache.get("k") == {"cor": "azul"}
+            cache._memory.clear()
+        # Ainda não gravado: nenhum UPDATE por acerto
+        assert _entries()[0].hits == 0
+        await cache.prune()
+
+    asyncio.run(scenario())
+    entry = _entries()[0]
+    assert entry.hits == 3 and entry.last_hit_at is not None
+
+
+class _Messages:
+    def __init__(self):
+        self.calls = 0
+
+    async def create(self, model, max_tokens, messages, **kwargs):
+        self.calls += 1
+        return types.SimpleNamespace(
+            content=[types.SimpleNamespace(text=json.dumps({"cor": "preto"}))], stop_reason="end_turn", usage=None,
+        )
+
+
+def test_cache_failure_does_not_fail_the_enrichment(monkeypatch):
+    cache = _cache()
+
+    async def broken(*args, **kwargs):
+        raise RuntimeError("banco indisponível")
+
+    monkeypatch.setattr(cache, "get_first", broken)
+    monkeypatch.setattr(cache, "put", broken)
+    monkeypatch.setattr(enrichment_cache, "_cache", cache)
+    service = ClaudeService()
+    service.client = types.SimpleNamespace(messages=_Messages())
+
+    result = asyncio.run(service.enrich_product_data("Copo", "Copo preto", ["cor"]))
+    assert result == {"cor": "preto"}
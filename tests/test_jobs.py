@@ -0,0 +1,155 @@
+import asyncio
+import inspect
+import time
+from collections import Counter
+from typing import Any, Dict, List
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from app.api.dependencies import get_job_service
+from app.core.config import settings
+from app.core.database import engine
+from app.main import app
+from app.models.jobs import NormalizationJobItem
+from app.services.job_service import JobService
+
+
+class FakeNormalization:
+    """Normalização falsa: registra quantas vezes cada SKU foi processado."""
+
+    def __init__(self, delay: float = 0.001):
+        self.delay = delay
+        self.processed: Counter = Counter()
+
+    async def batch_normalize(self, skus, internal_category_id, dry_run=True, use_ai=True,
+                              concurrency=None, on_result=None) -> List[Dict[str, Any]]:
+        # Como o serviço real: todos os SKUs do lote em paralelo, checkpoint ao terminar cada um.
+        async def one(index: int, sku: str) -> Dict[str, Any]:
+            self.processed[sku] += 1
+            await asyncio.sleep(self.delay * (index + 1))
+            result = {"sku": sku, "status": "updated"}
+            if on_result:
+                outcome = on_result(index, result)
+                if inspect.isawaitable(outcome):
+                    await outcome
+            return result
+
+        return list(await asyncio.gather(*(one(i, sku) for i, sku in enumerate(skus))))
+
+
+def _wait_for(predicate, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condição não atingida a tempo"
+        time.sleep(0.02)
+
+
+def test_resume_runs_job_in_background():
+    service = JobService(FakeNormalization(), audit_service=None)
+    job = service.submit([f"SKU{i}" for i in range(5)], category_id=1)
+    app.dependency_overrides[get_job_service] = lambda: service
+    try:
+        with TestClient(app) as client:
+            response = client.post(f"/jobs/{job.id}/resume")
+            assert response.status_code == 200
+            assert response.json()["started"] is True
+
+            _wait_for(lambda: client.get(f"/jobs/{job.id}").json()["status"] == "completed")
+            status = client.get(f"/jobs/{job.id}").json()
+            assert status["processed"] == 5
+            assert status["progress"] == 1.0
+    finally:
+        app.dependency_overrides.pop(get_job_service, None)
+
+
+def test_resume_unknown_job_returns_404():
+    service = JobService(FakeNormalization(), audit_service=None)
+    app.dependency_overrides[get_job_service] = lambda: service
+    try:
+        with TestClient(app) as client:
+            assert client.post("/jobs/missing/resume").status_code == 404
+    finally:
+        app.dependency_overrides.pop(get_job_service, None)
+
+
+def _item_statuses(job_id: str) -> Dict[str, str]:
+    with Session(engine) as session:
+        items = session.exec(select(NormalizationJobItem).where(NormalizationJobItem.job_id == job_id)).all()
+        return {item.sku: item.status for item in items}
+
+
+def test_checkpoint_failure_waits_for_the_rest_of_the_chunk():
+    service = JobService(FakeNormalization(delay=0.01), audit_service=None)
+    job = service.submit([f"SKU{i}" for i in range(5)], category_id=1)
+    original = service._checkpoint
+
+    async def flaky_checkpoint(job_id, item_id, owner, result):
+        if result["sku"] == "SKU0":
+            raise RuntimeError("banco indisponível")
+        await original(job_id, item_id, owner, result)
+
+    service._checkpoint = flaky_checkpoint
+    with pytest.raises(RuntimeError):
+        asyncio.run(service.run(job.id))
+
+    # Os outros SKUs do lote terminaram e gravaram o resultado antes da reserva ser devolvida;
+    # só o SKU com checkpoint falho volta para a fila.
+    statuses = _item_statuses(job.id)
+    assert statuses.pop("SKU0") == "pending"
+    assert set(statuses.values()) == {"updated"}
+    assert service.get_status(job.id, include_items=False)["status"] == "failed"
+
+
+def _progress(service: JobService, job_id: str) -> Dict[str, Any]:
+    return service.get_status(job_id, include_items=False)
+
+
+def test_concurrent_runs_never_process_a_sku_twice(monkeypatch):
+    monkeypatch.setattr(settings, "JOB_CHUNK_SIZE", 3)
+    normalization = FakeNormalization(delay=0.002)
+    # Duas instâncias, como /step e /resume em processos diferentes
+    first = JobService(normalization, audit_service=None)
+    second = JobService(normalization, audit_service=None)
+    job = first.submit([f"SKU{i}" for i in range(20)], category_id=1)
+
+    async def scenario():
+        await asyncio.gather(first.run(job.id), second.run(job.id))
+
+    asyncio.run(scenario())
+    assert set(normalization.processed.values()) == {1}
+    assert len(normalization.processed) == 20
+    status = _progress(first, job.id)
+    assert (status["processed"], status["progress"], status["status"]) == (20, 1.0, "completed")
+
+
+def test_expired_lease_is_reclaimed_and_the_late_checkpoint_is_not_counted(monkeypatch):
+    normalization = FakeNormalization()
+    service = JobService(normalization, audit_service=None)
+    job = service.submit([f"SKU{i}" for i in range(4)], category_id=1)
+
+    # Uma execução que caiu deixou dois itens reservados com a reserva já vencida
+    monkeypatch.setattr(settings, "JOB_ITEM_LEASE_SECONDS", -1)
+    crashed = asyncio.run(service._claim(job.id, "crashed", limit=2))
+    monkeypatch.setattr(settings, "JOB_ITEM_LEASE_SECONDS", 300)
+
+    asyncio.run(service.run(job.id))
+    assert len(normalization.processed) == 4
+    # O resultado atrasado da execução antiga não conta de novo
+    asyncio.run(service._checkpoint(job.id, crashed[0].id, "crashed", {"sku": crashed[0].sku, "status": "error"}))
+    status = _progress(service, job.id)
+    assert (status["processed"], status["errors"], status["progress"]) == (4, 0, 1.0)
+    assert _item_statuses(job.id)[crashed[0].sku] == "updated"
+
+
+def test_active_lease_of_another_run_is_left_alone():
+    normalization = FakeNormalization()
+    service = JobService(normalization, audit_service=None)
+    job = service.submit([f"SKU{i}" for i in range(4)], category_id=1)
+    held = asyncio.run(service._claim(job.id, "other", limit=1))
+
+    asyncio.run(service.run(job.id))
+    assert held[0].sku not in normalization.processed
+    status = _progress(service, job.id)
+    assert (status["processed"], status["status"]) == (3, "running")
@@ -0,0 +1,50 @@
+import asyncio
+
+from sqlmodel import Session
+
+from app.core.database import engine
+from app.models.catalog import Category
+from app.services.normalization_service import NormalizationService
+
+
+def test_lookup_without_mirror_filters_listing_by_sku(fake_bling):
+    fake_bling.max_page_size = 5  # o catálogo de 20 produtos ocupa 4 páginas
+    fake_bling.products[4]["situacao"] = "E"
+    fake_bling.products.append({**fake_bling.products[4], "id": 999, "situacao": "A"})
+    service = NormalizationService()
+
+    async def scenario():
+        return await asyncio.gather(*(service._find_product_by_sku(sku) for sku in ("SKU000003", "SKU000005", "NOPE")))
+
+    found, active_duplicate, missing = asyncio.run(scenario())
+    assert found["id"] == 3
+    # O duplicado excluído é ignorado em favor do ativo
+    assert active_duplicate["id"] == 999
+    assert missing is None
+    # Uma chamada filtrada por SKU, não uma varredura do catálogo por SKU
+    assert fake_bling.requests["GET produtos"] == 3
+
+
+def test_patch_is_sent_only_when_the_category_changes(fake_bling):
+    with Session(engine) as session:
+        category = Category(name="Copos", bling_id="4")
+        session.add(category)
+        session.commit()
+        category_id = category.id
+    service = NormalizationService()
+
+    async def apply(sku: str):
+        return await service.apply_category_to_product(sku, category_id, dry_run=False, use_ai=False)
+
+    # SKU000003 já está na categoria 4 no Bling
+    assert asyncio.run(apply("SKU000003"))["status"] == "unchanged"
+    assert fake_bling.requests["PATCH produtos/{id}"] == 0
+
+    changed = asyncio.run(apply("SKU000005"))
+    assert changed["status"] == "success" and changed["changed_fields"] == ["categoria"]
+    assert fake_bling.requests["PATCH produtos/{id}"] == 1
+    assert fake_bling.products_by_id[5]["categoria"] == {"id": 4}
+
+    # Reaplicar não gera outro PATCH
+    assert asyncio.run(apply("SKU000005"))["status"] == "unchanged"
+    assert fake_bling.requests["PATCH produtos/{id}"] == 1
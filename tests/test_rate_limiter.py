@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+from app.services.rate_limiter import DailyQuota, TokenBucket
+
+
+def test_token_bucket_allows_the_burst_then_paces_at_the_rate():
+    bucket = TokenBucket(rate=20, capacity=2)
+
+    async def scenario():
+        return [await bucket.acquire() for _ in range(3)]
+
+    waits = asyncio.run(scenario())
+    assert waits[:2] == [0.0, 0.0]
+    # Terceiro token só depois de 1/rate segundos
+    assert 0.04 <= waits[2] < 0.5
+
+
+def test_token_bucket_pause_holds_every_caller():
+    bucket = TokenBucket(rate=1000, capacity=5)
+
+    async def scenario():
+        bucket.pause(0.1)
+        started = time.monotonic()
+        await asyncio.gather(bucket.acquire(), bucket.acquire())
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) >= 0.1
+
+
+def test_local_remaining_counts_consumed_requests():
+    quota = DailyQuota(limit=2, utc_offset_hours=-3)
+    quota.consume()
+    assert quota.local_remaining == 1
+    quota.consume()
+    quota.consume()
+    assert quota.local_remaining == 0
+
+
+def test_reported_quota_expires_after_ttl():
+    quota = DailyQuota(limit=100, utc_offset_hours=-3, reported_ttl_seconds=0.05)
+    quota.report(0)
+    assert quota.remaining == 0
+    # O contador local nunca é afetado pelo valor informado
+    assert quota.local_remaining == 100
+    time.sleep(0.1)
+    assert quota.remaining == 100
@@ -0,0 +1,107 @@
+import asyncio
+
+from sqlmodel import Session, select
+
+from app.core.database import engine
+from app.models.catalog import Category, CategoryMapping
+from app.services.reconciliation_service import ReconciliationService, RemoteCatalog
+from app.services.sync_service import SyncService
+
+
+def _remote(*categories, links=()):
+    """Categorias remotas como (id, descrição, id do pai)."""
+    return RemoteCatalog(
+        [{"id": cid, "descricao": name, "categoriaPai": {"id": parent} if parent else None} for cid, name, parent in categories],
+        list(links),
+    )
+
+
+def _plan(categories, remote, mappings=()):
+    levels, _ = SyncService._build_levels(categories)
+    return ReconciliationService(bling_client=object()).build_plan(
+        levels, SyncService._index_mappings(list(mappings)), remote,
+    )
+
+
+def test_levels_are_built_breadth_first_and_cycles_are_orphans():
+    categories = [
+        Category(id=4, name="Neto", parent_id=2),
+        Category(id=2, name="Filho", parent_id=1),
+        Category(id=1, name="Raiz"),
+        Category(id=3, name="Outra raiz"),
+        Category(id=5, name="Pai ausente", parent_id=99),
+        Category(id=6, name="Ciclo A", parent_id=7),
+        Category(id=7, name="Ciclo B", parent_id=6),
+    ]
+    levels, orphans = SyncService._build_levels(categories)
+    assert [[cat.id for cat in level] for level in levels] == [[1, 3, 5], [2], [4]]
+    assert sorted(cat.id for cat in orphans) == [6, 7]
+
+
+def test_plan_adopts_by_parent_and_normalized_name():
+    remote = _remote((10, "Casa", None), (11, "Copos", 10), (12, "Copos", None))
+    categories = [
+        Category(id=1, name="  casa "),
+        Category(id=2, name="COPOS", parent_id=1),
+        Category(id=3, name="Pratos", parent_id=1),
+    ]
+    plan = _plan(categories, remote)
+    assert (plan[1]["action"], plan[1]["bling_id"]) == (ReconciliationService.ADOPT, "10")
+    # Mesmo nome em outro pai (12, na raiz) não é confundido
+    assert (plan[2]["action"], plan[2]["bling_id"]) == (ReconciliationService.ADOPT, "11")
+    assert plan[3]["action"] == ReconciliationService.CREATE
+
+
+def test_child_of_a_new_category_is_created_even_if_the_name_exists_elsewhere():
+    remote = _remote((12, "Copos", None))
+    categories = [Category(id=1, name="Nova"), Category(id=2, name="Copos", parent_id=1)]
+    plan = _plan(categories, remote)
+    assert plan[1]["action"] == plan[2]["action"] == ReconciliationService.CREATE
+
+
+def test_stale_bling_id_is_replaced_and_existing_links_are_skipped():
+    remote = _remote((10, "Casa", None), links=[{"categoriaProduto": {"id": 10}, "loja": {"id": 1}, "codigo": "MLB1"}])
+    categories = [Category(id=1, name="Casa", bling_id="555"), Category(id=2, name="Mesa", bling_id="10")]
+    mappings = [
+        CategoryMapping(id=1, category_id=1, marketplace_name="ML", bling_store_id="1", external_category_id="MLB1"),
+        CategoryMapping(id=2, category_id=1, marketplace_name="ML", bling_store_id="1", external_category_id="MLB2"),
+    ]
+    plan = _plan(categories, remote, mappings)
+    assert plan[1]["action"] == ReconciliationService.ADOPT
+    assert (plan[1]["bling_id"], plan[1]["stale_bling_id"]) == ("10", "555")
+    assert plan[1]["links"] == {1: ReconciliationService.SKIP, 2: ReconciliationService.LINK}
+    # bling_id local ainda existe no Bling (mesmo que o nome não bata)
+    assert (plan[2]["action"], plan[2]["bling_id"]) == (ReconciliationService.SKIP, "10")
+
+
+def test_sync_creates_parents_before_children_and_reports_orphans(fake_bling):
+    fake_bling.categories.append({"id": 500, "descricao": "Casa", "categoriaPai": None})
+    with Session(engine) as session:
+        session.add_all([
+            Category(id=1, name="Casa"),
+            Category(id=2, name="Cozinha", parent_id=1),
+            Category(id=3, name="Copos", parent_id=2),
+            Category(id=6, name="Ciclo A", parent_id=7),
+            Category(id=7, name="Ciclo B", parent_id=6),
+        ])
+        session.commit()
+
+    log = asyncio.run(SyncService().sync_categories(dry_run=False))
+
+    statuses = {entry["name"]: entry["status"] for entry in log}
+    assert statuses == {
+        "Casa": "adopted_existing", "Cozinha": "created", "Copos": "created",
+        "Ciclo A": "error", "Ciclo B": "error",
+    }
+    assert fake_bling.requests["POST categorias/produtos"] == 2
+    created = {cat["descricao"]: cat for cat in fake_bling.categories[-2:]}
+    assert created["Cozinha"]["categoriaPai"] == {"id": 500}
+    assert created["Copos"]["categoriaPai"] == {"id": created["Cozinha"]["id"]}
+
+    with Session(engine) as session:
+        bling_ids = {cat.id: cat.bling_id for cat in session.exec(select(Category))}
+    assert bling_ids[1] == "500" and bling_ids[3] == str(created["Copos"]["id"])
+
+    # Segunda execução: nada a escrever no Bling
+    asyncio.run(SyncService().sync_categories(dry_run=False))
+    assert fake_bling.requests["POST categorias/produtos"] == 2
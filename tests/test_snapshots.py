@@ -0,0 +1,61 @@
+import asyncio
+import os
+
+import pytest
+
+from app.core.config import settings
+from app.services.product_mirror_service import ProductMirrorService
+from app.services.snapshot_service import CatalogSnapshotService
+
+
+@pytest.fixture
+def snapshots(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "SNAPSHOT_DIR", str(tmp_path))
+    mirror = ProductMirrorService(bling_client=object())
+    return CatalogSnapshotService(bling_client=object(), product_mirror=mirror)
+
+
+def _upsert(snapshots, products):
+    asyncio.run(snapshots.product_mirror.upsert_products(products))
+
+
+def test_snapshots_in_the_same_second_do_not_overwrite_each_other(snapshots):
+    _upsert(snapshots, [{"id": 1, "codigo": "S1", "nome": "A"}])
+
+    async def scenario():
+        return [await snapshots.create(source="mirror") for _ in range(3)]
+
+    created = asyncio.run(scenario())
+    names = [snapshot["snapshot"] for snapshot in created]
+    assert len(set(names)) == 3
+    assert [s["snapshot"] for s in snapshots.list()] == names[::-1]
+    assert snapshots.latest() == names[-1]
+
+
+def test_diff_handles_products_without_sku(snapshots):
+    _upsert(snapshots, [
+        {"id": 1, "nome": "Sem código", "categoria": {"id": 5, "descricao": "Cat"}},
+        {"id": 2, "codigo": "S2", "nome": "Removido"},
+    ])
+    old = asyncio.run(snapshots.create(source="mirror"))["snapshot"]
+    asyncio.run(snapshots.product_mirror.delete_product("2"))
+    _upsert(snapshots, [
+        {"id": 1, "categoria": None},
+        {"id": 3, "nome": "Novo sem código"},
+    ])
+    new = asyncio.run(snapshots.create(source="mirror"))["snapshot"]
+
+    counts = snapshots.diff(old, new)["counts"]
+    assert (counts["added"], counts["removed"], counts["lost_category"]) == (1, 1, 1)
+
+
+def test_failed_create_leaves_no_temporary_file(snapshots, tmp_path):
+    class BrokenMirror:
+        async def iter_products(self):
+            raise RuntimeError("falha na leitura")
+            yield  # pragma: no cover
+
+    snapshots.product_mirror = BrokenMirror()
+    with pytest.raises(RuntimeError):
+        asyncio.run(snapshots.create(source="mirror"))
+    assert os.listdir(tmp_path) == []
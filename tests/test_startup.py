@@ -0,0 +1,35 @@
+import asyncio
+import logging
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.core.config import settings
+
+
+def test_journal_recovery_task_is_kept_and_cancelled_on_shutdown(monkeypatch):
+    started = []
+
+    async def slow_recovery():
+        started.append(True)
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(settings, "SYNC_JOURNAL_RECOVER_ON_STARTUP", True)
+    monkeypatch.setattr(main, "recover_on_startup", slow_recovery)
+    with TestClient(main.app) as client:
+        client.get("/")
+        task = main.app.state.journal_recovery
+        assert task is not None and not task.done()
+    assert started and task.cancelled()
+
+
+def test_journal_recovery_failure_is_logged(monkeypatch, caplog):
+    async def broken_recovery():
+        raise RuntimeError("sem token")
+
+    monkeypatch.setattr(settings, "SYNC_JOURNAL_RECOVER_ON_STARTUP", True)
+    monkeypatch.setattr(main, "recover_on_startup", broken_recovery)
+    with caplog.at_level(logging.ERROR, logger="app.main"):
+        with TestClient(main.app) as client:
+            client.get("/")
+    assert any(record.exc_info and "sem token" in str(record.exc_info[1]) for record in caplog.records)
@@ -0,0 +1,76 @@
+import asyncio
+from typing import Any, Dict
+
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.database import engine
+from app.models.webhooks import WebhookEvent
+from app.services.product_mirror_service import ProductMirrorService
+from app.services.webhook_service import WebhookService
+
+
+def _service() -> WebhookService:
+    return WebhookService(product_mirror=ProductMirrorService(bling_client=object()))
+
+
+def _payload(event_id: str, data: Dict[str, Any], event: str = "product.updated") -> Dict[str, Any]:
+    return {"eventId": event_id, "event": event, "data": data}
+
+
+def _statuses() -> Dict[str, str]:
+    with Session(engine) as session:
+        return {e.event_id: e.status for e in session.exec(select(WebhookEvent)).all()}
+
+
+def test_partial_product_payload_keeps_missing_fields():
+    service = _service()
+
+    async def scenario():
+        await service.product_mirror.upsert_products([{
+            "id": 1, "codigo": "S1", "nome": "Camiseta", "situacao": "A",
+            "categoria": {"id": 5, "descricao": "Roupas"},
+        }])
+        await service.apply("product.updated", {"id": 1, "nome": "Camiseta azul", "categoria": {"id": 5}})
+
+    asyncio.run(scenario())
+    row = service.product_mirror.resolve_sku("S1")
+    assert (row.nome, row.situacao, row.categoria_bling_id, row.categoria_nome) == ("Camiseta azul", "A", "5", "Roupas")
+
+
+def test_events_dropped_by_a_full_queue_are_applied_by_the_sweep(monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_QUEUE_MAXSIZE", 1)
+    monkeypatch.setattr(settings, "WEBHOOK_SWEEP_INTERVAL_SECONDS", 0.1)
+    monkeypatch.setattr(settings, "WEBHOOK_SWEEP_MIN_AGE_SECONDS", 0)
+    service = _service()
+
+    async def scenario():
+        service.start_worker()
+        try:
+            queued = []
+            for i in range(3):
+                event = await service.record(_payload(f"evt-{i}", {"id": i, "codigo": f"S{i}", "situacao": "A"}))
+                queued.append(service.enqueue(event.event_id))
+            assert queued.count(False) >= 1
+
+            for _ in range(100):
+                if set(_statuses().values()) == {"applied"}:
+                    break
+                await asyncio.sleep(0.05)
+        finally:
+            await WebhookService.stop_worker()
+
+    asyncio.run(scenario())
+    assert _statuses() == {"evt-0": "applied", "evt-1": "applied", "evt-2": "applied"}
+
+
+def test_duplicate_event_is_recorded_once():
+    service = _service()
+
+    async def scenario():
+        first = await service.record(_payload("evt-1", {"id": 1}))
+        second = await service.record(_payload("evt-1", {"id": 1}))
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first is not None and second is None